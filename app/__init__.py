@@ -1,19 +1,33 @@
-import logging
-
 from flask import Flask
 from flask_assets import Bundle, Environment
-from flask_compress import Compress
-from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_talisman import Talisman
 from flask_wtf.csrf import CSRFProtect
 
+from app.compression import StreamingCompress
+from app.conditional import strip_not_modified_headers
+from app.integrations.cache import FragmentCache, RecordCache
+from app.integrations.pool import UpstreamPool
+from app.integrations.replica import Replica
+from app.integrations.serialization import init_json
+from app.logs import QueuedLogging
+from app.metrics import Metrics
+from app.metrics import metrics as metrics_view
+from app.rate_limit import TimedLimiter
+from app.static_files import init_static_files
+from app.templating import init_templates, warm_templates
 from config import Config
 
 assets = Environment()
-compress = Compress()
+cache = RecordCache()
+compress = StreamingCompress()
 csrf = CSRFProtect()
-limiter = Limiter(key_func=get_remote_address, default_limits=["2 per second", "60 per minute"])
+fragments = FragmentCache()
+limiter = TimedLimiter(key_func=get_remote_address)
+logs = QueuedLogging()
+metrics = Metrics()
+pool = UpstreamPool()
+replica = Replica()
 talisman = Talisman()
 
 
@@ -22,6 +36,8 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
     app.jinja_env.lstrip_blocks = True
     app.jinja_env.trim_blocks = True
+    init_json(app)
+    init_templates(app)
 
     # Set content security policy
     csp = {
@@ -39,9 +55,20 @@ def create_app(config_class=Config):
 
     # Initialise app extensions
     assets.init_app(app)
+    cache.init_app(app)
     compress.init_app(app)
     csrf.init_app(app)
+    fragments.init_app(app)
     limiter.init_app(app)
+    logs.init_app(app)
+    metrics.init_app(app)
+    # Metrics are scraped by Prometheus from inside the network, so aren't rate limited or redirected to HTTPS
+    limiter.exempt(metrics_view)
+    talisman(force_https=False)(metrics_view)
+    pool.init_app(app)
+    replica.init_app(app)
+    # Registered before Talisman so it runs after Talisman has set its headers
+    app.after_request(strip_not_modified_headers)
     talisman.init_app(
         app,
         content_security_policy=csp,
@@ -55,6 +82,7 @@ def create_app(config_class=Config):
         assets.register("css", css)
     if "js" not in assets:
         assets.register("js", js)
+    init_static_files(app)
 
     # Register blueprints
     from app.main import bp as main_bp
@@ -65,10 +93,9 @@ def create_app(config_class=Config):
     app.register_blueprint(point_bp, url_prefix="/points")
     app.register_blueprint(thing_bp, url_prefix="/things")
 
-    stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(logging.INFO)
-    app.logger.addHandler(stream_handler)
-    app.logger.setLevel(logging.INFO)
+    if app.config["TEMPLATE_WARM_UP"]:
+        warm_templates(app)
+
     app.logger.info("Startup")
 
     return app
@@ -0,0 +1,123 @@
+import hashlib
+import zlib
+
+import brotli
+from flask import current_app, request
+from flask_compress import Compress
+
+from app.integrations.cache import TTLCache
+from app.metrics import record_cache
+
+
+def compress_stream(chunks, algorithm, level):
+    """Compress an iterable of body chunks as it is consumed, flushing after each chunk so none are held back."""
+    if algorithm == "br":
+        compressor = brotli.Compressor(quality=level)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        # wbits of 31 writes a gzip header and trailer, 15 a zlib one as the deflate coding expects
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31 if algorithm == "gzip" else 15)
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress_body(data, algorithm, level):
+    """Compress a whole response body."""
+    if algorithm == "br":
+        return brotli.compress(data, quality=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31 if algorithm == "gzip" else 15)
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamingCompress(Compress):
+    """Flask-Compress, extended to compress streamed responses chunk by chunk and cache compressed bodies.
+
+    Compressed bodies are cached by a hash of their content, compression algorithm and level, so identical
+    responses are compressed once. Bodies over COMPRESS_CACHE_MAX_BYTES, and pages carrying the request's CSP
+    nonce, which can never be the same twice, are compressed without being cached. COMPRESS_ROUTE_LEVELS
+    overrides the compression level per endpoint, for example to compress large downloads faster at a lower ratio.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault("COMPRESS_CACHE_MAX_BYTES", 262144)
+        app.config.setdefault("COMPRESS_CACHE_SIZE", 64)
+        app.config.setdefault("COMPRESS_ROUTE_LEVELS", {})
+        super().init_app(app)
+        # Cache entries never go stale, as the key changes with the content
+        self.compressed = TTLCache(maxsize=app.config["COMPRESS_CACHE_SIZE"], ttl=float("inf"))
+
+    def level(self, app, algorithm):
+        """Get the compression level for the current endpoint."""
+        levels = app.config["COMPRESS_ROUTE_LEVELS"].get(request.endpoint, {})
+        if algorithm in levels:
+            return levels[algorithm]
+        return {
+            "br": app.config["COMPRESS_BR_LEVEL"],
+            "deflate": app.config["COMPRESS_DEFLATE_LEVEL"],
+            "gzip": app.config["COMPRESS_LEVEL"],
+        }[algorithm]
+
+    def cacheable(self, app, data):
+        """Check whether a compressed body is worth caching: small enough, and without a per-request nonce."""
+        if len(data) > app.config["COMPRESS_CACHE_MAX_BYTES"]:
+            return False
+        nonce = getattr(request, "csp_nonce", None)
+        return not (nonce and nonce.encode() in data)
+
+    def compress(self, app, data, algorithm, level):
+        """Compress a response body, from the cache if an identical body has been compressed before."""
+        if not self.cacheable(app, data):
+            return compress_body(data, algorithm, level)
+        key = f"{algorithm}:{level}:{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+        compressed = self.compressed.get(key)
+        record_cache("compressed", compressed is not None)
+        if compressed is None:
+            compressed = compress_body(data, algorithm, level)
+            self.compressed.set(key, compressed)
+        return compressed
+
+    def after_request(self, response):
+        app = self.app or current_app
+        response.vary.add("Accept-Encoding")
+
+        algorithm = self._choose_compress_algorithm(request.headers.get("Accept-Encoding", ""))
+        if (
+            algorithm is None
+            or response.mimetype not in app.config["COMPRESS_MIMETYPES"]
+            or response.status_code < 200
+            or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or (response.is_streamed and response.direct_passthrough)
+        ):
+            return response
+
+        level = self.level(app, algorithm)
+        if response.is_streamed:
+            response.response = compress_stream(response.response, algorithm, level)
+            response.headers.pop("Content-Length", None)
+            response.headers["Content-Encoding"] = algorithm
+            return response
+
+        if response.content_length is not None and response.content_length < app.config["COMPRESS_MIN_SIZE"]:
+            return response
+
+        response.direct_passthrough = False
+        response.set_data(self.compress(app, response.get_data(), algorithm, level))
+        response.headers["Content-Encoding"] = algorithm
+        response.headers["Content-Length"] = response.content_length
+
+        # Weak ETags, like the page validators, already allow for differently encoded bodies
+        etag = response.headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            response.headers["ETag"] = f'{etag[:-1]}:{algorithm}"'
+        return response
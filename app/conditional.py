@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+from flask import _request_ctx_stack, current_app, make_response, request, session
+
+
+def template_version(app):
+    """Get a hash of the app's templates, so page ETags change when a deploy changes the markup."""
+    version = app.extensions.get("template_version")
+    if version is None:
+        digest = hashlib.blake2b(digest_size=8)
+        template_root = os.path.join(app.root_path, app.template_folder)
+        for directory, _, files in sorted(os.walk(template_root)):
+            for name in sorted(files):
+                with open(os.path.join(directory, name), "rb") as template:
+                    digest.update(template.read())
+        version = app.extensions["template_version"] = digest.hexdigest()
+    return version
+
+
+def page_etag(*parts):
+    """Get an ETag for a rendered page from the version of the data it shows."""
+    digest = hashlib.blake2b(template_version(current_app).encode(), digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def has_flashes():
+    """Check for flashed messages, whether or not the page has shown them yet, without taking them from the session."""
+    return bool(session.get("_flashes") or _request_ctx_stack.top.flashes)
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add a weak ETag and Last-Modified to a page so browsers and caches revalidate it instead of re-downloading.
+
+    Pages are weakly validated because the markup differs per request (CSP nonce) while the content is the same,
+    and are private so shared caches don't serve one request's nonce to another. HTML pages showing flashed
+    messages get no validators, so they are never revalidated and shown again.
+    """
+    html = response.mimetype == "text/html"
+    if html and has_flashes():
+        return response
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if html:
+        response.cache_control.private = True
+    return response
+
+
+def not_modified(etag, last_modified=None, mimetype="text/html"):
+    """Get a 304 Not Modified response if the client's copy of the page is current, otherwise None.
+
+    HTML pages with pending flashed messages are always rendered, since they differ from the cached copy.
+    """
+    if not (request.if_none_match or request.if_modified_since):
+        return None
+    if mimetype == "text/html" and has_flashes():
+        return None
+    response = set_validators(make_response("", 200, {"Content-Type": mimetype}), etag, last_modified)
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    return None
+
+
+def strip_not_modified_headers(response):
+    """Remove headers from 304 responses that would replace the ones stored with the cached page.
+
+    The Content-Security-Policy carries a per-request nonce, so updating it on revalidation would block
+    the inline scripts in the cached page.
+    """
+    if response.status_code == 304:
+        response.headers.pop("Content-Security-Policy", None)
+    return response
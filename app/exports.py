@@ -0,0 +1,105 @@
+import io
+from itertools import islice
+from operator import attrgetter
+
+from app.integrations.serialization import dumps
+
+# Each download format's media type and file extension
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "geojsonseq": ("application/geo+json-seq", "geojsons"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# The Parquet columns for each record model: name, type and how to get the value from a record
+THING_COLUMNS = (
+    ("id", "string", attrgetter("id")),
+    ("name", "string", attrgetter("name")),
+    ("colour", "string", attrgetter("colour")),
+    ("created_at", "timestamp", attrgetter("created_at")),
+    ("updated_at", "timestamp", attrgetter("updated_at")),
+)
+POINT_COLUMNS = (
+    ("id", "string", attrgetter("id")),
+    ("name", "string", attrgetter("name")),
+    ("longitude", "double", attrgetter("longitude")),
+    ("latitude", "double", attrgetter("latitude")),
+    ("created_at", "timestamp", attrgetter("created_at")),
+    ("updated_at", "timestamp", attrgetter("updated_at")),
+)
+
+
+def batched(items, size):
+    """Yield lists of up to size items at a time."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ndjson(objects, batch_size):
+    """Write newline-delimited JSON, one object per line, a chunk per batch of objects."""
+    for batch in batched(objects, batch_size):
+        yield b"".join(dumps(obj) + b"\n" for obj in batch)
+
+
+def geojson_seq(features, batch_size):
+    """Write a GeoJSON text sequence (RFC 8142), a chunk per batch of features.
+
+    Each feature is preceded by a record separator and followed by a line feed.
+    """
+    for batch in batched(features, batch_size):
+        yield b"".join(b"\x1e" + dumps(feature) + b"\n" for feature in batch)
+
+
+class ChunkSink(io.RawIOBase):
+    """A write-only file that collects what is written to it, to be sent on as a chunk of a streamed response."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def parquet(records, columns, batch_size):
+    """Write Parquet, a row group per batch of records, sending each one as soon as it has been written.
+
+    Raises ImportError straight away, rather than part way through a response, if PyArrow isn't installed.
+    """
+    # Imported here as only Parquet downloads need it, and it is slow to import
+    import pyarrow
+    import pyarrow.parquet
+
+    types = {"string": pyarrow.string(), "double": pyarrow.float64(), "timestamp": pyarrow.timestamp("us", tz="UTC")}
+    schema = pyarrow.schema([(name, types[kind]) for name, kind, _ in columns])
+
+    def write():
+        sink = ChunkSink()
+        with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+            for batch in batched(records, batch_size):
+                table = pyarrow.table({name: [get(record) for record in batch] for name, _, get in columns}, schema)
+                writer.write_table(table)
+                yield sink.drain()
+        # The footer is written when the writer is closed
+        yield sink.drain()
+
+    return write()
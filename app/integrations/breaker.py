@@ -0,0 +1,90 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from urllib3.util.retry import Retry
+from werkzeug.exceptions import ServiceUnavailable
+
+from app.metrics import record_breaker_transition
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Stop calling an upstream API that keeps failing, so requests fail fast instead of waiting for timeouts.
+
+    After failure_threshold consecutive failures the circuit opens and every call is rejected for
+    reset_timeout seconds. It then half-opens, letting up to half_open_max_calls probe calls through:
+    a successful probe closes the circuit again and a failed one re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.transitions = Counter()
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        logger.warning("Circuit breaker for %s changed from %s to %s", self.name, self.state, state)
+        self.transitions[(self.state, state)] += 1
+        record_breaker_transition(self.name, self.state, state)
+        self.state = state
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        elif state == self.HALF_OPEN:
+            self._half_open_calls = 0
+        elif state == self.CLOSED:
+            self.failures = 0
+
+    def retry_after(self):
+        """Get the number of seconds until the circuit will half-open."""
+        if self.state != self.OPEN:
+            return 0
+        return max(int(self.opened_at + self.reset_timeout - time.monotonic()) + 1, 1)
+
+    def before_call(self):
+        """Reserve a call, raising ServiceUnavailable if the circuit doesn't allow one."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+
+            if self.state == self.OPEN:
+                raise ServiceUnavailable(retry_after=self.retry_after())
+            elif self.state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise ServiceUnavailable(retry_after=1)
+                self._half_open_calls += 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._transition(self.CLOSED)
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._transition(self.OPEN)
+            elif self.state == self.CLOSED:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._transition(self.OPEN)
+
+
+class JitteredRetry(Retry):
+    """Retry with "full jitter" backoff, so workers retrying the same upstream don't do so in lockstep."""
+
+    def get_backoff_time(self):
+        return random.uniform(0, super().get_backoff_time())  # nosec B311 - not used for security
@@ -0,0 +1,37 @@
+import asyncio
+
+from werkzeug.exceptions import HTTPException
+
+
+class BulkResult:
+    """The outcome of one item of a bulk action: the record it returned, or why it failed."""
+
+    __slots__ = ("item", "record", "error")
+
+    def __init__(self, item, record=None, error=None):
+        self.item = item
+        self.record = record
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+async def run_bounded(action, items, concurrency):
+    """Await action(item) for every item with at most concurrency in flight, returning a BulkResult for each in order.
+
+    A failed item doesn't stop the others, so one unavailable record can't abort a whole import.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return BulkResult(item, record=await action(item))
+            except HTTPException as error:
+                return BulkResult(item, error=error.name)
+            except Exception as error:
+                return BulkResult(item, error=type(error).__name__)
+
+    return await asyncio.gather(*(run(item) for item in items))
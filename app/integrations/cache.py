@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import redis
+
+from app.integrations.serialization import dumps, loads
+from app.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded in-process cache with per-entry expiry and least recently used eviction."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def counter(self, name):
+        """Get the value of a counter, which is kept apart from the cached entries so it never expires."""
+        return self._counters.get(name, 0)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+
+class RedisCache:
+    """Cache shared between workers in Redis, relying on the server's eviction policy for its bound."""
+
+    def __init__(self, url, ttl=60, prefix="flask-bootstrap-ui:"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._client = redis.Redis.from_url(url)
+
+    def __len__(self):
+        try:
+            return sum(1 for _ in self._client.scan_iter(match=f"{self.prefix}*"))
+        except redis.RedisError:
+            return 0
+
+    def get(self, key):
+        try:
+            value = self._client.get(self.prefix + key)
+        except redis.RedisError:
+            logger.warning("Cache get failed for %s", key, exc_info=True)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self._client.set(self.prefix + key, value, ex=self.ttl)
+        except redis.RedisError:
+            logger.warning("Cache set failed for %s", key, exc_info=True)
+
+    def delete(self, key):
+        try:
+            self._client.delete(self.prefix + key)
+        except redis.RedisError:
+            logger.warning("Cache delete failed for %s", key, exc_info=True)
+
+    def delete_prefix(self, prefix):
+        try:
+            keys = list(self._client.scan_iter(match=f"{self.prefix}{prefix}*"))
+            if keys:
+                self._client.delete(*keys)
+        except redis.RedisError:
+            logger.warning("Cache delete failed for %s*", prefix, exc_info=True)
+
+    def clear(self):
+        self.delete_prefix("")
+
+    def counter(self, name):
+        """Get the value of a counter, which is stored without a TTL so it never expires."""
+        try:
+            return int(self._client.get(f"{self.prefix}counter:{name}") or 0)
+        except redis.RedisError:
+            logger.warning("Cache counter get failed for %s", name, exc_info=True)
+            return 0
+
+    def incr(self, name):
+        try:
+            self._client.incr(f"{self.prefix}counter:{name}")
+        except redis.RedisError:
+            logger.warning("Cache counter increment failed for %s", name, exc_info=True)
+
+
+class RecordCache:
+    """Read-through cache of upstream records keyed by entity type and ID, each stored with its upstream ETag."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config["CACHE_TYPE"]
+        if cache_type == "redis":
+            self.backend = RedisCache(app.config["CACHE_REDIS_URL"], ttl=app.config["CACHE_TTL"])
+        elif cache_type == "memory":
+            self.backend = TTLCache(maxsize=app.config["CACHE_MAX_ENTRIES"], ttl=app.config["CACHE_TTL"])
+        else:
+            self.backend = None
+        app.extensions["record_cache"] = self
+
+    def get(self, entity, record_id):
+        """Get the cached (etag, payload) for a record, or None if it is not cached. The etag may be None."""
+        if self.backend is None:
+            return None
+        value = self.backend.get(f"{entity}:{record_id}")
+        record_cache("record", value is not None)
+        if value is None:
+            return None
+        # The upstream ETag is stored on the line before the payload, as header values can't contain a newline
+        etag, _, payload = value.partition(b"\n")
+        return etag.decode() or None, payload
+
+    def set(self, entity, record_id, etag, payload):
+        """Cache the payload for a record with its upstream ETag, replacing any previous value."""
+        if self.backend is not None:
+            self.backend.set(f"{entity}:{record_id}", (etag or "").encode() + b"\n" + payload)
+
+    def delete(self, entity, record_id):
+        """Remove a record from the cache."""
+        if self.backend is not None:
+            self.backend.delete(f"{entity}:{record_id}")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """Get the hit and miss counters and current size of the cache."""
+        if self.backend is None:
+            return {"hits": 0, "misses": 0, "size": 0}
+        return {"hits": self.backend.hits, "misses": self.backend.misses, "size": len(self.backend)}
+
+
+class FragmentCache:
+    """Short-lived cache of rendered page fragments, keyed by entity type and the query that produced them.
+
+    Only fragments that are the same for every user can be cached, so they must not contain flashed messages,
+    CSP nonces or CSRF tokens. Each fragment is stored with the ETag of the upstream response it was rendered from.
+
+    Keys include a generation counter per entity type. A change to a record increments it, so the entity's
+    fragments are no longer looked up and expire in their own time, instead of being found and deleted.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config["FRAGMENT_CACHE_TYPE"]
+        if cache_type == "redis":
+            self.backend = RedisCache(
+                app.config["CACHE_REDIS_URL"],
+                ttl=app.config["FRAGMENT_CACHE_TTL"],
+                prefix="flask-bootstrap-ui-fragments:",
+            )
+        elif cache_type == "memory":
+            self.backend = TTLCache(maxsize=app.config["CACHE_MAX_ENTRIES"], ttl=app.config["FRAGMENT_CACHE_TTL"])
+        else:
+            self.backend = None
+        app.extensions["fragment_cache"] = self
+
+    def key(self, entity, **params):
+        """Get the cache key for an entity's fragment, ignoring empty parameters and their order."""
+        query = urlencode(sorted((name, value) for name, value in params.items() if value not in (None, "")))
+        generation = 0 if self.backend is None else self.backend.counter(f"generation:{entity}")
+        return f"{entity}:{generation}:{query}"
+
+    def get(self, key):
+        """Get the cached (etag, html) for a fragment, or None if it is not cached."""
+        if self.backend is None:
+            return None
+        value = self.backend.get(key)
+        record_cache("fragment", value is not None)
+        if value is None:
+            return None
+        return tuple(loads(value))
+
+    def set(self, key, etag, html):
+        if self.backend is not None:
+            self.backend.set(key, dumps([etag, str(html)]))
+
+    def purge(self, entity):
+        """Stop serving every cached fragment for an entity type, after one of its records has changed."""
+        if self.backend is not None:
+            self.backend.incr(f"generation:{entity}")
+
+    def stats(self):
+        """Get the hit and miss counters and current size of the cache."""
+        if self.backend is None:
+            return {"hits": 0, "misses": 0, "size": 0}
+        return {"hits": self.backend.hits, "misses": self.backend.misses, "size": len(self.backend)}
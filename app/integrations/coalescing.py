@@ -0,0 +1,180 @@
+import base64
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+import redis
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from app.integrations.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Release a lock only if it is still held by the same leader, and hasn't expired and been taken by another
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class CoalescedResponse(requests.Response):
+    """A response shared with a caller from an upstream call made by another."""
+
+
+def copy_response(response):
+    """Copy a response whose body has been read, for another caller to use independently."""
+    shared = CoalescedResponse()
+    shared.__setstate__(response.__getstate__())
+    shared.headers = CaseInsensitiveDict(response.headers)
+    return shared
+
+
+def dump_response(response):
+    return dumps(
+        {
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+            "url": response.url,
+            "content": base64.b64encode(response.content).decode(),
+        }
+    )
+
+
+def load_response(value):
+    fields = loads(value)
+    response = CoalescedResponse()
+    response.status_code = fields["status_code"]
+    response.reason = fields["reason"]
+    response.headers = CaseInsensitiveDict(fields["headers"])
+    response.encoding = fields["encoding"]
+    response.url = fields["url"]
+    response._content = base64.b64decode(fields["content"])
+    return response
+
+
+class Flight:
+    __slots__ = ("done", "response", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one upstream call between identical idempotent requests that are in flight in this process at once.
+
+    The first caller for a key leads, making the call, and callers arriving before it finishes wait for its
+    response, or its error, instead of making their own. Followers get a copy of the response, as a
+    CoalescedResponse. If the leader takes longer than timeout seconds, followers stop waiting and make the call.
+    """
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, send):
+        """Get the response for key, calling send() for it unless an identical call is already in flight."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                logger.warning("Coalesced request for %s timed out waiting for its leader", key)
+                return send()
+            if flight.error is not None:
+                raise flight.error
+            return copy_response(flight.response)
+
+        try:
+            flight.response = self.lead(key, send)
+            return flight.response
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def lead(self, key, send):
+        return send()
+
+
+class RedisSingleFlight(SingleFlight):
+    """Single-flight requests within a process, and across workers by electing one leader per key in Redis.
+
+    A worker's leader takes a lock in Redis for the key, expiring after timeout seconds, and publishes its response
+    under the lock's token when done. Leaders in other workers that find the key locked poll for that response
+    instead of calling upstream. They make the call themselves if the lock is released without a response, because
+    the call failed, or expires, because the leader is stuck.
+    """
+
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, url, timeout=5, prefix="flask-bootstrap-ui-flight:"):
+        super().__init__(timeout)
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._release = self._client.register_script(RELEASE_SCRIPT)
+
+    def lead(self, key, send):
+        lock_key = self.prefix + "lock:" + hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        token = uuid.uuid4().hex
+        try:
+            acquired = self._client.set(lock_key, token, nx=True, px=int(self.timeout * 1000))
+            if not acquired:
+                response = self.follow(lock_key)
+                if response is not None:
+                    return response
+                # Nobody else holds the lock now, so this call doesn't need to take it
+                return send()
+        except redis.RedisError:
+            logger.warning("Coalescing across workers failed for %s", key, exc_info=True)
+            return send()
+
+        try:
+            response = send()
+        except Exception:
+            self.release(lock_key, None, token)
+            raise
+        self.release(lock_key, response, token)
+        return response
+
+    def follow(self, lock_key):
+        """Wait for the response of the leader holding lock_key, or None if it released the lock without one."""
+        deadline = time.monotonic() + self.timeout
+        leader = self._client.get(lock_key)
+        while leader is not None and time.monotonic() < deadline:
+            result_key = self.prefix + "response:" + leader.decode()
+            value, current = self._client.pipeline(transaction=False).get(result_key).get(lock_key).execute()
+            if value is not None:
+                return load_response(value)
+            if current != leader:
+                # The leader has released its lock, so has published its response by now if it had one
+                value = self._client.get(result_key)
+                return load_response(value) if value is not None else None
+            time.sleep(self.POLL_INTERVAL)
+        return None
+
+    def release(self, lock_key, response, token):
+        """Publish the leader's response, if any, for followers already waiting, then release the lock."""
+        try:
+            pipeline = self._client.pipeline(transaction=False)
+            if response is not None:
+                pipeline.set(self.prefix + "response:" + token, dump_response(response), px=int(self.timeout * 1000))
+            self._release(keys=[lock_key], args=[token], client=pipeline)
+            pipeline.execute()
+        except redis.RedisError:
+            logger.warning("Publishing a coalesced response failed", exc_info=True)
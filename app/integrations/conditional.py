@@ -0,0 +1,52 @@
+import hashlib
+
+from app.integrations.cache import TTLCache
+
+
+def content_etag(content):
+    """Get a strong ETag for a response body, for upstream responses that don't send their own."""
+    return '"{}"'.format(hashlib.blake2b(content, digest_size=16).hexdigest())
+
+
+class ConditionalCache:
+    """The last ETag and body seen for each upstream GET, used to revalidate with If-None-Match.
+
+    Entries are keyed by URL and Accept header, since the same URL can return JSON or CSV.
+    """
+
+    def __init__(self, maxsize=256):
+        # Entries never expire; revalidation with the upstream decides whether they are still current
+        self._entries = TTLCache(maxsize=maxsize, ttl=float("inf"))
+
+    @staticmethod
+    def key(request):
+        return f"{request.headers.get('Accept', '')} {request.url}"
+
+    def prepare(self, request):
+        """Add If-None-Match to a prepared GET request if there is a cached response for it."""
+        entry = self._entries.get(self.key(request))
+        if entry is not None:
+            request.headers["If-None-Match"] = entry[0]
+        return entry
+
+    def update(self, request, response, entry):
+        """Store a new 200 response, or fill in the body of a 304 response from the cached entry."""
+        if response.status_code == 304 and entry is not None:
+            etag, content, encoding, content_type = entry
+            response.status_code = 200
+            response.reason = "OK"
+            response._content = content
+            response.encoding = encoding
+            response.headers.setdefault("Content-Type", content_type)
+            response.headers.setdefault("ETag", etag)
+        elif response.status_code == 200 and "ETag" in response.headers:
+            self._entries.set(
+                self.key(request),
+                (
+                    response.headers["ETag"],
+                    response.content,
+                    response.encoding,
+                    response.headers.get("Content-Type", ""),
+                ),
+            )
+        return response
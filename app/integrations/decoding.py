@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from app.integrations.serialization import loads
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp from the upstream APIs into an aware datetime."""
+    if not value or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # Offsets without a colon (+0000) aren't accepted by fromisoformat before Python 3.11
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def decode(body):
+    """Decode an upstream JSON or GeoJSON payload.
+
+    The body can be bytes, such as response.content, or a str.
+    """
+    return loads(body)
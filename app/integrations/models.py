@@ -0,0 +1,208 @@
+from array import array
+from datetime import datetime
+from itertools import chain
+
+from app.integrations.decoding import decode, parse_timestamp
+
+
+def _timestamp(value):
+    """Parse a timestamp slot on first read; later reads get the cached datetime."""
+    return value if value is None or isinstance(value, datetime) else parse_timestamp(value)
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class ThingRecord:
+    """A Thing from the Thing API."""
+
+    __slots__ = ("id", "name", "colour", "_created_at", "_updated_at", "version")
+
+    def __init__(self, id, name, colour, created_at=None, updated_at=None, version=None):
+        self.id = id
+        self.name = name
+        self.colour = colour
+        self._created_at = created_at
+        self._updated_at = updated_at
+        # The upstream ETag of the record, sent back as If-Match to make conditional writes
+        self.version = version
+
+    @classmethod
+    def from_json(cls, obj):
+        """Build a Thing from a decoded JSON object."""
+        return cls(obj["id"], obj["name"], obj["colour"], obj.get("created_at"), obj.get("updated_at"))
+
+    @property
+    def created_at(self):
+        self._created_at = _timestamp(self._created_at)
+        return self._created_at
+
+    @property
+    def updated_at(self):
+        self._updated_at = _timestamp(self._updated_at)
+        return self._updated_at
+
+    @property
+    def last_modified(self):
+        return self.updated_at or self.created_at
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "colour": self.colour,
+            "created_at": _isoformat(self._created_at),
+            "updated_at": _isoformat(self._updated_at),
+        }
+
+
+class PointRecord:
+    """A Point feature from the Point API."""
+
+    __slots__ = ("id", "name", "longitude", "latitude", "_created_at", "_updated_at", "version")
+
+    def __init__(self, id, name, longitude, latitude, created_at=None, updated_at=None, version=None):
+        self.id = id
+        self.name = name
+        self.longitude = longitude
+        self.latitude = latitude
+        self._created_at = created_at
+        self._updated_at = updated_at
+        # The upstream ETag of the record, sent back as If-Match to make conditional writes
+        self.version = version
+
+    @classmethod
+    def from_json(cls, obj):
+        """Build a Point from a decoded GeoJSON Feature."""
+        properties = obj["properties"]
+        longitude, latitude = obj["geometry"]["coordinates"][:2]
+        return cls(
+            obj["id"],
+            properties["name"],
+            longitude,
+            latitude,
+            properties.get("created_at"),
+            properties.get("updated_at"),
+        )
+
+    @property
+    def created_at(self):
+        self._created_at = _timestamp(self._created_at)
+        return self._created_at
+
+    @property
+    def updated_at(self):
+        self._updated_at = _timestamp(self._updated_at)
+        return self._updated_at
+
+    @property
+    def last_modified(self):
+        return self.updated_at or self.created_at
+
+    @property
+    def geometry(self):
+        return {"type": "Point", "coordinates": [self.longitude, self.latitude]}
+
+    def to_json(self):
+        """Get the Point as a GeoJSON Feature."""
+        return {
+            "type": "Feature",
+            "id": self.id,
+            "properties": {
+                "name": self.name,
+                "created_at": _isoformat(self._created_at),
+                "updated_at": _isoformat(self._updated_at),
+            },
+            "geometry": self.geometry,
+        }
+
+
+class FeatureCollection:
+    """A collection of Points stored column-wise, with coordinates in one flat array of longitude, latitude pairs.
+
+    Points are only materialised as PointRecords while iterating, so a large collection costs a few lists
+    and one array rather than several dicts per feature.
+    """
+
+    __slots__ = ("ids", "names", "coordinates", "created_at", "updated_at")
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.coordinates = array("d")
+        self.created_at = []
+        self.updated_at = []
+
+    @classmethod
+    def from_json(cls, obj):
+        """Build a FeatureCollection from a decoded GeoJSON FeatureCollection, a column at a time."""
+        features = obj["features"]
+        properties = [feature["properties"] for feature in features]
+        collection = cls()
+        collection.ids = [feature["id"] for feature in features]
+        collection.names = [item["name"] for item in properties]
+        collection.coordinates = array(
+            "d", chain.from_iterable(feature["geometry"]["coordinates"][:2] for feature in features)
+        )
+        collection.created_at = [item.get("created_at") for item in properties]
+        collection.updated_at = [item.get("updated_at") for item in properties]
+        return collection
+
+    @classmethod
+    def from_points(cls, points):
+        collection = cls()
+        for point in points:
+            collection.append(point)
+        return collection
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ids)
+        return PointRecord(
+            self.ids[index],
+            self.names[index],
+            self.coordinates[2 * index],
+            self.coordinates[2 * index + 1],
+            self.created_at[index],
+            self.updated_at[index],
+        )
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self[index]
+
+    def append(self, point):
+        self.ids.append(point.id)
+        self.names.append(point.name)
+        self.coordinates.append(point.longitude)
+        self.coordinates.append(point.latitude)
+        self.created_at.append(point._created_at)
+        self.updated_at.append(point._updated_at)
+
+    def to_json(self):
+        """Get the collection as a GeoJSON FeatureCollection."""
+        return {"type": "FeatureCollection", "features": [point.to_json() for point in self]}
+
+
+def decode_things(body):
+    """Decode a Thing, or a list of Things, from a Thing API response body."""
+    document = decode(body)
+    if isinstance(document, list):
+        return [ThingRecord.from_json(obj) for obj in document]
+    return ThingRecord.from_json(document)
+
+
+def decode_points(body):
+    """Decode a Point, or a FeatureCollection of Points, from a Point API response body.
+
+    The records are built from the whole decoded document, which is much faster with orjson than building
+    them from each object as it is decoded.
+    """
+    document = decode(body)
+    if document.get("type") == "FeatureCollection":
+        return FeatureCollection.from_json(document)
+    return PointRecord.from_json(document)
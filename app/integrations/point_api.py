@@ -1,21 +1,33 @@
-import json
-from datetime import datetime
-from urllib.parse import urlencode
-
+import httpx
 import requests
 from flask import current_app
-from werkzeug.exceptions import InternalServerError, NotFound, RequestTimeout, TooManyRequests
+from werkzeug.exceptions import InternalServerError, NotFound, PreconditionFailed, RequestTimeout, TooManyRequests
+
+from app import cache, fragments, pool, replica
+from app.integrations.bulk import run_bounded
+from app.integrations.cache import TTLCache
+from app.integrations.conditional import content_etag
+from app.integrations.models import decode_points
+from app.integrations.serialization import dumps
+from app.integrations.streaming import iter_json_array, iter_response
+from app.metrics import record_cache
+
+# Whole upstream lists decoded for the map, by ETag and query. Entries don't expire, as a changed list has a new ETag
+collections = TTLCache(maxsize=16, ttl=float("inf"))
 
 
 class PointAPI:
     def __init__(self):
         self.url = current_app.config["POINT_API_URL"]
         self.timeout = current_app.config["TIMEOUT"]
+        self.session = pool.session(self.url)
+        self.chunk_size = current_app.config["STREAM_CHUNK_SIZE"]
+        self.etag = None
 
 
 class Point(PointAPI):
     def create(self, name, geometry):
-        """Create a new Point."""
+        """Create a new Point with a GeoJSON geometry dict."""
         url = f"{self.url}/points"
         headers = {
             "Accept": "application/geo+json",
@@ -24,36 +36,50 @@ class Point(PointAPI):
         new_point = {
             "type": "Feature",
             "properties": {"name": name},
-            "geometry": json.loads(geometry),
+            "geometry": geometry,
         }
 
         try:
-            response = requests.post(url, data=json.dumps(new_point), headers=headers, timeout=self.timeout)
+            response = self.session.post(url, data=dumps(new_point), headers=headers, timeout=self.timeout)
         except requests.exceptions.Timeout:
             raise RequestTimeout
         else:
             if response.status_code == 201:
-                point = json.loads(response.text)
-                point["properties"]["created_at"] = datetime.strptime(
-                    point["properties"]["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
-                )
-                if point["properties"]["updated_at"]:
-                    point["properties"]["updated_at"] = datetime.strptime(
-                        point["properties"]["updated_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
-                    )
+                point = decode_points(response.content)
+                point.version = response.headers.get("ETag")
+                cache.set("point", point.id, point.version, response.content)
+                replica.put("point", point)
+                fragments.purge("point")
                 return point
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
 
-    def list(self, filters, format="json"):
-        """Get a list of Points."""
-        if filters:
-            qs = urlencode(filters)
-            url = f"{self.url}/points?{qs}"
-        else:
-            url = f"{self.url}/points"
+    def list(self, filters, format="json", stream=False, page=None, per_page=None, bbox=None):
+        """Get a list of Points, from the local replica if it is enabled, fresh and can answer the query.
+
+        Otherwise the upstream API is asked, as with list_upstream. After a non-streamed list, etag holds a
+        validator for the result. If bbox is given the replica only returns the Points inside it; the upstream
+        API can't filter by area, so callers must still filter the results themselves.
+        """
+        local = replica.list("point", filters, format=format, stream=stream, page=page, per_page=per_page, bbox=bbox)
+        if local is None:
+            return self.list_upstream(filters, format=format, stream=stream, page=page, per_page=per_page)
+        self.etag, points = local
+        return points
+
+    def list_upstream(self, filters, format="json", stream=False, page=None, per_page=None):
+        """Get a list of Points from the upstream API.
+
+        If page is given only that page of per_page results is requested from the upstream API.
+        If stream is True the body is not read into memory; an iterator of byte chunks is returned instead.
+        After a non-streamed list, etag holds a validator for the upstream response.
+        """
+        if page:
+            filters = dict(filters, page=page, per_page=per_page)
+
+        url = f"{self.url}/points"
 
         if format == "csv":
             headers = {"Accept": "text/csv"}
@@ -61,15 +87,20 @@ class Point(PointAPI):
             headers = {"Accept": "application/geo+json"}
 
         try:
-            response = requests.get(url, headers=headers, timeout=self.timeout)
+            response = self.session.get(url, params=filters, headers=headers, timeout=self.timeout, stream=stream)
         except requests.exceptions.Timeout:
             raise RequestTimeout
         else:
+            if stream and response.status_code == 200:
+                return iter_response(response, self.chunk_size)
+            response.close()
+
             if response.status_code == 200:
+                self.etag = response.headers.get("ETag") or content_etag(response.content)
                 if format == "csv":
                     return response.text
                 else:
-                    return json.loads(response.text)
+                    return decode_points(response.content)
             elif response.status_code == 204:
                 return None
             elif response.status_code == 429:
@@ -77,35 +108,265 @@ class Point(PointAPI):
             else:
                 raise InternalServerError
 
+    def collection(self, filters, bbox=None):
+        """Get every Point matching filters as a FeatureCollection, for the map, from the replica if it can answer.
+
+        Otherwise the whole list is requested from the upstream API, which is revalidated with If-None-Match rather
+        than downloaded again while it hasn't changed, and the collection decoded from it is reused until its ETag
+        changes. As with list, etag holds a validator for the result and callers must filter by bbox themselves.
+        """
+        local = replica.list("point", filters, bbox=bbox)
+        if local is not None:
+            self.etag, points = local
+            return points
+
+        url = f"{self.url}/points"
+        headers = {"Accept": "application/geo+json"}
+
+        try:
+            response = self.session.get(url, params=filters, headers=headers, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            raise RequestTimeout
+        else:
+            if response.status_code == 200:
+                self.etag = response.headers.get("ETag") or content_etag(response.content)
+                key = (self.etag, tuple(sorted(filters.items())))
+                points = collections.get(key)
+                record_cache("collection", points is not None)
+                if points is None:
+                    points = decode_points(response.content)
+                    collections.set(key, points)
+                return points
+            elif response.status_code == 204:
+                return None
+            elif response.status_code == 429:
+                raise TooManyRequests
+            else:
+                raise InternalServerError
+
+    def stream(self, filters):
+        """Get every Point matching filters as an iterator of GeoJSON Features, from the replica or the upstream API.
+
+        The upstream list is streamed and decoded one point at a time, so memory doesn't grow with its length.
+        """
+        local = replica.stream("point", filters)
+        if local is not None:
+            return local
+        chunks = self.list_upstream(filters, stream=True)
+        return iter(()) if chunks is None else iter_json_array(chunks, key="features")
+
     def get(self, point_id):
         """Get a Point with a specific ID."""
+        cached = cache.get("point", point_id)
+
+        if cached is None:
+            url = f"{self.url}/points/{point_id}"
+            headers = {"Accept": "application/geo+json"}
+
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.exceptions.Timeout:
+                raise RequestTimeout
+            else:
+                if response.status_code == 200:
+                    cached = response.headers.get("ETag"), response.content
+                    cache.set("point", point_id, *cached)
+                elif response.status_code == 404:
+                    raise NotFound
+                elif response.status_code == 429:
+                    raise TooManyRequests
+                else:
+                    raise InternalServerError
+
+        version, body = cached
+        point = decode_points(body)
+        point.version = version
+        return point
+
+    def edit(self, point_id, name, geometry, version=None):
+        """Edit a Point with a specific ID.
+
+        If version is given the Point is only changed if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
         url = f"{self.url}/points/{point_id}"
-        headers = {"Accept": "application/geo+json"}
+        headers = {
+            "Accept": "application/geo+json",
+            "Content-Type": "application/geo+json",
+        }
+        changed_point = {
+            "type": "Feature",
+            "properties": {"name": name},
+            "geometry": geometry,
+        }
+
+        if version:
+            headers["If-Match"] = version
 
         try:
-            response = requests.get(url, headers=headers, timeout=self.timeout)
+            response = self.session.put(
+                url,
+                data=dumps(changed_point),
+                headers=headers,
+                timeout=self.timeout,
+            )
         except requests.exceptions.Timeout:
             raise RequestTimeout
         else:
             if response.status_code == 200:
-                point = json.loads(response.text)
-                point["properties"]["created_at"] = datetime.strptime(
-                    point["properties"]["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
-                )
-                if point["properties"]["updated_at"]:
-                    point["properties"]["updated_at"] = datetime.strptime(
-                        point["properties"]["updated_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
-                    )
+                point = decode_points(response.content)
+                point.version = response.headers.get("ETag")
+                cache.set("point", point_id, point.version, response.content)
+                replica.put("point", point)
+                fragments.purge("point")
                 return point
             elif response.status_code == 404:
+                cache.delete("point", point_id)
+                replica.remove("point", point_id)
+                fragments.purge("point")
                 raise NotFound
+            elif response.status_code == 412:
+                cache.delete("point", point_id)
+                fragments.purge("point")
+                raise PreconditionFailed
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
 
-    def edit(self, point_id, name, geometry):
-        """Edit a Point with a specific ID."""
+    def delete(self, point_id, version=None):
+        """Delete a Point with a specific ID.
+
+        If version is given the Point is only deleted if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
+        url = f"{self.url}/points/{point_id}"
+        headers = {"Accept": "application/geo+json"}
+
+        if version:
+            headers["If-Match"] = version
+
+        try:
+            response = self.session.delete(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            raise RequestTimeout
+        else:
+            if response.status_code == 204:
+                cache.delete("point", point_id)
+                replica.remove("point", point_id)
+                fragments.purge("point")
+                return None
+            elif response.status_code == 404:
+                cache.delete("point", point_id)
+                replica.remove("point", point_id)
+                fragments.purge("point")
+                raise NotFound
+            elif response.status_code == 412:
+                cache.delete("point", point_id)
+                fragments.purge("point")
+                raise PreconditionFailed
+            elif response.status_code == 429:
+                raise TooManyRequests
+            else:
+                raise InternalServerError
+
+
+class AsyncPointAPI:
+    def __init__(self, client):
+        self.url = current_app.config["POINT_API_URL"]
+        self.timeout = current_app.config["TIMEOUT"]
+        self.client = client
+
+
+class AsyncPoint(AsyncPointAPI):
+    """Asyncio version of Point, for async views that make several upstream calls concurrently."""
+
+    async def create(self, name, geometry):
+        """Create a new Point with a GeoJSON geometry dict."""
+        url = f"{self.url}/points"
+        headers = {
+            "Accept": "application/geo+json",
+            "Content-Type": "application/geo+json",
+        }
+        new_point = {
+            "type": "Feature",
+            "properties": {"name": name},
+            "geometry": geometry,
+        }
+
+        try:
+            response = await self.client.post(url, content=dumps(new_point), headers=headers, timeout=self.timeout)
+        except httpx.TimeoutException:
+            raise RequestTimeout
+        else:
+            if response.status_code == 201:
+                point = decode_points(response.content)
+                point.version = response.headers.get("ETag")
+                cache.set("point", point.id, point.version, response.content)
+                replica.put("point", point)
+                fragments.purge("point")
+                return point
+            elif response.status_code == 429:
+                raise TooManyRequests
+            else:
+                raise InternalServerError
+
+    async def list(self, filters, page=None, per_page=None):
+        """Get a list of Points."""
+        if page:
+            filters = dict(filters, page=page, per_page=per_page)
+
+        url = f"{self.url}/points"
+        headers = {"Accept": "application/geo+json"}
+
+        try:
+            response = await self.client.get(url, params=filters, headers=headers, timeout=self.timeout)
+        except httpx.TimeoutException:
+            raise RequestTimeout
+        else:
+            if response.status_code == 200:
+                return decode_points(response.content)
+            elif response.status_code == 204:
+                return None
+            elif response.status_code == 429:
+                raise TooManyRequests
+            else:
+                raise InternalServerError
+
+    async def get(self, point_id):
+        """Get a Point with a specific ID."""
+        cached = cache.get("point", point_id)
+
+        if cached is None:
+            url = f"{self.url}/points/{point_id}"
+            headers = {"Accept": "application/geo+json"}
+
+            try:
+                response = await self.client.get(url, headers=headers, timeout=self.timeout)
+            except httpx.TimeoutException:
+                raise RequestTimeout
+            else:
+                if response.status_code == 200:
+                    cached = response.headers.get("ETag"), response.content
+                    cache.set("point", point_id, *cached)
+                elif response.status_code == 404:
+                    raise NotFound
+                elif response.status_code == 429:
+                    raise TooManyRequests
+                else:
+                    raise InternalServerError
+
+        version, body = cached
+        point = decode_points(body)
+        point.version = version
+        return point
+
+    async def edit(self, point_id, name, geometry, version=None):
+        """Edit a Point with a specific ID.
+
+        If version is given the Point is only changed if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
         url = f"{self.url}/points/{point_id}"
         headers = {
             "Accept": "application/geo+json",
@@ -114,51 +375,88 @@ class Point(PointAPI):
         changed_point = {
             "type": "Feature",
             "properties": {"name": name},
-            "geometry": json.loads(geometry),
+            "geometry": geometry,
         }
 
+        if version:
+            headers["If-Match"] = version
+
         try:
-            response = requests.put(
+            response = await self.client.put(
                 url,
-                data=json.dumps(changed_point),
+                content=dumps(changed_point),
                 headers=headers,
                 timeout=self.timeout,
             )
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise RequestTimeout
         else:
             if response.status_code == 200:
-                point = json.loads(response.text)
-                point["properties"]["created_at"] = datetime.strptime(
-                    point["properties"]["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
-                )
-                if point["properties"]["updated_at"]:
-                    point["properties"]["updated_at"] = datetime.strptime(
-                        point["properties"]["updated_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
-                    )
+                point = decode_points(response.content)
+                point.version = response.headers.get("ETag")
+                cache.set("point", point_id, point.version, response.content)
+                replica.put("point", point)
+                fragments.purge("point")
                 return point
             elif response.status_code == 404:
+                cache.delete("point", point_id)
+                replica.remove("point", point_id)
+                fragments.purge("point")
                 raise NotFound
+            elif response.status_code == 412:
+                cache.delete("point", point_id)
+                fragments.purge("point")
+                raise PreconditionFailed
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
 
-    def delete(self, point_id):
-        """Delete a Point with a specific ID."""
+    async def delete(self, point_id, version=None):
+        """Delete a Point with a specific ID.
+
+        If version is given the Point is only deleted if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
         url = f"{self.url}/points/{point_id}"
         headers = {"Accept": "application/geo+json"}
 
+        if version:
+            headers["If-Match"] = version
+
         try:
-            response = requests.delete(url, headers=headers, timeout=self.timeout)
-        except requests.exceptions.Timeout:
+            response = await self.client.delete(url, headers=headers, timeout=self.timeout)
+        except httpx.TimeoutException:
             raise RequestTimeout
         else:
             if response.status_code == 204:
+                cache.delete("point", point_id)
+                replica.remove("point", point_id)
+                fragments.purge("point")
                 return None
             elif response.status_code == 404:
+                cache.delete("point", point_id)
+                replica.remove("point", point_id)
+                fragments.purge("point")
                 raise NotFound
+            elif response.status_code == 412:
+                cache.delete("point", point_id)
+                fragments.purge("point")
+                raise PreconditionFailed
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
+
+    async def bulk_create(self, points, concurrency):
+        """Create many Points from dicts of name and GeoJSON geometry, at most concurrency at once.
+
+        Returns a BulkResult for each, in order, with the created Point or the reason it failed.
+        """
+        return await run_bounded(
+            lambda point: self.create(name=point["name"], geometry=point["geometry"]), points, concurrency
+        )
+
+    async def bulk_delete(self, point_ids, concurrency):
+        """Delete many Points by ID, at most concurrency at once, returning a BulkResult for each."""
+        return await run_bounded(self.delete, point_ids, concurrency)
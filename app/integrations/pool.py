@@ -0,0 +1,215 @@
+import atexit
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.integrations.breaker import CircuitBreaker, JitteredRetry
+from app.integrations.coalescing import CoalescedResponse, RedisSingleFlight, SingleFlight
+from app.integrations.conditional import ConditionalCache
+from app.metrics import record_cache, record_upstream
+
+
+class UpstreamSession(requests.Session):
+    """A session whose requests go through the circuit breaker for its upstream API, and are timed.
+
+    GET requests are revalidated with If-None-Match against the last response seen for the same URL,
+    and a 304 Not Modified is returned to the caller as that cached 200 response. Identical GET requests
+    in flight at the same time share one upstream call, if flights is set.
+    """
+
+    def __init__(self, breaker, conditional, flights=None):
+        super().__init__()
+        self.breaker = breaker
+        self.conditional = conditional
+        self.flights = flights
+
+    def request(self, method, url, *args, **kwargs):
+        self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            record_upstream(self.breaker.name, method, url, "error", time.perf_counter() - start)
+            raise
+        if isinstance(response, CoalescedResponse):
+            # Another caller made the upstream call, and recorded it
+            return response
+        record_upstream(self.breaker.name, method, url, response.status_code, time.perf_counter() - start)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def send(self, request, **kwargs):
+        if request.method != "GET" or kwargs.get("stream"):
+            return super().send(request, **kwargs)
+        if self.flights is None:
+            return self.send_conditional(request, **kwargs)
+        response = self.flights.do(self.conditional.key(request), lambda: self.send_conditional(request, **kwargs))
+        record_cache("coalesced", isinstance(response, CoalescedResponse))
+        return response
+
+    def send_conditional(self, request, **kwargs):
+        entry = self.conditional.prepare(request)
+        response = super().send(request, **kwargs)
+        return self.conditional.update(request, response, entry)
+
+
+class BreakerTransport(httpx.AsyncHTTPTransport):
+    """An asyncio transport whose requests go through the circuit breaker for their upstream API, and are timed."""
+
+    def __init__(self, pool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    async def handle_async_request(self, request):
+        url = str(request.url)
+        breaker = self.pool.breaker_for(url)
+        if breaker is None:
+            return await super().handle_async_request(request)
+
+        breaker.before_call()
+        start = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            breaker.record_failure()
+            record_upstream(breaker.name, request.method, url, "error", time.perf_counter() - start)
+            raise
+        record_upstream(breaker.name, request.method, url, response.status_code, time.perf_counter() - start)
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+
+class UpstreamPool:
+    """Keep-alive HTTP sessions shared by the API clients, one per upstream base URL."""
+
+    def __init__(self, app=None):
+        self._sessions = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._registered = False
+        self.pool_size = 10
+        self.pool_maxsize = 10
+        self.pool_block = False
+        self.breaker_settings = {}
+        self.retry_total = 2
+        self.retry_backoff_factor = 0.2
+        self.etag_cache_size = 256
+        self.flights = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Sessions and breakers from a previous app are discarded so new settings take effect
+        self.close()
+        self._breakers = {}
+        self.pool_size = app.config["UPSTREAM_POOL_SIZE"]
+        self.pool_maxsize = app.config["UPSTREAM_POOL_MAXSIZE"]
+        self.pool_block = app.config["UPSTREAM_POOL_BLOCK"]
+        self.breaker_settings = {
+            "failure_threshold": app.config["CIRCUIT_BREAKER_FAILURE_THRESHOLD"],
+            "reset_timeout": app.config["CIRCUIT_BREAKER_RESET_TIMEOUT"],
+            "half_open_max_calls": app.config["CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS"],
+        }
+        self.retry_total = app.config["UPSTREAM_RETRY_TOTAL"]
+        self.retry_backoff_factor = app.config["UPSTREAM_RETRY_BACKOFF_FACTOR"]
+        self.etag_cache_size = app.config["UPSTREAM_ETAG_CACHE_SIZE"]
+        coalesce_type = app.config["UPSTREAM_COALESCE_TYPE"]
+        if coalesce_type == "redis":
+            self.flights = RedisSingleFlight(
+                app.config["CACHE_REDIS_URL"], timeout=app.config["UPSTREAM_COALESCE_TIMEOUT"]
+            )
+        elif coalesce_type == "memory":
+            self.flights = SingleFlight(timeout=app.config["UPSTREAM_COALESCE_TIMEOUT"])
+        else:
+            self.flights = None
+        app.extensions["upstream_pool"] = self
+
+        for url in (app.config["THING_API_URL"], app.config["POINT_API_URL"]):
+            if url:
+                self.session(url)
+
+        if not self._registered:
+            atexit.register(self.close)
+            self._registered = True
+
+    def session(self, url):
+        """Get the session for an upstream base URL, creating it on first use."""
+        session = self._sessions.get(url)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(url)
+                if session is None:
+                    session = self._create_session(url)
+                    self._sessions[url] = session
+        return session
+
+    def breaker(self, url):
+        """Get the circuit breaker for an upstream base URL, creating it on first use."""
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = self._breakers.setdefault(url, CircuitBreaker(url, **self.breaker_settings))
+        return breaker
+
+    def breaker_for(self, url):
+        """Get the circuit breaker for the upstream a full request URL belongs to, if it is a known upstream."""
+        for base_url, breaker in self._breakers.items():
+            if url.startswith(base_url):
+                return breaker
+        return None
+
+    def breakers(self):
+        return dict(self._breakers)
+
+    def async_client(self):
+        """Create an asyncio HTTP client with the same pool limits and circuit breakers as the sessions.
+
+        Connections are bound to the event loop that opened them and Flask runs each async view in its own
+        loop, so use one client per view, with ``async with``, shared by all of that view's upstream calls.
+        """
+        limits = httpx.Limits(
+            max_connections=self.pool_size * self.pool_maxsize if self.pool_block else None,
+            max_keepalive_connections=self.pool_maxsize,
+        )
+        transport = BreakerTransport(self, limits=limits, retries=self.retry_total)
+        return httpx.AsyncClient(transport=transport)
+
+    def close(self):
+        """Close every session, releasing its pooled connections."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def _create_session(self, url):
+        session = UpstreamSession(self.breaker(url), ConditionalCache(maxsize=self.etag_cache_size), self.flights)
+        # Only idempotent requests are retried, and only when the upstream couldn't be reached or was
+        # temporarily unavailable. Read timeouts aren't retried, as that would multiply the time a worker waits,
+        # and for the same reason retries wait for the jittered backoff rather than the upstream's Retry-After.
+        retry = JitteredRetry(
+            total=self.retry_total,
+            read=0,
+            backoff_factor=self.retry_backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(("GET", "DELETE")),
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=retry,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
@@ -0,0 +1,352 @@
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+
+from app.integrations.conditional import content_etag
+from app.integrations.models import FeatureCollection, PointRecord, ThingRecord
+from app.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS things (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    colour TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS things_name ON things (name COLLATE NOCASE, id);
+CREATE INDEX IF NOT EXISTS things_colour ON things (colour, name COLLATE NOCASE, id);
+CREATE TABLE IF NOT EXISTS points (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    longitude REAL NOT NULL,
+    latitude REAL NOT NULL,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS points_name ON points (name COLLATE NOCASE, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS points_bbox USING rtree(point_rowid, min_x, max_x, min_y, max_y);
+CREATE TABLE IF NOT EXISTS sync_state (
+    entity TEXT PRIMARY KEY,
+    cursor TEXT,
+    synced_at REAL,
+    full_synced_at REAL,
+    claimed_until REAL NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO sync_state (entity) VALUES ('thing'), ('point');
+"""
+
+TABLES = {"thing": "things", "point": "points"}
+
+COLUMNS = {
+    "thing": ("id", "name", "colour", "created_at", "updated_at"),
+    "point": ("id", "name", "longitude", "latitude", "created_at", "updated_at"),
+}
+
+# The columns of each entity's upstream CSV
+CSV_COLUMNS = {
+    "thing": ("id", "name", "colour", "created_at", "updated_at"),
+    "point": ("id", "name", "longitude", "latitude", "created_at"),
+}
+
+# Each entity's sort options, as ORDER BY clauses. The first is used when no sort is given.
+SORTS = {
+    "thing": {"name": "name COLLATE NOCASE, id", "colour": "colour, name COLLATE NOCASE, id"},
+    "point": {"name": "name COLLATE NOCASE, id"},
+}
+
+FILTERS = {"thing": {"sort", "name", "colour"}, "point": {"sort", "name"}}
+
+# Rows read from the database at a time when streaming a download
+BATCH_SIZE = 500
+
+# Seconds a worker may hold the sync lease for an entity before another can take it over
+SYNC_LEASE = 60
+
+
+class Replica:
+    """Optional local copy of the Things and Points in SQLite, kept current by a background sync with the upstreams.
+
+    List and download queries are answered from it while its last full sync is within REPLICA_MAX_STALENESS,
+    otherwise the caller asks the upstream API as usual. Every worker shares the database file; a lease in
+    the sync_state table lets only one of them poll each upstream at a time.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.pid = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config["REPLICA_ENABLED"]
+        self.path = app.config["REPLICA_PATH"]
+        self.max_staleness = app.config["REPLICA_MAX_STALENESS"]
+        self.sync_interval = app.config["REPLICA_SYNC_INTERVAL"]
+        # Deletions are only seen by a full sync, so one is due often enough to keep them within the staleness bound
+        self.full_sync_interval = min(app.config["REPLICA_FULL_SYNC_INTERVAL"], self.max_staleness - self.sync_interval)
+        self.local = threading.local()
+        if self.enabled:
+            # Not kept open, as the app may be created in a Gunicorn master whose connections mustn't be forked
+            try:
+                connection = sqlite3.connect(self.path, timeout=5)
+                connection.executescript(SCHEMA)
+                connection.close()
+            except sqlite3.Error as error:
+                logger.warning("Replica unavailable: {!r}".format(error))
+                self.enabled = False
+        app.extensions["replica"] = self
+
+    def connection(self):
+        """Get this thread's connection to the database, opening one if needed."""
+        connection = getattr(self.local, "connection", None)
+        if connection is None or self.local.pid != os.getpid():
+            # Connections must not be shared between threads or processes
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def start_sync(self):
+        """Start the sync thread in this process, if it hasn't been."""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.thread = None
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                app = current_app._get_current_object()
+                self.thread = threading.Thread(target=self.run, args=(app,), name="replica-sync", daemon=True)
+                self.thread.start()
+
+    def run(self, app):
+        while True:
+            with app.app_context():
+                for entity in TABLES:
+                    try:
+                        self.sync(entity)
+                    except Exception as error:
+                        logger.warning("Replica sync of {} failed: {!r}".format(entity, error))
+            time.sleep(self.sync_interval)
+
+    def sync(self, entity):
+        """Bring an entity's table up to date with its upstream, if no other worker is doing so.
+
+        Records changed since the last sync are fetched with updated_since. Records deleted by other clients
+        can't be seen that way, so the whole list is fetched instead every REPLICA_FULL_SYNC_INTERVAL, or sooner
+        if the staleness bound needs it. Like every upstream GET it is revalidated with If-None-Match, so an
+        unchanged list isn't downloaded again. Returns whether this worker synced.
+        """
+        from app import fragments
+        from app.integrations.point_api import Point
+        from app.integrations.thing_api import Thing
+
+        started = time.time()
+        connection = self.connection()
+        with connection:
+            # Claim the lease, unless another worker holds it or has synced within the interval
+            claimed = connection.execute(
+                "UPDATE sync_state SET claimed_until = ? "
+                "WHERE entity = ? AND claimed_until <= ? AND COALESCE(synced_at, 0) <= ?",
+                (started + SYNC_LEASE, entity, started, started - self.sync_interval),
+            ).rowcount
+        if not claimed:
+            return False
+
+        try:
+            cursor, full_synced_at = connection.execute(
+                "SELECT cursor, full_synced_at FROM sync_state WHERE entity = ?", (entity,)
+            ).fetchone()
+            full = cursor is None or started - full_synced_at >= self.full_sync_interval
+            client = Thing() if entity == "thing" else Point()
+            records = client.list_upstream(filters={} if full else {"updated_since": cursor}) or []
+
+            with connection:
+                if full:
+                    connection.execute(f"DELETE FROM {TABLES[entity]}")
+                    if entity == "point":
+                        connection.execute("DELETE FROM points_bbox")
+                for record in records:
+                    cursor = max(cursor or "", self._upsert(connection, entity, record) or "") or None
+                connection.execute(
+                    "UPDATE sync_state SET cursor = ?, synced_at = ?, full_synced_at = ?, claimed_until = 0 "
+                    "WHERE entity = ?",
+                    (cursor, started, started if full else full_synced_at, entity),
+                )
+        except Exception:
+            with connection:
+                connection.execute("UPDATE sync_state SET claimed_until = 0 WHERE entity = ?", (entity,))
+            raise
+        if records:
+            fragments.purge(entity)
+        logger.info("Replica synced %d %ss in %.0f ms", len(records), entity, (time.time() - started) * 1000)
+        return True
+
+    def fresh(self, entity):
+        """Whether an entity's table has had a full sync, which reflects deletions too, within the staleness bound."""
+        row = self.connection().execute("SELECT full_synced_at FROM sync_state WHERE entity = ?", (entity,)).fetchone()
+        return row is not None and row[0] is not None and time.time() - row[0] <= self.max_staleness
+
+    def answers(self, entity, filters):
+        """Whether the replica can answer a query: it is enabled and fresh, and supports the filters."""
+        if not self.enabled or not set(filters) <= FILTERS[entity] or filters.get("sort", "name") not in SORTS[entity]:
+            return False
+        self.start_sync()
+        try:
+            hit = self.fresh(entity)
+        except sqlite3.Error as error:
+            logger.warning("Replica unavailable: {!r}".format(error))
+            return False
+        record_cache("replica", hit)
+        return hit
+
+    def list(self, entity, filters, format="json", stream=False, page=None, per_page=None, bbox=None):
+        """Answer a list query from the replica, as an (etag, result) pair.
+
+        The result is what the client would have returned from the upstream API: a list of records, or a
+        FeatureCollection, or None if there are none; for CSV, the text or if stream is True an iterator of
+        byte chunks. Returns None if the replica can't answer: it is disabled, cold or stale, or a filter isn't
+        one it supports.
+        """
+        if not self.answers(entity, filters):
+            return None
+        try:
+            sql, params = self._query(entity, filters, page, per_page, bbox)
+            if format == "csv":
+                chunks = self._csv(entity, sql, params)
+                return None, chunks if stream else b"".join(chunks).decode()
+            rows = self.connection().execute(sql, params).fetchall()
+        except sqlite3.Error as error:
+            logger.warning("Replica unavailable: {!r}".format(error))
+            return None
+
+        etag = content_etag(repr(rows).encode())
+        if not rows:
+            return etag, None
+        if entity == "thing":
+            return etag, [ThingRecord(*row) for row in rows]
+        return etag, FeatureCollection.from_points(PointRecord(*row) for row in rows)
+
+    def stream(self, entity, filters):
+        """Answer a download query from the replica as an iterator of JSON objects, as the upstream would list them.
+
+        Rows are read a batch at a time. Returns None if the replica can't answer, as for list.
+        """
+        if not self.answers(entity, filters):
+            return None
+        sql, params = self._query(entity, filters, None, None, None)
+        model = ThingRecord if entity == "thing" else PointRecord
+        return (model(*row).to_json() for row in self._rows(sql, params))
+
+    def put(self, entity, record):
+        """Store a record the app has just created or changed upstream."""
+        if self.enabled:
+            try:
+                with self.connection() as connection:
+                    self._upsert(connection, entity, record)
+            except sqlite3.Error as error:
+                logger.warning("Replica unavailable: {!r}".format(error))
+
+    def remove(self, entity, record_id):
+        """Remove a record the app has just deleted upstream, or found to be gone."""
+        if self.enabled:
+            try:
+                with self.connection() as connection:
+                    if entity == "point":
+                        connection.execute(
+                            "DELETE FROM points_bbox WHERE point_rowid = (SELECT rowid FROM points WHERE id = ?)",
+                            (str(record_id),),
+                        )
+                    connection.execute(f"DELETE FROM {TABLES[entity]} WHERE id = ?", (str(record_id),))
+            except sqlite3.Error as error:
+                logger.warning("Replica unavailable: {!r}".format(error))
+
+    @staticmethod
+    def _upsert(connection, entity, record):
+        """Insert or update a record, returning the time it was last changed."""
+        if entity == "thing":
+            values = tuple(record.to_json()[column] for column in COLUMNS["thing"])
+        else:
+            properties = record.to_json()["properties"]
+            values = (record.id, record.name, record.longitude, record.latitude)
+            values += (properties["created_at"], properties["updated_at"])
+        columns = COLUMNS[entity]
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+        connection.execute(
+            f"INSERT INTO {TABLES[entity]} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (id) DO UPDATE SET {assignments}",
+            values,
+        )
+        if entity == "point":
+            connection.execute(
+                "INSERT OR REPLACE INTO points_bbox SELECT rowid, longitude, longitude, latitude, latitude "
+                "FROM points WHERE id = ?",
+                (record.id,),
+            )
+        return values[-1] or values[-2]
+
+    @staticmethod
+    def _query(entity, filters, page, per_page, bbox):
+        """Build the SELECT for a list query. Only whitelisted column names and sort clauses are interpolated."""
+        table = TABLES[entity]
+        sql = f"SELECT {', '.join(f'{table}.{column}' for column in COLUMNS[entity])} FROM {table}"
+        where, params = [], []
+        if bbox is not None:
+            west, south, east, north = bbox
+            sql += " JOIN points_bbox ON points_bbox.point_rowid = points.rowid"
+            where.append("min_x <= ? AND max_x >= ? AND min_y <= ? AND max_y >= ?")
+            params += [east, west, north, south]
+        if filters.get("name"):
+            name = filters["name"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{name}%")
+        if filters.get("colour"):
+            where.append("colour = ?")
+            params.append(filters["colour"])
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + SORTS[entity][filters.get("sort", "name")]
+        if page:
+            sql += " LIMIT ? OFFSET ?"
+            params += [per_page, (page - 1) * per_page]
+        return sql, params
+
+    def _rows(self, sql, params):
+        """Yield the rows of a query, fetching them a batch at a time."""
+        cursor = self.connection().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+    def _csv(self, entity, sql, params):
+        """Stream the rows of a query as CSV, in the upstream's columns, a batch of rows per chunk."""
+        columns = [COLUMNS[entity].index(column) for column in CSV_COLUMNS[entity]]
+        cursor = self.connection().execute(sql, params)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS[entity])
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            writer.writerows([row[index] for index in columns] for row in rows)
+            if buffer.tell():
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            if not rows:
+                return
@@ -0,0 +1,67 @@
+import json
+
+from flask.json import JSONDecoder as FlaskJSONDecoder
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the standard library is used instead
+    orjson = None
+
+
+def backend():
+    """Get the name of the JSON library in use: orjson if it is installed, otherwise the standard library."""
+    return "json" if orjson is None else "orjson"
+
+
+def loads(body):
+    """Decode a JSON document from UTF-8 bytes or a str.
+
+    Pass response bodies as bytes, such as response.content, to save decoding them to a str first.
+    """
+    if orjson is None:
+        return json.loads(body)
+    return orjson.loads(body)
+
+
+def dumps(obj, default=None):
+    """Encode an object as compact JSON in UTF-8 bytes, ready to send as a request body or write to a stream.
+
+    A default function is called with any object that can't otherwise be encoded, to get one that can.
+    """
+    if orjson is None:
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode()
+    return orjson.dumps(obj, default=default)
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Flask's JSON encoder, used by jsonify and the tojson template filter, encoding with orjson when it can.
+
+    Dates, dataclasses and any types orjson doesn't know are still converted by Flask's default method.
+    Output is always UTF-8 rather than ASCII with escapes, and compact unless it is indented.
+    """
+
+    def encode(self, o):
+        if orjson is None or self.indent not in (None, 2) or self.skipkeys or not self.allow_nan:
+            return super().encode(o)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(o, default=self.default, option=option).decode()
+
+
+class JSONDecoder(FlaskJSONDecoder):
+    """Flask's JSON decoder, used by request.get_json, decoding with orjson when no hooks are set."""
+
+    def decode(self, s, *args, **kwargs):
+        if orjson is None or self.object_hook is not None or self.object_pairs_hook is not None:
+            return super().decode(s, *args, **kwargs)
+        return orjson.loads(s)
+
+
+def init_json(app):
+    """Use the same JSON library for the app's own JSON as for the upstream APIs."""
+    app.json_encoder = JSONEncoder
+    app.json_decoder = JSONDecoder
@@ -0,0 +1,116 @@
+import codecs
+import json
+
+WHITESPACE = " \t\n\r"
+
+
+def iter_response(response, chunk_size):
+    """Yield the body of a streamed upstream response chunk by chunk, releasing the connection when done."""
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        response.close()
+
+
+class JSONArrayReader:
+    """Decode the elements of a JSON array one at a time from a stream of byte chunks.
+
+    Only the element being decoded and the rest of the current chunk are held in memory, so a list of any
+    length can be read from a streamed upstream response.
+    """
+
+    def __init__(self, chunks, key=None):
+        self.chunks = iter(chunks)
+        self.key = key
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.ended = False
+
+    def __iter__(self):
+        if self.key is not None:
+            self.find_key()
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+        else:
+            while True:
+                yield self.value()
+                if self.peek() != ",":
+                    break
+                self.position += 1
+            self.expect("]")
+        # Read the rest of the body, so the connection can be reused
+        for _ in self.chunks:
+            pass
+
+    def read(self):
+        """Add the next chunk to the buffer, dropping what has been decoded. Returns False at the end of the stream."""
+        if self.ended:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.ended = True
+            text = self.text.decode(b"", final=True)
+        else:
+            text = self.text.decode(chunk)
+        self.buffer = self.buffer[self.position :] + text
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and get the next character, or an empty string at the end of the stream."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read():
+                return ""
+
+    def expect(self, character):
+        found = self.peek()
+        if found != character:
+            raise ValueError(f"Expected {character!r} in JSON stream but found {found!r}")
+        self.position += 1
+
+    def value(self):
+        """Decode the next JSON value, reading more of the stream until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self.read():
+                    raise
+                continue
+            # A number at the end of the buffer may carry on in the next chunk
+            if end == len(self.buffer) and self.read():
+                continue
+            self.position = end
+            return value
+
+    def find_key(self):
+        """Move to the value of key in the top-level object, skipping the members before it."""
+        self.expect("{")
+        while self.peek() == '"':
+            name = self.value()
+            self.expect(":")
+            if name == self.key:
+                return
+            self.value()
+            if self.peek() == ",":
+                self.position += 1
+        raise ValueError(f"No {self.key!r} member in JSON stream")
+
+
+def iter_json_array(chunks, key=None):
+    """Yield each element of a JSON array as it is decoded from a stream of byte chunks.
+
+    The array is the whole document or, if key is given, that member of the top-level object, such as the
+    features of a GeoJSON FeatureCollection.
+    """
+    return iter(JSONArrayReader(chunks, key))
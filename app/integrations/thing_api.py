@@ -1,16 +1,23 @@
-import json
-from datetime import datetime
-from urllib.parse import urlencode
-
+import httpx
 import requests
 from flask import current_app
-from werkzeug.exceptions import InternalServerError, NotFound, RequestTimeout, TooManyRequests
+from werkzeug.exceptions import InternalServerError, NotFound, PreconditionFailed, RequestTimeout, TooManyRequests
+
+from app import cache, fragments, pool, replica
+from app.integrations.bulk import run_bounded
+from app.integrations.conditional import content_etag
+from app.integrations.models import decode_things
+from app.integrations.serialization import dumps
+from app.integrations.streaming import iter_json_array, iter_response
 
 
 class ThingAPI:
     def __init__(self):
         self.url = current_app.config["THING_API_URL"]
         self.timeout = current_app.config["TIMEOUT"]
+        self.session = pool.session(self.url)
+        self.chunk_size = current_app.config["STREAM_CHUNK_SIZE"]
+        self.etag = None
 
 
 class Thing(ThingAPI):
@@ -21,28 +28,45 @@ class Thing(ThingAPI):
         new_thing = {"name": name, "colour": colour}
 
         try:
-            response = requests.post(url, data=json.dumps(new_thing), headers=headers, timeout=self.timeout)
+            response = self.session.post(url, data=dumps(new_thing), headers=headers, timeout=self.timeout)
         except requests.exceptions.Timeout:
             raise RequestTimeout
         else:
             if response.status_code == 201:
-                thing = json.loads(response.text)
-                thing["created_at"] = datetime.strptime(thing["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
-                if thing["updated_at"]:
-                    thing["updated_at"] = datetime.strptime(thing["updated_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
+                thing = decode_things(response.content)
+                thing.version = response.headers.get("ETag")
+                cache.set("thing", thing.id, thing.version, response.content)
+                replica.put("thing", thing)
+                fragments.purge("thing")
                 return thing
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
 
-    def list(self, filters, format="json"):
-        """Get a list of Things."""
-        if filters:
-            qs = urlencode(filters)
-            url = f"{self.url}/things?{qs}"
-        else:
-            url = f"{self.url}/things"
+    def list(self, filters, format="json", stream=False, page=None, per_page=None):
+        """Get a list of Things, from the local replica if it is enabled, fresh and can answer the query.
+
+        Otherwise the upstream API is asked, as with list_upstream. After a non-streamed list, etag holds a
+        validator for the result.
+        """
+        local = replica.list("thing", filters, format=format, stream=stream, page=page, per_page=per_page)
+        if local is None:
+            return self.list_upstream(filters, format=format, stream=stream, page=page, per_page=per_page)
+        self.etag, things = local
+        return things
+
+    def list_upstream(self, filters, format="json", stream=False, page=None, per_page=None):
+        """Get a list of Things from the upstream API.
+
+        If page is given only that page of per_page results is requested from the upstream API.
+        If stream is True the body is not read into memory; an iterator of byte chunks is returned instead.
+        After a non-streamed list, etag holds a validator for the upstream response.
+        """
+        if page:
+            filters = dict(filters, page=page, per_page=per_page)
+
+        url = f"{self.url}/things"
 
         if format == "csv":
             headers = {"Accept": "text/csv"}
@@ -50,15 +74,20 @@ class Thing(ThingAPI):
             headers = {"Accept": "application/json"}
 
         try:
-            response = requests.get(url, headers=headers, timeout=self.timeout)
+            response = self.session.get(url, params=filters, headers=headers, timeout=self.timeout, stream=stream)
         except requests.exceptions.Timeout:
             raise RequestTimeout
         else:
+            if stream and response.status_code == 200:
+                return iter_response(response, self.chunk_size)
+            response.close()
+
             if response.status_code == 200:
+                self.etag = response.headers.get("ETag") or content_etag(response.content)
                 if format == "csv":
                     return response.text
                 else:
-                    return json.loads(response.text)
+                    return decode_things(response.content)
             elif response.status_code == 204:
                 return None
             elif response.status_code == 429:
@@ -66,73 +95,298 @@ class Thing(ThingAPI):
             else:
                 raise InternalServerError
 
+    def stream(self, filters):
+        """Get every Thing matching filters as an iterator of JSON objects, from the replica or the upstream API.
+
+        The upstream list is streamed and decoded one thing at a time, so memory doesn't grow with its length.
+        """
+        local = replica.stream("thing", filters)
+        if local is not None:
+            return local
+        chunks = self.list_upstream(filters, stream=True)
+        return iter(()) if chunks is None else iter_json_array(chunks)
+
     def get(self, thing_id):
         """Get a Thing with a specific ID."""
+        cached = cache.get("thing", thing_id)
+
+        if cached is None:
+            url = f"{self.url}/things/{thing_id}"
+            headers = {"Accept": "application/json"}
+
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.exceptions.Timeout:
+                raise RequestTimeout
+            else:
+                if response.status_code == 200:
+                    cached = response.headers.get("ETag"), response.content
+                    cache.set("thing", thing_id, *cached)
+                elif response.status_code == 404:
+                    raise NotFound
+                elif response.status_code == 429:
+                    raise TooManyRequests
+                else:
+                    raise InternalServerError
+
+        version, body = cached
+        thing = decode_things(body)
+        thing.version = version
+        return thing
+
+    def edit(self, thing_id, name, colour, version=None):
+        """Edit a Thing with a specific ID.
+
+        If version is given the Thing is only changed if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
         url = f"{self.url}/things/{thing_id}"
-        headers = {"Accept": "application/json"}
+        headers = {"Accept": "application/json", "Content-Type": "application/json"}
+        changed_thing = {"name": name, "colour": colour}
+
+        if version:
+            headers["If-Match"] = version
 
         try:
-            response = requests.get(url, headers=headers, timeout=self.timeout)
+            response = self.session.put(
+                url,
+                data=dumps(changed_thing),
+                headers=headers,
+                timeout=self.timeout,
+            )
         except requests.exceptions.Timeout:
             raise RequestTimeout
         else:
             if response.status_code == 200:
-                thing = json.loads(response.text)
-                thing["created_at"] = datetime.strptime(thing["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
-                if thing["updated_at"]:
-                    thing["updated_at"] = datetime.strptime(thing["updated_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
+                thing = decode_things(response.content)
+                thing.version = response.headers.get("ETag")
+                cache.set("thing", thing_id, thing.version, response.content)
+                replica.put("thing", thing)
+                fragments.purge("thing")
                 return thing
             elif response.status_code == 404:
+                cache.delete("thing", thing_id)
+                replica.remove("thing", thing_id)
+                fragments.purge("thing")
                 raise NotFound
+            elif response.status_code == 412:
+                cache.delete("thing", thing_id)
+                fragments.purge("thing")
+                raise PreconditionFailed
+            elif response.status_code == 429:
+                raise TooManyRequests
+            else:
+                raise InternalServerError
+
+    def delete(self, thing_id, version=None):
+        """Delete a Thing with a specific ID.
+
+        If version is given the Thing is only deleted if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
+        url = f"{self.url}/things/{thing_id}"
+        headers = {"Accept": "application/json"}
+
+        if version:
+            headers["If-Match"] = version
+
+        try:
+            response = self.session.delete(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            raise RequestTimeout
+        else:
+            if response.status_code == 204:
+                cache.delete("thing", thing_id)
+                replica.remove("thing", thing_id)
+                fragments.purge("thing")
+                return None
+            elif response.status_code == 404:
+                cache.delete("thing", thing_id)
+                replica.remove("thing", thing_id)
+                fragments.purge("thing")
+                raise NotFound
+            elif response.status_code == 412:
+                cache.delete("thing", thing_id)
+                fragments.purge("thing")
+                raise PreconditionFailed
+            elif response.status_code == 429:
+                raise TooManyRequests
+            else:
+                raise InternalServerError
+
+
+class AsyncThingAPI:
+    def __init__(self, client):
+        self.url = current_app.config["THING_API_URL"]
+        self.timeout = current_app.config["TIMEOUT"]
+        self.client = client
+
+
+class AsyncThing(AsyncThingAPI):
+    """Asyncio version of Thing, for async views that make several upstream calls concurrently."""
+
+    async def create(self, name, colour):
+        """Create a new Thing."""
+        url = f"{self.url}/things"
+        headers = {"Accept": "application/json", "Content-Type": "application/json"}
+        new_thing = {"name": name, "colour": colour}
+
+        try:
+            response = await self.client.post(url, content=dumps(new_thing), headers=headers, timeout=self.timeout)
+        except httpx.TimeoutException:
+            raise RequestTimeout
+        else:
+            if response.status_code == 201:
+                thing = decode_things(response.content)
+                thing.version = response.headers.get("ETag")
+                cache.set("thing", thing.id, thing.version, response.content)
+                replica.put("thing", thing)
+                fragments.purge("thing")
+                return thing
+            elif response.status_code == 429:
+                raise TooManyRequests
+            else:
+                raise InternalServerError
+
+    async def list(self, filters, page=None, per_page=None):
+        """Get a list of Things."""
+        if page:
+            filters = dict(filters, page=page, per_page=per_page)
+
+        url = f"{self.url}/things"
+        headers = {"Accept": "application/json"}
+
+        try:
+            response = await self.client.get(url, params=filters, headers=headers, timeout=self.timeout)
+        except httpx.TimeoutException:
+            raise RequestTimeout
+        else:
+            if response.status_code == 200:
+                return decode_things(response.content)
+            elif response.status_code == 204:
+                return None
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
 
-    def edit(self, thing_id, name, colour):
-        """Edit a Thing with a specific ID."""
+    async def get(self, thing_id):
+        """Get a Thing with a specific ID."""
+        cached = cache.get("thing", thing_id)
+
+        if cached is None:
+            url = f"{self.url}/things/{thing_id}"
+            headers = {"Accept": "application/json"}
+
+            try:
+                response = await self.client.get(url, headers=headers, timeout=self.timeout)
+            except httpx.TimeoutException:
+                raise RequestTimeout
+            else:
+                if response.status_code == 200:
+                    cached = response.headers.get("ETag"), response.content
+                    cache.set("thing", thing_id, *cached)
+                elif response.status_code == 404:
+                    raise NotFound
+                elif response.status_code == 429:
+                    raise TooManyRequests
+                else:
+                    raise InternalServerError
+
+        version, body = cached
+        thing = decode_things(body)
+        thing.version = version
+        return thing
+
+    async def edit(self, thing_id, name, colour, version=None):
+        """Edit a Thing with a specific ID.
+
+        If version is given the Thing is only changed if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
         url = f"{self.url}/things/{thing_id}"
         headers = {"Accept": "application/json", "Content-Type": "application/json"}
         changed_thing = {"name": name, "colour": colour}
 
+        if version:
+            headers["If-Match"] = version
+
         try:
-            response = requests.put(
+            response = await self.client.put(
                 url,
-                data=json.dumps(changed_thing),
+                content=dumps(changed_thing),
                 headers=headers,
                 timeout=self.timeout,
             )
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise RequestTimeout
         else:
             if response.status_code == 200:
-                thing = json.loads(response.text)
-                thing["created_at"] = datetime.strptime(thing["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
-                if thing["updated_at"]:
-                    thing["updated_at"] = datetime.strptime(thing["updated_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
+                thing = decode_things(response.content)
+                thing.version = response.headers.get("ETag")
+                cache.set("thing", thing_id, thing.version, response.content)
+                replica.put("thing", thing)
+                fragments.purge("thing")
                 return thing
             elif response.status_code == 404:
+                cache.delete("thing", thing_id)
+                replica.remove("thing", thing_id)
+                fragments.purge("thing")
                 raise NotFound
+            elif response.status_code == 412:
+                cache.delete("thing", thing_id)
+                fragments.purge("thing")
+                raise PreconditionFailed
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
 
-    def delete(self, thing_id):
-        """Delete a Thing with a specific ID."""
+    async def delete(self, thing_id, version=None):
+        """Delete a Thing with a specific ID.
+
+        If version is given the Thing is only deleted if it is still at that version, otherwise PreconditionFailed
+        is raised.
+        """
         url = f"{self.url}/things/{thing_id}"
         headers = {"Accept": "application/json"}
 
+        if version:
+            headers["If-Match"] = version
+
         try:
-            response = requests.delete(url, headers=headers, timeout=self.timeout)
-        except requests.exceptions.Timeout:
+            response = await self.client.delete(url, headers=headers, timeout=self.timeout)
+        except httpx.TimeoutException:
             raise RequestTimeout
         else:
             if response.status_code == 204:
+                cache.delete("thing", thing_id)
+                replica.remove("thing", thing_id)
+                fragments.purge("thing")
                 return None
             elif response.status_code == 404:
+                cache.delete("thing", thing_id)
+                replica.remove("thing", thing_id)
+                fragments.purge("thing")
                 raise NotFound
+            elif response.status_code == 412:
+                cache.delete("thing", thing_id)
+                fragments.purge("thing")
+                raise PreconditionFailed
             elif response.status_code == 429:
                 raise TooManyRequests
             else:
                 raise InternalServerError
+
+    async def bulk_create(self, things, concurrency):
+        """Create many Things from dicts of name and colour, at most concurrency at once.
+
+        Returns a BulkResult for each, in order, with the created Thing or the reason it failed.
+        """
+        return await run_bounded(
+            lambda thing: self.create(name=thing["name"], colour=thing["colour"]), things, concurrency
+        )
+
+    async def bulk_delete(self, thing_ids, concurrency):
+        """Delete many Things by ID, at most concurrency at once, returning a BulkResult for each."""
+        return await run_bounded(self.delete, thing_ids, concurrency)
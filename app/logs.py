@@ -0,0 +1,189 @@
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+from app.integrations.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Attributes of every LogRecord, so the formatter can tell which were added as extra fields
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format a record as one line of JSON, with any extra fields, such as the request's route and status."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((name, value) for name, value in vars(record).items() if name not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return dumps(entry, default=repr).decode()
+
+
+class RepeatFilter(logging.Filter):
+    """Let through at most limit identical warnings or errors per window of seconds, counting those dropped.
+
+    Records are identical if they come from the same logger and level with the same message format and status,
+    so a flood of 404s for different URLs counts as one error repeated. The next record let through after some
+    were dropped carries their number as suppressed.
+    """
+
+    def __init__(self, limit=10, window=60, max_keys=1024):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.levelno, str(record.msg), getattr(record, "status", None))
+        now = time.monotonic()
+        with self.lock:
+            started, count, suppressed = self.seen.get(key, (now, 0, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            if count >= self.limit:
+                self.seen[key] = (started, count, suppressed + 1)
+                return False
+            if len(self.seen) >= self.max_keys and key not in self.seen:
+                self.seen.clear()
+            self.seen[key] = (started, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """Put records on a queue without blocking, adding the current request's details while they are to hand.
+
+    A full queue drops records rather than holding up the request, and the next record queued carries the number
+    dropped.
+    """
+
+    def __init__(self, logs):
+        super().__init__(None)
+        self.logs = logs
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Tracebacks are formatted by the listener; the record isn't pickled, so exc_info can be kept
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if has_request_context():
+            if not hasattr(record, "route"):
+                record.route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            record.method = request.method
+            record.path = request.path
+            if "request_start" in g and not hasattr(record, "latency_ms"):
+                record.latency_ms = round((time.perf_counter() - g.request_start) * 1000, 1)
+            if g.get("upstream_timings"):
+                record.upstream = [
+                    {"call": description, "ms": round(seconds * 1000, 1)} for description, seconds in g.upstream_timings
+                ]
+        return record
+
+    def enqueue(self, record):
+        dropped = self.dropped
+        if dropped:
+            record.dropped = dropped
+        try:
+            self.logs.current_queue().put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped -= dropped
+
+
+class DrainingListener(logging.handlers.QueueListener):
+    """A queue listener that, when stopped, waits for room to queue its stop signal behind the records left."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class QueuedLogging:
+    """Write the app's logs as JSON lines to stderr from a background thread, so requests don't wait on the write.
+
+    Each process has its own queue and listener thread, started by the first record it logs, as threads don't
+    survive a fork. The listener is stopped, writing out everything queued, when a Gunicorn worker exits or the
+    interpreter shuts down.
+    """
+
+    def __init__(self, app=None):
+        self.pid = None
+        self.records = None
+        self.listener = None
+        self.lock = threading.Lock()
+        self.handler = RequestQueueHandler(self)
+        self.filter = RepeatFilter()
+        self.handler.addFilter(self.filter)
+        self.sample_rate = 1.0
+        self.queue_size = 10000
+        atexit.register(self.stop)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = app.config["LOG_REQUEST_SAMPLE_RATE"]
+        self.queue_size = app.config["LOG_QUEUE_SIZE"]
+        self.filter.limit = app.config["LOG_REPEAT_LIMIT"]
+        self.filter.window = app.config["LOG_REPEAT_WINDOW"]
+        # Replace the handlers of any app created before, rather than writing each record once per app
+        app.logger.handlers = [self.handler]
+        app.logger.setLevel(app.config["LOG_LEVEL"])
+        app.after_request(self.log_request)
+        app.extensions["logs"] = self
+
+    def current_queue(self):
+        """Get this process's queue, starting its listener thread if it hasn't been."""
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    output = logging.StreamHandler()
+                    output.setFormatter(JSONFormatter())
+                    self.records = queue.Queue(self.queue_size)
+                    self.listener = DrainingListener(self.records, output)
+                    self.listener.start()
+                    self.pid = os.getpid()
+        return self.records
+
+    def stop(self):
+        """Write out every queued record and stop this process's listener thread."""
+        with self.lock:
+            if self.listener is not None and self.pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self.pid = None
+
+    def log_request(self, response):
+        """Log a sample of requests, with their route, status, latency and upstream calls.
+
+        Only LOG_REQUEST_SAMPLE_RATE of requests are logged, so busy workers don't write a line for every one.
+        Errors are logged by their handlers whether or not the request is sampled.
+        """
+        if random.random() < self.sample_rate:  # nosec B311 - not used for security
+            logger.info(
+                "%s %s %s", request.method, request.path, response.status_code, extra={"status": response.status_code}
+            )
+        return response
@@ -1,5 +1,9 @@
 from flask import Blueprint
 
+from app import limiter
+from app.rate_limit import limit_blueprint
+
 bp = Blueprint("main", __name__, template_folder="../templates/main")
+limit_blueprint(limiter, bp)
 
 from app.main import routes  # noqa: E402,F401
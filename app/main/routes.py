@@ -1,14 +1,37 @@
+import asyncio
+
 from flask import current_app, flash, json, make_response, redirect, render_template, request
 from flask_wtf.csrf import CSRFError
 from werkzeug.exceptions import HTTPException
 
+from app import pool
+from app.integrations.point_api import AsyncPoint
+from app.integrations.thing_api import AsyncThing
 from app.main import bp
 from app.main.forms import CookiesForm
 
 
+def preview(result):
+    """Get the records in an upstream list result, or None if it couldn't be fetched."""
+    if isinstance(result, Exception):
+        current_app.logger.warning("Dashboard preview unavailable: {!r}".format(result))
+        return None
+    return list(result) if result else []
+
+
 @bp.route("/", methods=["GET"])
-def index():
-    return render_template("main/index.html")
+async def index():
+    # Fetch a few things and points concurrently rather than one after the other. The upstream APIs don't report
+    # totals, so the dashboard previews the first records instead of counting pages it would have to fetch
+    per_page = current_app.config["DASHBOARD_PREVIEW_SIZE"]
+    async with pool.async_client() as client:
+        things, points = await asyncio.gather(
+            AsyncThing(client).list(filters={}, page=1, per_page=per_page),
+            AsyncPoint(client).list(filters={}, page=1, per_page=per_page),
+            return_exceptions=True,
+        )
+
+    return render_template("main/index.html", things=preview(things), points=preview(points))
 
 
 @bp.route("/cookies", methods=["GET", "POST"])
@@ -51,12 +74,14 @@ def privacy():
 
 @bp.app_errorhandler(HTTPException)
 def http_exception(error):
-    current_app.logger.error("{}: {} - {}".format(error.code, error.name, request.url))
-    return render_template("error.html", title=error.name, error=error), error.code
+    current_app.logger.error("%s: %s - %s", error.code, error.name, request.url, extra={"status": error.code})
+    # Keep headers such as Retry-After and Allow, but not the plain text Content-Type
+    headers = [(name, value) for name, value in error.get_headers() if name != "Content-Type"]
+    return render_template("error.html", title=error.name, error=error), error.code, headers
 
 
 @bp.app_errorhandler(CSRFError)
 def csrf_error(error):
-    current_app.logger.error("{}: {} - {}".format(error.code, error.description, request.url))
+    current_app.logger.error("%s: %s - %s", error.code, error.description, request.url, extra={"status": error.code})
     flash("The form you were submitting has expired. Please try again.", "info")
     return redirect(request.full_path)
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+from flask import Response, current_app, g, has_request_context, request
+from jinja2 import Template
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+UUID_SEGMENT = re.compile(r"/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time taken to handle a request.",
+    ["route", "method", "status"],
+)
+UPSTREAM_DURATION = Histogram(
+    "upstream_request_duration_seconds",
+    "Time taken by an upstream API call, until the response headers were received.",
+    ["upstream", "operation", "method", "status"],
+)
+TEMPLATE_DURATION = Histogram(
+    "template_render_duration_seconds",
+    "Time taken to render a template.",
+    ["template"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups, by cache and whether they were a hit or a miss.",
+    ["cache", "result"],
+)
+BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state changes.",
+    ["upstream", "from_state", "to_state"],
+)
+BREAKER_OPEN = Gauge(
+    "circuit_breaker_open",
+    "Whether a circuit breaker is open (1) or not (0), per live worker.",
+    ["upstream"],
+    multiprocess_mode="liveall",
+)
+# Rate limit checks are mostly in-process, so need finer buckets than the defaults
+RATE_LIMIT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+RATE_LIMIT_DURATION = Histogram(
+    "rate_limit_check_duration_seconds",
+    "Time added to a request by checking its rate limits.",
+    ["strategy"],
+    buckets=RATE_LIMIT_BUCKETS,
+)
+RATE_LIMIT_SYNC_DURATION = Histogram(
+    "rate_limit_sync_duration_seconds",
+    "Time taken by a pipelined sync of token bucket rate limits to Redis.",
+    buckets=RATE_LIMIT_BUCKETS,
+)
+
+
+def upstream_operation(upstream, url):
+    """Get a low cardinality name for an upstream call, such as "/things/{id}", from its URL."""
+    path = urlsplit(url).path
+    base_path = urlsplit(upstream).path
+    if path.startswith(base_path):
+        path = path[len(base_path) :]
+    return UUID_SEGMENT.sub("/{id}", path) or "/"
+
+
+def record_upstream(upstream, method, url, status, seconds):
+    """Record the duration of an upstream call, and add it to the current request's Server-Timing."""
+    operation = upstream_operation(upstream, url)
+    UPSTREAM_DURATION.labels(upstream, operation, method, status).observe(seconds)
+    if has_request_context():
+        g.setdefault("upstream_timings", []).append((f"{method} {operation} {status}", seconds))
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_breaker_transition(upstream, from_state, to_state):
+    BREAKER_TRANSITIONS.labels(upstream, from_state, to_state).inc()
+    BREAKER_OPEN.labels(upstream).set(1 if to_state == "open" else 0)
+
+
+def record_rate_limit(strategy, seconds):
+    """Record the time taken to check a request's rate limits, and add it to the request's Server-Timing."""
+    RATE_LIMIT_DURATION.labels(strategy).observe(seconds)
+    if has_request_context():
+        g.rate_limit_seconds = g.get("rate_limit_seconds", 0) + seconds
+
+
+def record_rate_limit_sync(seconds):
+    RATE_LIMIT_SYNC_DURATION.observe(seconds)
+
+
+class TimedTemplate(Template):
+    """A template that records how long it takes to render."""
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            TEMPLATE_DURATION.labels(self.name or "<string>").observe(seconds)
+            if has_request_context():
+                g.template_seconds = g.get("template_seconds", 0) + seconds
+
+
+def metrics():
+    """Get metrics in the Prometheus text format, aggregated across all workers in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+class Metrics:
+    """Time requests, upstream calls and template rendering, for Server-Timing headers and Prometheus metrics."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.jinja_env.template_class = TimedTemplate
+        # Start timing before any other extension's before_request handlers, which may abort the request
+        app.before_request_funcs.setdefault(None, []).insert(0, self.start_timer)
+        app.after_request(self.record_request)
+        if app.config["METRICS_ENABLED"]:
+            app.add_url_rule("/metrics", "metrics", metrics)
+        app.extensions["metrics"] = self
+
+    @staticmethod
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @staticmethod
+    def record_request(response):
+        if "request_start" not in g:
+            return response
+        seconds = time.perf_counter() - g.request_start
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        REQUEST_DURATION.labels(route, request.method, response.status_code).observe(seconds)
+
+        if current_app.config["SERVER_TIMING_ENABLED"]:
+            timings = [
+                f'upstream;desc="{description}";dur={duration * 1000:.1f}'
+                for description, duration in g.get("upstream_timings", [])
+            ]
+            if "rate_limit_seconds" in g:
+                timings.append(f"ratelimit;dur={g.rate_limit_seconds * 1000:.1f}")
+            if "template_seconds" in g:
+                timings.append(f"render;dur={g.template_seconds * 1000:.1f}")
+            timings.append(f"total;dur={seconds * 1000:.1f}")
+            response.headers["Server-Timing"] = ", ".join(timings)
+        return response
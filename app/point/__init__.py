@@ -1,5 +1,9 @@
 from flask import Blueprint
 
+from app import limiter
+from app.rate_limit import limit_blueprint
+
 bp = Blueprint("point", __name__, template_folder="../templates/point")
+limit_blueprint(limiter, bp)
 
 from app.point import routes  # noqa: E402,F401
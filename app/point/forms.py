@@ -1,6 +1,66 @@
+import csv
+import io
+import uuid
+
+from flask import current_app
 from flask_wtf import FlaskForm
-from wtforms import HiddenField, SelectField, StringField
-from wtforms.validators import InputRequired, Length, Optional
+from flask_wtf.file import FileAllowed, FileField, FileRequired
+from wtforms import HiddenField, SelectField, SelectMultipleField, StringField
+from wtforms.validators import InputRequired, Length, Optional, ValidationError
+
+from app.integrations.serialization import loads
+
+
+def import_row(row, name, longitude, latitude):
+    """Check an imported Point as PointForm would, returning a dict of its row, name, GeoJSON geometry and any error."""
+    point = {"row": row, "name": (name or "").strip(), "geometry": None}
+    try:
+        longitude, latitude = float(longitude), float(latitude)
+    except (TypeError, ValueError):
+        longitude = latitude = None
+
+    if not point["name"]:
+        point["error"] = "Enter a name"
+    elif len(point["name"]) > 32:
+        point["error"] = "Name must be 32 characters or fewer"
+    elif longitude is None or not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+        point["error"] = "Enter a longitude and latitude"
+    else:
+        point["geometry"] = {"type": "Point", "coordinates": [longitude, latitude]}
+    return point
+
+
+def read_csv(text):
+    try:
+        reader = csv.DictReader(io.StringIO(text))
+        if not {"name", "longitude", "latitude"} <= set(reader.fieldnames or []):
+            raise ValidationError("The selected file must have name, longitude and latitude columns")
+        return [
+            import_row(reader.line_num, record.get("name"), record.get("longitude"), record.get("latitude"))
+            for record in reader
+        ]
+    except csv.Error:
+        raise ValidationError("The selected file must be a valid CSV")
+
+
+def read_geojson(text):
+    try:
+        collection = loads(text)
+        features = collection["features"] if collection.get("type") == "FeatureCollection" else None
+    except (ValueError, AttributeError, KeyError):
+        features = None
+    if not isinstance(features, list):
+        raise ValidationError("The selected file must be a GeoJSON FeatureCollection")
+
+    rows = []
+    for row, feature in enumerate(features, start=1):
+        geometry = (feature.get("geometry") or {}) if isinstance(feature, dict) else {}
+        properties = (feature.get("properties") or {}) if isinstance(feature, dict) else {}
+        coordinates = geometry.get("coordinates") if geometry.get("type") == "Point" else None
+        if not isinstance(coordinates, list) or len(coordinates) < 2:
+            coordinates = [None, None]
+        rows.append(import_row(row, properties.get("name"), coordinates[0], coordinates[1]))
+    return rows
 
 
 class PointForm(FlaskForm):
@@ -17,6 +77,17 @@ class PointForm(FlaskForm):
         validators=[InputRequired(message="Select a location")],
         description="Click on the map to add a location.",
     )
+    version = HiddenField("Version", validators=[Optional()])
+
+    def validate_location(self, field):
+        """Decode the GeoJSON geometry set by the map once, for the API client to send as it is."""
+        try:
+            self.geometry = loads(field.data)
+            coordinates = self.geometry["coordinates"] if self.geometry.get("type") == "Point" else None
+        except (ValueError, AttributeError, KeyError):
+            coordinates = None
+        if not isinstance(coordinates, list) or len(coordinates) < 2:
+            raise ValidationError("Select a location")
 
 
 class PointFilterForm(FlaskForm):
@@ -27,3 +98,49 @@ class PointFilterForm(FlaskForm):
         default="name",
     )
     name = StringField("Name", validators=[Optional()])
+    per_page = SelectField(
+        "Results per page",
+        validators=[Optional()],
+        choices=[(10, "10"), (25, "25"), (50, "50"), (100, "100")],
+        coerce=int,
+        default=25,
+    )
+
+
+class PointImportForm(FlaskForm):
+    file = FileField(
+        "CSV or GeoJSON file",
+        validators=[
+            FileRequired(message="Select a CSV or GeoJSON file"),
+            FileAllowed(["csv", "geojson", "json"], message="The selected file must be a CSV or GeoJSON"),
+        ],
+        description="A CSV with name, longitude and latitude columns, or a GeoJSON FeatureCollection of named points.",
+    )
+
+    def validate_file(self, field):
+        """Read the uploaded CSV or GeoJSON into rows, each a dict of row number, name and geometry, or an error."""
+        try:
+            text = field.data.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValidationError("The selected file must be UTF-8 encoded")
+
+        self.rows = read_csv(text) if field.data.filename.lower().endswith(".csv") else read_geojson(text)
+        if not self.rows:
+            raise ValidationError("The selected file is empty")
+        if len(self.rows) > current_app.config["BULK_MAX_ITEMS"]:
+            raise ValidationError(f"The selected file must have {current_app.config['BULK_MAX_ITEMS']} points or fewer")
+
+
+class BulkDeleteForm(FlaskForm):
+    ids = SelectMultipleField(
+        "Points",
+        validators=[InputRequired(message="Select the points to delete")],
+        choices=[],
+        coerce=uuid.UUID,
+        validate_choice=False,
+    )
+
+
+class PointDeleteForm(FlaskForm):
+    name = HiddenField("Name", validators=[Optional()])
+    version = HiddenField("Version", validators=[Optional()])
@@ -0,0 +1,75 @@
+import math
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.0511287798
+
+
+def parse_bbox(value):
+    """Parse a "west,south,east,north" bounding box, as sent by Leaflet's LatLngBounds.toBBoxString()."""
+    west, south, east, north = (float(part) for part in value.split(","))
+    if not all(math.isfinite(part) for part in (west, south, east, north)) or west > east or south > north:
+        raise ValueError(f"Invalid bounding box: {value}")
+    return west, south, east, north
+
+
+def project(longitude, latitude, zoom):
+    """Get the Web Mercator pixel position of a coordinate at a zoom level."""
+    scale = TILE_SIZE * 2**zoom
+    latitude = math.radians(max(min(latitude, MAX_LATITUDE), -MAX_LATITUDE))
+    x = (longitude + 180) / 360 * scale
+    y = (1 - math.log(math.tan(latitude) + 1 / math.cos(latitude)) / math.pi) / 2 * scale
+    return x, y
+
+
+def map_layer(points, bbox=None, zoom=None, precision=5, cell_size=64, max_cluster_zoom=15):
+    """Get the compact map layer for a FeatureCollection.
+
+    Only points inside bbox are included. Below max_cluster_zoom, points sharing a grid cell of cell_size
+    pixels are merged into a cluster at their centroid. Coordinates are flat arrays of longitude, latitude
+    pairs rounded to precision decimal places, and bounds covers every included point.
+    """
+    # A bounding box a whole world wide or more may have wrapped past the antimeridian, so only latitude is checked
+    check_longitude = bbox is not None and bbox[2] - bbox[0] < 360
+    cluster = zoom is not None and zoom < max_cluster_zoom
+    coordinates = points.coordinates
+    included = []
+    for index in range(len(points)):
+        longitude, latitude = coordinates[2 * index], coordinates[2 * index + 1]
+        if bbox is not None:
+            if check_longitude and not bbox[0] <= longitude <= bbox[2]:
+                continue
+            if not bbox[1] <= latitude <= bbox[3]:
+                continue
+        included.append(index)
+
+    if cluster:
+        cells = {}
+        for index in included:
+            x, y = project(coordinates[2 * index], coordinates[2 * index + 1], zoom)
+            cells.setdefault((int(x // cell_size), int(y // cell_size)), []).append(index)
+        groups = cells.values()
+    else:
+        groups = [[index] for index in included]
+
+    data = {"ids": [], "names": [], "coordinates": [], "clusters": {"counts": [], "coordinates": []}}
+    for group in groups:
+        longitude = sum(coordinates[2 * index] for index in group) / len(group)
+        latitude = sum(coordinates[2 * index + 1] for index in group) / len(group)
+        if len(group) == 1:
+            data["ids"].append(str(points.ids[group[0]]))
+            data["names"].append(points.names[group[0]])
+            target = data["coordinates"]
+        else:
+            data["clusters"]["counts"].append(len(group))
+            target = data["clusters"]["coordinates"]
+        target.append(round(longitude, precision))
+        target.append(round(latitude, precision))
+
+    if included:
+        longitudes = [coordinates[2 * index] for index in included]
+        latitudes = [coordinates[2 * index + 1] for index in included]
+        bounds = (min(longitudes), min(latitudes), max(longitudes), max(latitudes))
+        data["bounds"] = [round(bound, precision) for bound in bounds]
+    else:
+        data["bounds"] = None
+    return data
@@ -1,11 +1,28 @@
-import json
+from flask import (
+    Markup,
+    Response,
+    current_app,
+    escape,
+    flash,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
+from werkzeug.exceptions import BadRequest, PreconditionFailed
 
-from flask import Response, flash, redirect, render_template, request, url_for
-
-from app import csrf
-from app.integrations.point_api import Point
+from app import fragments, pool
+from app.conditional import not_modified, page_etag, set_validators
+from app.exports import FORMATS, POINT_COLUMNS, geojson_seq, ndjson, parquet
+from app.integrations.bulk import BulkResult
+from app.integrations.models import FeatureCollection, PointRecord
+from app.integrations.point_api import AsyncPoint, Point
+from app.integrations.serialization import dumps
 from app.point import bp
-from app.point.forms import PointFilterForm, PointForm
+from app.point.forms import BulkDeleteForm, PointDeleteForm, PointFilterForm, PointForm, PointImportForm
+from app.point.map_data import map_layer, parse_bbox
 
 
 @bp.route("/", methods=["GET", "POST"])
@@ -21,9 +38,51 @@ def list():
         filters["name"] = request.args.get("name", type=str)
         form.name.data = filters["name"]
 
-    points = Point().list(filters=filters)
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = request.args.get("per_page", current_app.config["PAGE_SIZE"], type=int)
+    per_page = max(min(per_page, current_app.config["MAX_PAGE_SIZE"]), 1)
+    form.per_page.data = per_page
+
+    upstream_etag, render_table = list_table(filters, page, per_page)
+
+    etag = page_etag(upstream_etag)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    table = Markup(render_table())
+    response = make_response(render_template("list_points.html", title="Points", table=table, form=form))
+    return set_validators(response, etag)
 
-    return render_template("list_points.html", title="Points", points=points, form=form)
+
+def list_table(filters, page, per_page):
+    """Get the upstream ETag of a page of Points and a function rendering its table, using cached fragments.
+
+    The page is fetched now, but only rendered and cached when the function is called, so a request answered with
+    304 Not Modified doesn't render a table it won't send.
+    """
+    key = fragments.key("point", page=page, per_page=per_page, **filters)
+    fragment = fragments.get(key)
+    if fragment is not None:
+        upstream_etag, table = fragment
+        return upstream_etag, lambda: table
+
+    client = Point()
+    points = client.list(filters=filters, page=page, per_page=per_page)
+
+    def render_table():
+        table = render_template(
+            "_point_table.html",
+            points=points,
+            filters=filters,
+            query=dict(filters, per_page=per_page),
+            page=page,
+            has_next=points is not None and len(points) == per_page,
+        )
+        fragments.set(key, client.etag, table)
+        return table
+
+    return client.etag, render_table
 
 
 @bp.route("/new", methods=["GET", "POST"])
@@ -32,11 +91,11 @@ def create():
     form = PointForm()
 
     if form.validate_on_submit():
-        new_point = Point().create(name=form.name.data, geometry=form.location.data)
+        new_point = Point().create(name=form.name.data, geometry=form.geometry)
         flash(
             "<a href='{}' class='alert-link'>{}</a> has been created.".format(
-                url_for("point.view", id=new_point["id"]),
-                new_point["properties"]["name"],
+                url_for("point.view", id=new_point.id),
+                new_point.name,
             ),
             "success",
         )
@@ -50,65 +109,188 @@ def view(id):
     """Get a Point with a specific ID."""
     point = Point().get(id)
 
-    return render_template("view_point.html", title=point["properties"]["name"], point=point)
+    etag = page_etag(point.id, point.last_modified)
+    response = not_modified(etag, point.last_modified)
+    if response:
+        return response
+
+    response = make_response(render_template("view_point.html", title=point.name, point=point))
+    return set_validators(response, etag, point.last_modified)
 
 
 @bp.route("/<uuid:id>/edit", methods=["GET", "POST"])
 def edit(id):
     """Edit a Point with a specific ID."""
-    point = Point().get(id)
     form = PointForm()
 
     if form.validate_on_submit():
-        changed_point = Point().edit(point_id=id, name=form.name.data, geometry=form.location.data)
-        flash(
-            "Your changes to <a href='{}' class='alert-link'>{}</a> have been saved.".format(
-                url_for("point.view", id=changed_point["id"]),
-                changed_point["properties"]["name"],
-            ),
-            "success",
-        )
-        return redirect(url_for("point.list"))
-    elif request.method == "GET":
-        form.name.data = point["properties"]["name"]
-        form.location.data = json.dumps(point["geometry"])
+        # The version the form was opened at is sent as If-Match, so the change needs no pre-fetch
+        # and can't overwrite someone else's
+        try:
+            changed_point = Point().edit(
+                point_id=id, name=form.name.data, geometry=form.geometry, version=form.version.data
+            )
+        except PreconditionFailed:
+            point = Point().get(id)
+            form.version.data = point.version
+            flash(
+                "<a href='{}' class='alert-link'>{}</a> has been changed since you opened it, so your changes "
+                "haven't been saved. Save them again to replace the current details.".format(
+                    url_for("point.view", id=id), escape(point.name)
+                ),
+                "warning",
+            )
+        else:
+            flash(
+                "Your changes to <a href='{}' class='alert-link'>{}</a> have been saved.".format(
+                    url_for("point.view", id=changed_point.id), changed_point.name
+                ),
+                "success",
+            )
+            return redirect(url_for("point.list"))
+    else:
+        point = Point().get(id)
+        if request.method == "GET":
+            form.name.data = point.name
+            form.location.data = dumps(point.geometry).decode()
+            form.version.data = point.version
 
     return render_template(
         "update_point.html",
-        title=f"Edit {point['properties']['name']}",
+        title=f"Edit {point.name}",
         form=form,
         point=point,
     )
 
 
 @bp.route("/<uuid:id>/delete", methods=["GET", "POST"])
-@csrf.exempt
 def delete(id):
     """Delete a Point with a specific ID."""
+    form = PointDeleteForm()
+
+    if form.validate_on_submit():
+        try:
+            Point().delete(id, version=form.version.data)
+        except PreconditionFailed:
+            flash(
+                "{} has been changed since you opened it, so it hasn't been deleted. "
+                "Check the current details before deleting it.".format(escape(form.name.data)),
+                "warning",
+            )
+            return redirect(url_for("point.view", id=id))
+        flash(f"{escape(form.name.data)} has been deleted.", "success")
+        return redirect(url_for("point.list"))
+
     point = Point().get(id)
+    form.name.data = point.name
+    form.version.data = point.version
+    return render_template(
+        "delete_point.html",
+        title=f"Delete {point.name}",
+        point=point,
+        form=form,
+    )
 
+
+@bp.route("/delete", methods=["GET", "POST"])
+async def bulk_delete():
+    """Delete the selected Points, after confirmation."""
     if request.method == "GET":
-        return render_template(
-            "delete_point.html",
-            title=f"Delete {point['properties']['name']}",
-            point=point,
-        )
-    elif request.method == "POST":
-        Point().delete(id)
-        flash(f"{point['properties']['name']} has been deleted.", "success")
-        return redirect(url_for("point.list"))
+        # The list's checkboxes are submitted by GET, so the cached table needs no CSRF token
+        form = BulkDeleteForm(formdata=request.args)
+        if not form.ids.validate(form):
+            flash(form.ids.errors[0], "danger")
+            return redirect(url_for("point.list"))
+    else:
+        form = BulkDeleteForm()
+
+    if form.validate_on_submit():
+        async with pool.async_client() as client:
+            results = await AsyncPoint(client).bulk_delete(form.ids.data, current_app.config["BULK_CONCURRENCY"])
+        return render_template("bulk_results.html", title="Delete points", blueprint="point", results=results)
+
+    return render_template("delete_points.html", title="Delete points", form=form)
+
+
+@bp.route("/import", methods=["GET", "POST"])
+async def bulk_import():
+    """Create Points from an uploaded file, reporting the outcome of each row."""
+    form = PointImportForm()
+
+    if form.validate_on_submit():
+        valid = [row for row in form.rows if "error" not in row]
+        results = [BulkResult(row, error=row["error"]) for row in form.rows if "error" in row]
+        async with pool.async_client() as client:
+            results += await AsyncPoint(client).bulk_create(valid, current_app.config["BULK_CONCURRENCY"])
+        results.sort(key=lambda result: result.item["row"])
+        return render_template("bulk_results.html", title="Import points", blueprint="point", results=results)
+
+    return render_template("import_points.html", title="Import points", form=form)
 
 
 @bp.route("/download", methods=["GET"])
 def download():
-    """Download a list of Points."""
+    """Download a list of Points as CSV, newline-delimited JSON, a GeoJSON text sequence or Parquet."""
     filters = {}
     if request.args.get("sort"):
         filters["sort"] = request.args.get("sort", type=str)
     if request.args.get("name"):
         filters["name"] = request.args.get("name", type=str)
 
-    points = Point().list(filters=filters, format="csv")
-    response = Response(points, mimetype="text/csv", status=200)
-    response.headers.set("Content-Disposition", "attachment", filename="points.csv")
+    format = request.args.get("format", "csv", type=str)
+    if format not in ("csv", "ndjson", "geojsonseq", "parquet"):
+        raise BadRequest("The format parameter must be csv, ndjson, geojsonseq or parquet.")
+
+    if format == "csv":
+        body = Point().list(filters=filters, format="csv", stream=True)
+    else:
+        # Each point is written out as it is decoded from the streamed list, so memory stays bounded
+        points = Point().stream(filters)
+        batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+        if format == "ndjson":
+            body = ndjson(points, batch_size)
+        elif format == "geojsonseq":
+            body = geojson_seq(points, batch_size)
+        else:
+            body = parquet(map(PointRecord.from_json, points), POINT_COLUMNS, batch_size)
+
+    mimetype, extension = FORMATS[format]
+    response = Response(body, mimetype=mimetype, status=200)
+    response.headers.set("Content-Disposition", "attachment", filename=f"points.{extension}")
     return response
+
+
+@bp.route("/map-data", methods=["GET"])
+def map_data():
+    """Get the map layer for a list of Points, optionally limited to a bounding box and clustered for a zoom level."""
+    filters = {}
+    if request.args.get("sort"):
+        filters["sort"] = request.args.get("sort", type=str)
+    if request.args.get("name"):
+        filters["name"] = request.args.get("name", type=str)
+
+    try:
+        bbox = parse_bbox(request.args["bbox"]) if request.args.get("bbox") else None
+    except ValueError:
+        raise BadRequest("The bbox parameter must be west,south,east,north.")
+    zoom = request.args.get("zoom", type=int)
+    if zoom is not None:
+        zoom = max(min(zoom, 24), 0)
+
+    client = Point()
+    points = client.collection(filters, bbox=bbox) or FeatureCollection()
+
+    etag = page_etag(client.etag, bbox, zoom)
+    response = not_modified(etag, mimetype="application/json")
+    if response:
+        return response
+
+    layer = map_layer(
+        points,
+        bbox=bbox,
+        zoom=zoom,
+        precision=current_app.config["MAP_COORDINATE_PRECISION"],
+        cell_size=current_app.config["MAP_CLUSTER_CELL_SIZE"],
+        max_cluster_zoom=current_app.config["MAP_CLUSTER_MAX_ZOOM"],
+    )
+    return set_validators(jsonify(layer), etag)
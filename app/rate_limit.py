@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+
+import redis
+from flask import current_app
+from flask_limiter import Limiter
+from limits.storage import RedisStorage
+from limits.strategies import STRATEGIES, RateLimiter
+
+from app.metrics import record_rate_limit, record_rate_limit_sync
+
+logger = logging.getLogger(__name__)
+
+# Refill a shared bucket by the time elapsed on the Redis server's clock, take the hits a worker made since its
+# last sync and return the tokens left. Buckets go into debt, up to their capacity, for hits over the limit that
+# were let through before a sync, so the limit is kept to over time.
+SYNC_SCRIPT = """
+local capacity, rate, hits = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = capacity
+if bucket[1] then
+    tokens = math.min(capacity, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+end
+tokens = math.max(tokens - hits, -capacity)
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(tokens)
+"""
+
+
+class Bucket:
+    """A token bucket for one rate limit and key, holding up to capacity tokens and refilling at rate per second."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated", "pending")
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        # Hits taken from this bucket that haven't been synced to Redis yet
+        self.pending = 0
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class TokenBucketRateLimiter(RateLimiter):
+    """Check rate limits against token buckets held in each worker, synced to Redis in the background.
+
+    Every limit, such as "60 per minute", is a bucket of 60 tokens refilling at one a second, so a request
+    is checked without a network round trip. A background thread sends the hits each worker has taken to shared
+    buckets in Redis in one pipeline every RATELIMIT_SYNC_INTERVAL seconds, or sooner once a bucket has
+    RATELIMIT_SYNC_MAX_PENDING unsynced hits, and refills its local buckets from the shared ones. A worker therefore
+    sees the hits of other workers at most one sync interval late, which bounds how far over a limit all the
+    workers together can go. Without Redis storage, each worker limits on its own.
+    """
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        self.client = storage.storage if isinstance(storage, RedisStorage) else None
+        self.interval = 0.5
+        self.max_pending = 10
+        self.reset()
+
+    def reset(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.pid = os.getpid()
+
+    def start_sync(self):
+        """Start the sync thread in this process, if it hasn't been. Buckets inherited from a parent are discarded."""
+        if self.pid != os.getpid():
+            self.reset()
+        if self.client is None or self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.interval = current_app.config["RATELIMIT_SYNC_INTERVAL"]
+                self.max_pending = current_app.config["RATELIMIT_SYNC_MAX_PENDING"]
+                self.script = self.client.register_script(SYNC_SCRIPT)
+                self.thread = threading.Thread(target=self.run, name="rate-limit-sync", daemon=True)
+                self.thread.start()
+
+    def bucket(self, item, *identifiers):
+        """Get the refilled bucket for a limit and key, creating a full one if needed. Call with the lock held."""
+        key = item.key_for(*identifiers)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket(item.amount, item.amount / item.get_expiry())
+        bucket.refill()
+        return bucket
+
+    def hit(self, item, *identifiers, cost=1):
+        self.start_sync()
+        with self.lock:
+            bucket = self.bucket(item, *identifiers)
+            if bucket.tokens < cost:
+                return False
+            bucket.tokens -= cost
+            bucket.pending += cost
+            if self.client is not None and bucket.pending >= self.max_pending:
+                self.wake.set()
+            return True
+
+    def test(self, item, *identifiers):
+        with self.lock:
+            return self.bucket(item, *identifiers).tokens >= 1
+
+    def get_window_stats(self, item, *identifiers):
+        with self.lock:
+            bucket = self.bucket(item, *identifiers)
+            # The reset time is when the bucket will be full again
+            reset = time.time() + (bucket.capacity - bucket.tokens) / bucket.rate
+            return int(reset), max(int(bucket.tokens), 0)
+
+    def clear(self, item, *identifiers):
+        key = item.key_for(*identifiers)
+        with self.lock:
+            self.buckets.pop(key, None)
+        if self.client is not None:
+            self.client.delete(f"token-bucket/{key}")
+
+    def run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.sync()
+            except redis.RedisError:
+                # The unsynced hits are kept, to be sent with the next sync
+                logger.warning("Rate limit sync failed", exc_info=True)
+
+    def sync(self):
+        """Send every bucket's unsynced hits to Redis in one pipeline, then refill the buckets from Redis."""
+        with self.lock:
+            batch = []
+            for key, bucket in list(self.buckets.items()):
+                bucket.refill()
+                if not bucket.pending and bucket.tokens >= bucket.capacity:
+                    # Idle and full, so nothing to send and the next hit can start from a full bucket again
+                    del self.buckets[key]
+                else:
+                    batch.append((key, bucket, bucket.pending))
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        pipeline = self.client.pipeline(transaction=False)
+        for key, bucket, hits in batch:
+            self.script(keys=[f"token-bucket/{key}"], args=[bucket.capacity, bucket.rate, hits], client=pipeline)
+        results = pipeline.execute()
+        record_rate_limit_sync(time.perf_counter() - start)
+
+        with self.lock:
+            for (key, bucket, hits), tokens in zip(batch, results):
+                bucket.pending -= hits
+                # Hits taken while the pipeline was in flight come out of the shared bucket's tokens too
+                bucket.tokens = float(tokens) - bucket.pending
+                bucket.updated = time.monotonic()
+
+
+STRATEGIES["token-bucket"] = TokenBucketRateLimiter
+
+
+class TimedLimiter(Limiter):
+    """Flask-Limiter, recording how long the rate limits take to check for every request."""
+
+    def _check_request_limit(self, in_middleware=True):
+        start = time.perf_counter()
+        try:
+            super()._check_request_limit(in_middleware)
+        finally:
+            record_rate_limit(self._strategy, time.perf_counter() - start)
+
+
+def limit_blueprint(limiter, blueprint):
+    """Limit every route in a blueprint by its entry in RATELIMIT_BLUEPRINT_LIMITS, instead of the default limits.
+
+    Blueprints without an entry keep the default limits, and those with an entry of None aren't limited at all.
+    """
+
+    def limits():
+        return (
+            current_app.config["RATELIMIT_BLUEPRINT_LIMITS"].get(blueprint.name)
+            or current_app.config["RATELIMIT_DEFAULT"]
+        )
+
+    def exempt():
+        blueprint_limits = current_app.config["RATELIMIT_BLUEPRINT_LIMITS"]
+        return blueprint.name in blueprint_limits and blueprint_limits[blueprint.name] is None
+
+    limiter.limit(limits, exempt_when=exempt)(blueprint)
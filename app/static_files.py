@@ -0,0 +1,93 @@
+import gzip
+import mimetypes
+import os
+
+import brotli
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+# Precompressed variants in order of preference, as (content coding, file suffix)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt", ".html")
+
+
+def init_static_files(app):
+    """Serve static files with their precompressed variants, and add the command that builds them."""
+    app.view_functions["static"] = static
+    app.cli.add_command(build_assets_command)
+
+
+def static(filename):
+    """Serve a static file, using a precompressed variant if the client accepts one and it has been built.
+
+    Files in dist have a content hash in their name, so they are cached by clients and proxies for
+    STATIC_MAX_AGE seconds without revalidation.
+    """
+    static_folder = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if not request.accept_encodings[encoding]:
+            continue
+        path = safe_join(static_folder, filename + suffix)
+        if path and os.path.isfile(path):
+            response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            break
+    if response is None:
+        response = send_from_directory(static_folder, filename, mimetype=mimetype)
+
+    # send_file adds an inline Content-Disposition naming the file, which a static asset has no use for
+    del response.headers["Content-Disposition"]
+    response.vary.add("Accept-Encoding")
+    if filename.startswith("dist/"):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config["STATIC_MAX_AGE"]
+        response.cache_control.immutable = True
+    return response
+
+
+def compress_file(path):
+    """Write .gz and .br variants of a file next to it, unless they wouldn't be smaller.
+
+    Returns the paths of the variants written.
+    """
+    with open(path, "rb") as source:
+        content = source.read()
+
+    written = []
+    for suffix, compressed in (
+        (".gz", gzip.compress(content, compresslevel=9, mtime=0)),
+        (".br", brotli.compress(content, quality=11)),
+    ):
+        if len(compressed) < len(content):
+            with open(path + suffix, "wb") as variant:
+                variant.write(compressed)
+            written.append(path + suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return written
+
+
+def build_assets(app):
+    """Build every asset bundle and precompress every file in the dist directory. Returns the files written."""
+    for bundle in app.jinja_env.assets_environment:
+        bundle.build(force=True)
+
+    written = []
+    for directory, _, files in os.walk(os.path.join(app.static_folder, "dist")):
+        for name in sorted(files):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                written.extend(compress_file(os.path.join(directory, name)))
+    return written
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Build the hashed static asset bundles with precompressed .gz and .br variants."""
+    for path in build_assets(current_app):
+        click.echo(f"Wrote {os.path.relpath(path, current_app.static_folder)}")
@@ -0,0 +1,53 @@
+import time
+
+import click
+import redis
+from flask import current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache, MemcachedBytecodeCache
+
+
+def init_templates(app):
+    """Configure the Jinja bytecode cache, so workers load compiled templates instead of compiling them again.
+
+    The filesystem cache is shared by the workers on a host, and the Redis cache by every worker using REDIS_URL.
+    """
+    cache_type = app.config["TEMPLATE_CACHE_TYPE"]
+    if cache_type == "filesystem":
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["TEMPLATE_CACHE_DIR"])
+    elif cache_type == "redis":
+        # Redis.get(key) and Redis.set(key, value, ex) match the client interface Jinja expects
+        app.jinja_env.bytecode_cache = MemcachedBytecodeCache(
+            redis.Redis.from_url(app.config["CACHE_REDIS_URL"]),
+            prefix="flask-bootstrap-ui-templates:",
+            ignore_memcache_errors=True,
+        )
+    app.cli.add_command(compile_templates_command)
+
+
+def compile_templates(app):
+    """Compile every template the app can load, filling the bytecode cache and this process's template cache.
+
+    Returns the number of templates compiled.
+    """
+    names = app.jinja_env.list_templates(extensions=["html"])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_templates(app):
+    """Compile every template before the worker accepts traffic and log how long it took."""
+    start = time.perf_counter()
+    count = compile_templates(app)
+    app.logger.info("Compiled %d templates in %.0f ms", count, (time.perf_counter() - start) * 1000)
+
+
+@click.command("compile-templates")
+@with_appcontext
+def compile_templates_command():
+    """Precompile every template into the template bytecode cache."""
+    if current_app.jinja_env.bytecode_cache is None:
+        raise click.ClickException("TEMPLATE_CACHE_TYPE is none, so there is no bytecode cache to fill.")
+    count = compile_templates(current_app)
+    click.echo(f"Compiled {count} templates.")
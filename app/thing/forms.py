@@ -1,6 +1,35 @@
+import csv
+import io
+import uuid
+
+from flask import current_app
 from flask_wtf import FlaskForm
-from wtforms import RadioField, SelectField, StringField
-from wtforms.validators import InputRequired, Length, Optional
+from flask_wtf.file import FileAllowed, FileField, FileRequired
+from wtforms import HiddenField, RadioField, SelectField, SelectMultipleField, StringField
+from wtforms.validators import InputRequired, Length, Optional, ValidationError
+
+COLOURS = [
+    ("red", "Red"),
+    ("green", "Green"),
+    ("blue", "Blue"),
+    ("yellow", "Yellow"),
+    ("orange", "Orange"),
+    ("purple", "Purple"),
+    ("black", "Black"),
+    ("white", "White"),
+]
+
+
+def import_row(row, name, colour):
+    """Check an imported Thing as ThingForm would, returning a dict of its row, name and colour, and any error."""
+    thing = {"row": row, "name": (name or "").strip(), "colour": (colour or "").strip().lower()}
+    if not thing["name"]:
+        thing["error"] = "Enter a name"
+    elif len(thing["name"]) > 32:
+        thing["error"] = "Name must be 32 characters or fewer"
+    elif thing["colour"] not in dict(COLOURS):
+        thing["error"] = "Select a colour"
+    return thing
 
 
 class ThingForm(FlaskForm):
@@ -15,17 +44,9 @@ class ThingForm(FlaskForm):
     colour = RadioField(
         "Colour",
         validators=[InputRequired(message="Select a colour")],
-        choices=[
-            ("red", "Red"),
-            ("green", "Green"),
-            ("blue", "Blue"),
-            ("yellow", "Yellow"),
-            ("orange", "Orange"),
-            ("purple", "Purple"),
-            ("black", "Black"),
-            ("white", "White"),
-        ],
+        choices=COLOURS,
     )
+    version = HiddenField("Version", validators=[Optional()])
 
 
 class ThingFilterForm(FlaskForm):
@@ -39,15 +60,56 @@ class ThingFilterForm(FlaskForm):
     colour = RadioField(
         "Colour",
         validators=[Optional()],
-        choices=[
-            ("red", "Red"),
-            ("green", "Green"),
-            ("blue", "Blue"),
-            ("yellow", "Yellow"),
-            ("orange", "Orange"),
-            ("purple", "Purple"),
-            ("black", "Black"),
-            ("white", "White"),
-        ],
+        choices=COLOURS,
         default="",
     )
+    per_page = SelectField(
+        "Results per page",
+        validators=[Optional()],
+        choices=[(10, "10"), (25, "25"), (50, "50"), (100, "100")],
+        coerce=int,
+        default=25,
+    )
+
+
+class ThingImportForm(FlaskForm):
+    file = FileField(
+        "CSV file",
+        validators=[
+            FileRequired(message="Select a CSV file"),
+            FileAllowed(["csv"], message="The selected file must be a CSV"),
+        ],
+        description="With name and colour columns, such as a download of the things list.",
+    )
+
+    def validate_file(self, field):
+        """Read the uploaded CSV into rows, each a dict of row number, name and colour, or an error."""
+        try:
+            reader = csv.DictReader(io.StringIO(field.data.read().decode("utf-8-sig")))
+            if not {"name", "colour"} <= set(reader.fieldnames or []):
+                raise ValidationError("The selected file must have name and colour columns")
+            self.rows = [import_row(reader.line_num, record.get("name"), record.get("colour")) for record in reader]
+        except UnicodeDecodeError:
+            raise ValidationError("The selected file must be UTF-8 encoded")
+        except csv.Error:
+            raise ValidationError("The selected file must be a valid CSV")
+
+        if not self.rows:
+            raise ValidationError("The selected file is empty")
+        if len(self.rows) > current_app.config["BULK_MAX_ITEMS"]:
+            raise ValidationError(f"The selected file must have {current_app.config['BULK_MAX_ITEMS']} rows or fewer")
+
+
+class BulkDeleteForm(FlaskForm):
+    ids = SelectMultipleField(
+        "Things",
+        validators=[InputRequired(message="Select the things to delete")],
+        choices=[],
+        coerce=uuid.UUID,
+        validate_choice=False,
+    )
+
+
+class ThingDeleteForm(FlaskForm):
+    name = HiddenField("Name", validators=[Optional()])
+    version = HiddenField("Version", validators=[Optional()])
@@ -1,9 +1,25 @@
-from flask import Response, flash, redirect, render_template, request, url_for
+from flask import (
+    Markup,
+    Response,
+    current_app,
+    escape,
+    flash,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
+from werkzeug.exceptions import BadRequest, PreconditionFailed
 
-from app import csrf
-from app.integrations.thing_api import Thing
+from app import fragments, pool
+from app.conditional import not_modified, page_etag, set_validators
+from app.exports import FORMATS, THING_COLUMNS, ndjson, parquet
+from app.integrations.bulk import BulkResult
+from app.integrations.models import ThingRecord
+from app.integrations.thing_api import AsyncThing, Thing
 from app.thing import bp
-from app.thing.forms import ThingFilterForm, ThingForm
+from app.thing.forms import BulkDeleteForm, ThingDeleteForm, ThingFilterForm, ThingForm, ThingImportForm
 
 
 @bp.route("/", methods=["GET", "POST"])
@@ -22,9 +38,51 @@ def list():
         filters["colour"] = request.args.get("colour", type=str)
         form.colour.data = filters["colour"]
 
-    things = Thing().list(filters=filters)
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = request.args.get("per_page", current_app.config["PAGE_SIZE"], type=int)
+    per_page = max(min(per_page, current_app.config["MAX_PAGE_SIZE"]), 1)
+    form.per_page.data = per_page
 
-    return render_template("list_things.html", title="Things", things=things, form=form)
+    upstream_etag, render_table = list_table(filters, page, per_page)
+
+    etag = page_etag(upstream_etag)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    table = Markup(render_table())
+    response = make_response(render_template("list_things.html", title="Things", table=table, form=form))
+    return set_validators(response, etag)
+
+
+def list_table(filters, page, per_page):
+    """Get the upstream ETag of a page of Things and a function rendering its table, using cached fragments.
+
+    The page is fetched now, but only rendered and cached when the function is called, so a request answered with
+    304 Not Modified doesn't render a table it won't send.
+    """
+    key = fragments.key("thing", page=page, per_page=per_page, **filters)
+    fragment = fragments.get(key)
+    if fragment is not None:
+        upstream_etag, table = fragment
+        return upstream_etag, lambda: table
+
+    client = Thing()
+    things = client.list(filters=filters, page=page, per_page=per_page)
+
+    def render_table():
+        table = render_template(
+            "_thing_table.html",
+            things=things,
+            filters=filters,
+            query=dict(filters, per_page=per_page),
+            page=page,
+            has_next=things is not None and len(things) == per_page,
+        )
+        fragments.set(key, client.etag, table)
+        return table
+
+    return client.etag, render_table
 
 
 @bp.route("/new", methods=["GET", "POST"])
@@ -36,7 +94,7 @@ def create():
         new_thing = Thing().create(name=form.name.data, colour=form.colour.data)
         flash(
             "<a href='{}' class='alert-link'>{}</a> has been created.".format(
-                url_for("thing.view", id=new_thing["id"]), new_thing["name"]
+                url_for("thing.view", id=new_thing.id), new_thing.name
             ),
             "success",
         )
@@ -50,57 +108,128 @@ def view(id):
     """Get a Thing with a specific ID."""
     thing = Thing().get(id)
 
-    return render_template("view_thing.html", title=thing["name"], thing=thing)
+    etag = page_etag(thing.id, thing.last_modified)
+    response = not_modified(etag, thing.last_modified)
+    if response:
+        return response
+
+    response = make_response(render_template("view_thing.html", title=thing.name, thing=thing))
+    return set_validators(response, etag, thing.last_modified)
 
 
 @bp.route("/<uuid:id>/edit", methods=["GET", "POST"])
 def edit(id):
     """Edit a Thing with a specific ID."""
-    thing = Thing().get(id)
     form = ThingForm()
 
     if form.validate_on_submit():
-        changed_thing = Thing().edit(thing_id=id, name=form.name.data, colour=form.colour.data)
-        flash(
-            "Your changes to <a href='{}' class='alert-link'>{}</a> have been saved.".format(
-                url_for("thing.view", id=changed_thing["id"]), changed_thing["name"]
-            ),
-            "success",
-        )
-        return redirect(url_for("thing.list"))
-    elif request.method == "GET":
-        form.name.data = thing["name"]
-        form.colour.data = thing["colour"]
+        # The version the form was opened at is sent as If-Match, so the change needs no pre-fetch
+        # and can't overwrite someone else's
+        try:
+            changed_thing = Thing().edit(
+                thing_id=id, name=form.name.data, colour=form.colour.data, version=form.version.data
+            )
+        except PreconditionFailed:
+            thing = Thing().get(id)
+            form.version.data = thing.version
+            flash(
+                "<a href='{}' class='alert-link'>{}</a> has been changed since you opened it, so your changes "
+                "haven't been saved. Save them again to replace the current details.".format(
+                    url_for("thing.view", id=id), escape(thing.name)
+                ),
+                "warning",
+            )
+        else:
+            flash(
+                "Your changes to <a href='{}' class='alert-link'>{}</a> have been saved.".format(
+                    url_for("thing.view", id=changed_thing.id), changed_thing.name
+                ),
+                "success",
+            )
+            return redirect(url_for("thing.list"))
+    else:
+        thing = Thing().get(id)
+        if request.method == "GET":
+            form.name.data = thing.name
+            form.colour.data = thing.colour
+            form.version.data = thing.version
 
     return render_template(
         "update_thing.html",
-        title=f"Edit {thing['name']}",
+        title=f"Edit {thing.name}",
         form=form,
         thing=thing,
     )
 
 
 @bp.route("/<uuid:id>/delete", methods=["GET", "POST"])
-@csrf.exempt
 def delete(id):
     """Delete a Thing with a specific ID."""
+    form = ThingDeleteForm()
+
+    if form.validate_on_submit():
+        try:
+            Thing().delete(id, version=form.version.data)
+        except PreconditionFailed:
+            flash(
+                "{} has been changed since you opened it, so it hasn't been deleted. "
+                "Check the current details before deleting it.".format(escape(form.name.data)),
+                "warning",
+            )
+            return redirect(url_for("thing.view", id=id))
+        flash(f"{escape(form.name.data)} has been deleted.", "success")
+        return redirect(url_for("thing.list"))
+
     thing = Thing().get(id)
+    form.name.data = thing.name
+    form.version.data = thing.version
+    return render_template(
+        "delete_thing.html",
+        title=f"Delete {thing.name}",
+        thing=thing,
+        form=form,
+    )
 
+
+@bp.route("/delete", methods=["GET", "POST"])
+async def bulk_delete():
+    """Delete the selected Things, after confirmation."""
     if request.method == "GET":
-        return render_template(
-            "delete_thing.html",
-            title=f"Delete {thing['name']}",
-            thing=thing,
-        )
-    elif request.method == "POST":
-        Thing().delete(id)
-        flash(f"{thing['name']} has been deleted.", "success")
-        return redirect(url_for("thing.list"))
+        # The list's checkboxes are submitted by GET, so the cached table needs no CSRF token
+        form = BulkDeleteForm(formdata=request.args)
+        if not form.ids.validate(form):
+            flash(form.ids.errors[0], "danger")
+            return redirect(url_for("thing.list"))
+    else:
+        form = BulkDeleteForm()
+
+    if form.validate_on_submit():
+        async with pool.async_client() as client:
+            results = await AsyncThing(client).bulk_delete(form.ids.data, current_app.config["BULK_CONCURRENCY"])
+        return render_template("bulk_results.html", title="Delete things", blueprint="thing", results=results)
+
+    return render_template("delete_things.html", title="Delete things", form=form)
+
+
+@bp.route("/import", methods=["GET", "POST"])
+async def bulk_import():
+    """Create Things from an uploaded file, reporting the outcome of each row."""
+    form = ThingImportForm()
+
+    if form.validate_on_submit():
+        valid = [row for row in form.rows if "error" not in row]
+        results = [BulkResult(row, error=row["error"]) for row in form.rows if "error" in row]
+        async with pool.async_client() as client:
+            results += await AsyncThing(client).bulk_create(valid, current_app.config["BULK_CONCURRENCY"])
+        results.sort(key=lambda result: result.item["row"])
+        return render_template("bulk_results.html", title="Import things", blueprint="thing", results=results)
+
+    return render_template("import_things.html", title="Import things", form=form)
 
 
 @bp.route("/download", methods=["GET"])
 def download():
-    """Download a list of Things."""
+    """Download a list of Things as CSV, newline-delimited JSON or Parquet."""
     filters = {}
     if request.args.get("sort"):
         filters["sort"] = request.args.get("sort", type=str)
@@ -109,7 +238,22 @@ def download():
     if request.args.get("colour"):
         filters["colour"] = request.args.get("colour", type=str)
 
-    things = Thing().list(filters=filters, format="csv")
-    response = Response(things, mimetype="text/csv", status=200)
-    response.headers.set("Content-Disposition", "attachment", filename="things.csv")
+    format = request.args.get("format", "csv", type=str)
+    if format not in ("csv", "ndjson", "parquet"):
+        raise BadRequest("The format parameter must be csv, ndjson or parquet.")
+
+    if format == "csv":
+        body = Thing().list(filters=filters, format="csv", stream=True)
+    else:
+        # Each thing is written out as it is decoded from the streamed list, so memory stays bounded
+        things = Thing().stream(filters)
+        batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+        if format == "ndjson":
+            body = ndjson(things, batch_size)
+        else:
+            body = parquet(map(ThingRecord.from_json, things), THING_COLUMNS, batch_size)
+
+    mimetype, extension = FORMATS[format]
+    response = Response(body, mimetype=mimetype, status=200)
+    response.headers.set("Content-Disposition", "attachment", filename=f"things.{extension}")
     return response
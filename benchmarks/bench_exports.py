@@ -0,0 +1,90 @@
+"""Measure download export throughput in rows per second, and peak memory, for each format.
+
+Each export is produced from a JSON list streamed in chunks, as it would be from the upstream API.
+
+Usage: python -m benchmarks.bench_exports [rows]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from app.exports import POINT_COLUMNS, THING_COLUMNS, geojson_seq, ndjson, parquet
+from app.integrations.models import PointRecord, ThingRecord
+from app.integrations.streaming import iter_json_array
+
+CREATED_AT = "2022-05-31T12:30:00.123456+00:00"
+CHUNK_SIZE = 8192
+BATCH_SIZE = 10000
+
+
+def things_body(rows):
+    return json.dumps(
+        [
+            {"id": f"{i:032x}", "name": f"Thing {i}", "colour": "red", "created_at": CREATED_AT, "updated_at": None}
+            for i in range(rows)
+        ]
+    ).encode()
+
+
+def points_body(rows):
+    return json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "id": f"{i:032x}",
+                    "properties": {"name": f"Point {i}", "created_at": CREATED_AT, "updated_at": None},
+                    "geometry": {"type": "Point", "coordinates": [i / rows, -i / rows]},
+                }
+                for i in range(rows)
+            ],
+        }
+    ).encode()
+
+
+def chunked(body):
+    return (body[i : i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+
+
+def measure(export):
+    """Get the bytes written, wall time and peak allocation of consuming an export.
+
+    Memory is traced in a second run, as tracing slows the export down.
+    """
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in export())
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for _ in export():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main(rows):
+    things = things_body(rows)
+    points = points_body(rows)
+    cases = {
+        "things as ndjson": lambda: ndjson(iter_json_array(chunked(things)), BATCH_SIZE),
+        "things as parquet": lambda: parquet(
+            map(ThingRecord.from_json, iter_json_array(chunked(things))), THING_COLUMNS, BATCH_SIZE
+        ),
+        "points as ndjson": lambda: ndjson(iter_json_array(chunked(points), key="features"), BATCH_SIZE),
+        "points as geojsonseq": lambda: geojson_seq(iter_json_array(chunked(points), key="features"), BATCH_SIZE),
+        "points as parquet": lambda: parquet(
+            map(PointRecord.from_json, iter_json_array(chunked(points), key="features")), POINT_COLUMNS, BATCH_SIZE
+        ),
+    }
+
+    print(f"{rows} rows, streamed in {CHUNK_SIZE} byte chunks")
+    print(f"{'':<24} {'rows/s':>12} {'output':>12} {'peak':>12}")
+    for name, export in cases.items():
+        size, elapsed, peak = measure(export)
+        print(f"{name:<24} {rows / elapsed:>12,.0f} {size / 2**20:>8.1f} MiB {peak / 2**20:>8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,73 @@
+"""Compare decoding and encoding a large GeoJSON FeatureCollection with the standard library and orjson.
+
+"decode records from text" decodes the body to a str first, as response.text does, as the Point API client did
+before the shared JSON backend. The other cases go through app.integrations.serialization with each backend.
+
+Usage: python -m benchmarks.bench_json [features]
+"""
+import json
+import sys
+import timeit
+from unittest import mock
+
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+from app.integrations import serialization
+from app.integrations.models import decode_points
+from app.integrations.serialization import JSONEncoder, dumps
+
+CREATED_AT = "2022-05-31T12:30:00.123456+00:00"
+
+
+def points_body(features):
+    return json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "id": f"{i:032x}",
+                    "properties": {"name": f"Point {i}", "created_at": CREATED_AT, "updated_at": None},
+                    "geometry": {"type": "Point", "coordinates": [i / features, -i / features]},
+                }
+                for i in range(features)
+            ],
+        }
+    ).encode()
+
+
+def fastest(function):
+    """Get the fastest of a few runs in milliseconds, so a busy machine doesn't skew the comparison."""
+    return min(timeit.repeat(function, number=1, repeat=5)) * 1000
+
+
+def cases(body, document):
+    return {
+        "decode records": lambda: decode_points(body),
+        "decode records from text": lambda: decode_points(body.decode()),
+        "encode request body": lambda: dumps(document),
+        "encode jsonify/tojson": lambda: json.dumps(document, cls=JSONEncoder, sort_keys=True),
+    }
+
+
+def main(features):
+    body = points_body(features)
+    document = json.loads(body)
+    backends = ["json"] + (["orjson"] if serialization.orjson is not None else [])
+
+    results = {
+        "flask encoder": {"json": fastest(lambda: json.dumps(document, cls=FlaskJSONEncoder, sort_keys=True))},
+    }
+    for backend in backends:
+        with mock.patch.object(serialization, "orjson", None if backend == "json" else serialization.orjson):
+            for name, function in cases(body, document).items():
+                results.setdefault(name, {})[backend] = fastest(function)
+
+    print(f"{features} features, {len(body) / 2**20:.1f} MiB")
+    print(f"{'':<24}" + "".join(f"{backend:>12}" for backend in backends))
+    for name, timings in results.items():
+        print(f"{name:<24}" + "".join(f"{timings[b]:>9.0f} ms" if b in timings else f"{'':>12}" for b in backends))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,74 @@
+"""Compare the memory and time cost of holding decoded payloads as dicts against the record models.
+
+Usage: python -m benchmarks.bench_models [records]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from app.integrations.decoding import decode
+from app.integrations.models import decode_points, decode_things
+
+CREATED_AT = "2022-05-31T12:30:00.123456+00:00"
+
+
+def things_payload(records):
+    return json.dumps(
+        [
+            {"id": f"{i:032x}", "name": f"Thing {i}", "colour": "red", "created_at": CREATED_AT, "updated_at": None}
+            for i in range(records)
+        ]
+    )
+
+
+def points_payload(records):
+    return json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "id": f"{i:032x}",
+                    "properties": {"name": f"Point {i}", "created_at": CREATED_AT, "updated_at": None},
+                    "geometry": {"type": "Point", "coordinates": [i / records, -i / records]},
+                }
+                for i in range(records)
+            ],
+        }
+    )
+
+
+def measure(build, body):
+    """Get the retained size, peak allocation and wall time of building records from a payload."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(body)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained, peak, elapsed
+
+
+def main(records):
+    things = things_payload(records)
+    points = points_payload(records)
+    cases = {
+        "things as dicts": (decode, things),
+        "things as ThingRecord": (decode_things, things),
+        "points as dicts": (decode, points),
+        "points as FeatureCollection": (decode_points, points),
+    }
+
+    print(f"{records} records")
+    print(f"{'':<30} {'retained':>12} {'peak':>12} {'time':>10}")
+    for name, (build, body) in cases.items():
+        retained, peak, elapsed = measure(build, body)
+        print(f"{name:<30} {retained / 2**20:>9.1f} MiB {peak / 2**20:>8.1f} MiB {elapsed * 1000:>7.0f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
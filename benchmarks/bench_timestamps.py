@@ -0,0 +1,70 @@
+"""Compare timestamp decoding of upstream payloads using strptime against the shared decoding layer.
+
+Usage: python -m benchmarks.bench_timestamps [rows]
+"""
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from app.integrations.decoding import parse_timestamp
+from app.integrations.models import decode_things
+
+FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+
+def payload(rows):
+    start = datetime(2022, 5, 31, tzinfo=timezone.utc)
+    return json.dumps(
+        [
+            {
+                "id": str(i),
+                "name": f"Thing {i}",
+                "colour": "red",
+                "created_at": (start + timedelta(seconds=i)).isoformat(timespec="microseconds"),
+                "updated_at": (start + timedelta(seconds=2 * i)).isoformat(timespec="microseconds"),
+            }
+            for i in range(rows)
+        ]
+    )
+
+
+def eager_strptime(body):
+    things = json.loads(body)
+    for thing in things:
+        thing["created_at"] = datetime.strptime(thing["created_at"], FORMAT)
+        if thing["updated_at"]:
+            thing["updated_at"] = datetime.strptime(thing["updated_at"], FORMAT)
+    return things
+
+
+def lazy_unread(body):
+    return decode_things(body)
+
+
+def lazy_read(body):
+    things = decode_things(body)
+    for thing in things:
+        thing.created_at
+        thing.updated_at
+    return things
+
+
+def main(rows):
+    body = payload(rows)
+    timestamp = json.loads(body)[0]["created_at"]
+    results = {
+        "strptime (1 timestamp)": timeit.repeat(lambda: datetime.strptime(timestamp, FORMAT), number=rows, repeat=5),
+        "parse_timestamp (1 timestamp)": timeit.repeat(lambda: parse_timestamp(timestamp), number=rows, repeat=5),
+        "json.loads + strptime": timeit.repeat(lambda: eager_strptime(body), number=1, repeat=5),
+        "decode_things, timestamps unread": timeit.repeat(lambda: lazy_unread(body), number=1, repeat=5),
+        "decode_things, timestamps read": timeit.repeat(lambda: lazy_read(body), number=1, repeat=5),
+    }
+
+    print(f"{rows} rows, best of 5")
+    for name, timings in results.items():
+        print(f"{name:<32} {min(timings) * 1000:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,10 @@
+"""The app as served by the load test: the real create_app, with rate limiting disabled so it measures the app."""
+from app import create_app
+from config import Config
+
+
+class BenchmarkConfig(Config):
+    RATELIMIT_ENABLED = False
+
+
+app = create_app(BenchmarkConfig)
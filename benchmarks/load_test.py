@@ -0,0 +1,205 @@
+"""Load test every page of the app, served by Gunicorn against local stub Thing and Point APIs.
+
+Usage: python -m benchmarks.load_test [--records N] [--latency SECONDS] [--error-rate FRACTION]
+                                      [--requests N] [--concurrency N] [--workers N] [--output FILE]
+
+Prints, or writes to FILE, a JSON report of the settings and the throughput, latency percentiles and response
+statuses of each route, so that runs can be compared between releases.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess  # nosec B404 - runs the stub API and Gunicorn
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RECORD_ID = uuid.UUID(int=1)
+ROUTES = (
+    "/",
+    "/cookies",
+    "/privacy",
+    "/things/",
+    "/things/?colour=red&per_page=100",
+    "/things/new",
+    f"/things/{RECORD_ID}",
+    f"/things/{RECORD_ID}/edit",
+    f"/things/{RECORD_ID}/delete",
+    "/things/download",
+    "/points/",
+    "/points/?per_page=100",
+    "/points/new",
+    f"/points/{RECORD_ID}",
+    f"/points/{RECORD_ID}/edit",
+    f"/points/{RECORD_ID}/delete",
+    "/points/download",
+    "/points/map-data?zoom=5",
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=10, headers={"X-Forwarded-Proto": "https"})
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} wasn't ready after {timeout} seconds")
+
+
+def start_servers(args, processes):
+    """Start the stub APIs and the app under Gunicorn, adding them to processes, and return the app's base URL."""
+    stub_port, app_port = free_port(), free_port()
+    stub = subprocess.Popen(  # nosec B603 - fixed arguments
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.stub_upstream",
+            f"--port={stub_port}",
+            f"--records={args.records}",
+            f"--latency={args.latency}",
+            f"--error-rate={args.error_rate}",
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    processes.append(stub)
+    stub_url = f"http://127.0.0.1:{stub_port}/v1"
+    env = dict(
+        os.environ,
+        FLASK_ENV="production",
+        POINT_API_URL=stub_url,
+        PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(),
+        REDIS_URL="memory://",
+        SECRET_KEY=os.environ.get("SECRET_KEY", "benchmark"),
+        THING_API_URL=stub_url,
+        TIMEOUT=os.environ.get("TIMEOUT", "10"),
+    )
+    app = subprocess.Popen(  # nosec B603 - fixed arguments
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            f"--workers={args.workers}",
+            f"--bind=127.0.0.1:{app_port}",
+            "--log-level=warning",
+            "benchmarks.load_app:app",
+        ],
+        env=env,
+    )
+    processes.append(app)
+    app_url = f"http://127.0.0.1:{app_port}"
+    wait_until_ready(f"http://127.0.0.1:{stub_port}/v1/things/{RECORD_ID}")
+    wait_until_ready(f"{app_url}/privacy")
+    return app_url
+
+
+def percentile(sorted_values, fraction):
+    """Get a percentile of already sorted values by linear interpolation between the closest ranks."""
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def load(url, requests_count, concurrency):
+    """Make requests_count GET requests to url from concurrency clients, returning their latencies and statuses."""
+    # Behind a TLS terminating proxy, as in production, so Talisman doesn't redirect to HTTPS
+    headers = {"Accept-Encoding": "gzip, br", "X-Forwarded-Proto": "https"}
+    per_client = [
+        requests_count // concurrency + (1 if i < requests_count % concurrency else 0) for i in range(concurrency)
+    ]
+
+    def client(count):
+        results = []
+        with requests.Session() as session:
+            for _ in range(count):
+                start = time.perf_counter()
+                try:
+                    response = session.get(url, headers=headers, timeout=60, allow_redirects=False)
+                    size = len(response.content)
+                    status = response.status_code
+                except requests.RequestException:
+                    size, status = 0, "error"
+                results.append((time.perf_counter() - start, status, size))
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = [result for results in executor.map(client, per_client) for result in results]
+    return time.perf_counter() - start, results
+
+
+def summarise(elapsed, results):
+    latencies = sorted(latency for latency, _, _ in results)
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(results),
+        "errors": sum(count for status, count in statuses.items() if not status.startswith(("2", "3"))),
+        "statuses": statuses,
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "bytes_per_response": round(statistics.mean(size for _, _, size in results)),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p90": round(percentile(latencies, 0.90) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000, help="records in each stub API")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every stub API response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub API requests that fail")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn workers")
+    parser.add_argument("--output", help="file to write the JSON report to, instead of standard output")
+    args = parser.parse_args()
+
+    processes = []
+    try:
+        app_url = start_servers(args, processes)
+        routes = {}
+        for route in ROUTES:
+            # Warm up the workers' connection pools, caches and templates for this route
+            load(app_url + route, args.concurrency, args.concurrency)
+            routes[route] = summarise(*load(app_url + route, args.requests, args.concurrency))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "settings": {name: value for name, value in vars(args).items() if name != "output"},
+        "python": sys.version.split()[0],
+        "routes": routes,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Local stub Thing and Point APIs for load testing, with configurable record counts, latency and error rates.
+
+Usage: python -m benchmarks.stub_upstream [--records N] [--latency SECONDS] [--error-rate FRACTION] [--port PORT]
+
+Both APIs are served from one port, at /v1/things and /v1/points. Records are generated deterministically,
+so runs with the same settings are comparable. A fraction of requests, set by the error rate, fail with a 503.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CREATED_AT = "2022-05-31T12:30:00.123456+00:00"
+COLOURS = ("red", "orange", "yellow", "green", "blue", "indigo", "violet")
+RECORD_PATH = re.compile(r"^/v1/(things|points)(?:/([0-9a-f-]{36}))?$")
+
+
+def etag(body):
+    """The ETag of a response body, sent with every body and compared with If-Match."""
+    return '"{}"'.format(hashlib.blake2b(body, digest_size=8).hexdigest())
+
+
+def thing(index):
+    return {
+        "id": str(uuid.UUID(int=index + 1)),
+        "name": f"Thing {index}",
+        "colour": COLOURS[index % len(COLOURS)],
+        "created_at": CREATED_AT,
+        "updated_at": None,
+    }
+
+
+def point(index, records):
+    # Spread the points over a grid around Great Britain
+    side = max(int(records**0.5), 1)
+    return {
+        "type": "Feature",
+        "id": str(uuid.UUID(int=index + 1)),
+        "geometry": {"type": "Point", "coordinates": [-6 + 8 * (index % side) / side, 50 + 8 * (index // side) / side]},
+        "properties": {"name": f"Point {index}", "created_at": CREATED_AT, "updated_at": None},
+    }
+
+
+class StubData:
+    """The generated records for both APIs, with their JSON and CSV list bodies rendered once up front."""
+
+    def __init__(self, records):
+        self.records = records
+        self.things = [thing(index) for index in range(records)]
+        self.points = [point(index, records) for index in range(records)]
+        self.things_csv = self.to_csv(self.things, ("id", "name", "colour", "created_at", "updated_at"))
+        self.points_csv = self.to_csv(
+            [
+                {
+                    "id": feature["id"],
+                    "name": feature["properties"]["name"],
+                    "longitude": feature["geometry"]["coordinates"][0],
+                    "latitude": feature["geometry"]["coordinates"][1],
+                    "created_at": CREATED_AT,
+                }
+                for feature in self.points
+            ],
+            ("id", "name", "longitude", "latitude", "created_at"),
+        )
+
+    @staticmethod
+    def to_csv(rows, fields):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode()
+
+    def list(self, entity, query):
+        records = self.things if entity == "things" else self.points
+        if "colour" in query:
+            records = [record for record in records if record.get("colour") == query["colour"]]
+        if "name" in query:
+            records = [record for record in records if query["name"].lower() in self.name(record).lower()]
+        if "updated_since" in query:
+            records = [record for record in records if self.changed_at(record) >= query["updated_since"]]
+        if "page" in query:
+            per_page = int(query.get("per_page", 25))
+            start = (int(query["page"]) - 1) * per_page
+            records = records[start : start + per_page]
+        return records
+
+    @staticmethod
+    def name(record):
+        return record["properties"]["name"] if "properties" in record else record["name"]
+
+    @staticmethod
+    def changed_at(record):
+        fields = record.get("properties", record)
+        return fields["updated_at"] or fields["created_at"]
+
+    def get(self, entity, record_id):
+        index = uuid.UUID(record_id).int - 1
+        if not 0 <= index < self.records:
+            return None
+        return self.things[index] if entity == "things" else self.points[index]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve the stub APIs from data, delaying every response by latency seconds."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, which Nagle's algorithm would hold for the client's delayed ACK
+    disable_nagle_algorithm = True
+    data = None
+    latency = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", content_type)
+            self.send_header("ETag", etag(body))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def route(self):
+        """Delay the response, then get the entity and record ID requested, or None after sending an error."""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:  # nosec B311 - not used for security
+            self.send_body(503)
+            return None
+        url = urlsplit(self.path)
+        match = RECORD_PATH.match(url.path)
+        if match is None:
+            self.send_body(404)
+            return None
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        return match.group(1), match.group(2), query
+
+    def do_GET(self):
+        route = self.route()
+        if route is None:
+            return
+        entity, record_id, query = route
+        if record_id:
+            record = self.data.get(entity, record_id)
+            if record is None:
+                self.send_body(404)
+            else:
+                self.send_body(200, json.dumps(record).encode())
+        elif "text/csv" in self.headers.get("Accept", ""):
+            self.send_body(200, self.data.things_csv if entity == "things" else self.data.points_csv, "text/csv")
+        else:
+            records = self.data.list(entity, query)
+            if not records:
+                self.send_body(204)
+            elif entity == "things":
+                self.send_body(200, json.dumps(records).encode())
+            else:
+                collection = {"type": "FeatureCollection", "features": records}
+                self.send_body(200, json.dumps(collection).encode(), "application/geo+json")
+
+    def do_POST(self):
+        route = self.route()
+        if route is not None:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            record = dict(json.loads(body), id=str(uuid.uuid4()), created_at=CREATED_AT, updated_at=None)
+            self.send_body(201, json.dumps(record).encode())
+
+    def precondition_failed(self, entity, record_id):
+        """Send 412 if the request is conditional on an ETag other than the one a GET of the record would send."""
+        record = self.data.get(entity, record_id)
+        if (
+            "If-Match" in self.headers
+            and record is not None
+            and self.headers["If-Match"] != etag(json.dumps(record).encode())
+        ):
+            self.send_body(412)
+            return True
+        return False
+
+    def do_PUT(self):
+        route = self.route()
+        if route is not None:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.precondition_failed(*route[:2]):
+                record = dict(json.loads(body), id=route[1], created_at=CREATED_AT, updated_at=CREATED_AT)
+                self.send_body(200, json.dumps(record).encode())
+
+    def do_DELETE(self):
+        route = self.route()
+        if route is not None and not self.precondition_failed(*route[:2]):
+            self.send_body(204)
+
+
+def handler(data, latency=0.0, error_rate=0.0):
+    """Create a request handler class serving data."""
+    return type("ConfiguredStubHandler", (StubHandler,), {"data": data, "latency": latency, "error_rate": error_rate})
+
+
+def serve(port=0, records=1000, latency=0.0, error_rate=0.0):
+    """Create a stub API server. Serve it with serve_forever(); its URL is http://127.0.0.1:<server_port>/v1."""
+    return ThreadingHTTPServer(("127.0.0.1", port), handler(StubData(records), latency, error_rate))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail with a 503")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.records, args.latency, args.error_rate)
+    print(f"Serving {args.records} things and points at http://127.0.0.1:{server.server_port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,80 @@ import os
 
 
 class Config(object):
+    ASSETS_AUTO_BUILD = os.environ.get("ASSETS_AUTO_BUILD", "True") == "True"
+    ASSETS_MANIFEST = "file"
+    BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", 8))
+    BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", 1000))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 1024))
+    CACHE_REDIS_URL = os.environ.get("REDIS_URL")
+    CACHE_TTL = int(os.environ.get("CACHE_TTL", 60))
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "memory")
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5))
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = int(os.environ.get("CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS", 1))
+    CIRCUIT_BREAKER_RESET_TIMEOUT = int(os.environ.get("CIRCUIT_BREAKER_RESET_TIMEOUT", 30))
+    COMPRESS_CACHE_MAX_BYTES = int(os.environ.get("COMPRESS_CACHE_MAX_BYTES", 262144))
+    COMPRESS_CACHE_SIZE = int(os.environ.get("COMPRESS_CACHE_SIZE", 64))
+    COMPRESS_MIMETYPES = [
+        "application/geo+json",
+        "application/geo+json-seq",
+        "application/javascript",
+        "application/json",
+        "application/x-ndjson",
+        "text/css",
+        "text/csv",
+        "text/html",
+        "text/xml",
+    ]
+    COMPRESS_ROUTE_LEVELS = {
+        "point.download": {"br": 1, "deflate": 1, "gzip": 1},
+        "thing.download": {"br": 1, "deflate": 1, "gzip": 1},
+    }
+    DASHBOARD_PREVIEW_SIZE = int(os.environ.get("DASHBOARD_PREVIEW_SIZE", 5))
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 10000))
+    FRAGMENT_CACHE_TTL = int(os.environ.get("FRAGMENT_CACHE_TTL", 10))
+    FRAGMENT_CACHE_TYPE = os.environ.get("FRAGMENT_CACHE_TYPE", "none")
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    LOG_REPEAT_LIMIT = int(os.environ.get("LOG_REPEAT_LIMIT", 10))
+    LOG_REPEAT_WINDOW = int(os.environ.get("LOG_REPEAT_WINDOW", 60))
+    LOG_REQUEST_SAMPLE_RATE = float(os.environ.get("LOG_REQUEST_SAMPLE_RATE", 0.1))
+    MAP_CLUSTER_CELL_SIZE = int(os.environ.get("MAP_CLUSTER_CELL_SIZE", 64))
+    MAP_CLUSTER_MAX_ZOOM = int(os.environ.get("MAP_CLUSTER_MAX_ZOOM", 15))
+    MAP_COORDINATE_PRECISION = int(os.environ.get("MAP_COORDINATE_PRECISION", 5))
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 1048576))
+    MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 100))
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True") == "True"
+    PAGE_SIZE = int(os.environ.get("PAGE_SIZE", 25))
     POINT_API_URL = os.environ.get("POINT_API_URL")
+    RATELIMIT_BLUEPRINT_LIMITS = {}
+    RATELIMIT_DEFAULT = os.environ.get("RATELIMIT_DEFAULT", "2 per second;60 per minute")
     RATELIMIT_HEADERS_ENABLED = True
     RATELIMIT_STORAGE_URL = os.environ.get("REDIS_URL")
+    RATELIMIT_STRATEGY = os.environ.get("RATELIMIT_STRATEGY", "fixed-window")
+    RATELIMIT_SYNC_INTERVAL = float(os.environ.get("RATELIMIT_SYNC_INTERVAL", 0.5))
+    RATELIMIT_SYNC_MAX_PENDING = int(os.environ.get("RATELIMIT_SYNC_MAX_PENDING", 10))
+    REPLICA_ENABLED = os.environ.get("REPLICA_ENABLED", "False") == "True"
+    REPLICA_FULL_SYNC_INTERVAL = int(os.environ.get("REPLICA_FULL_SYNC_INTERVAL", 3600))
+    REPLICA_MAX_STALENESS = int(os.environ.get("REPLICA_MAX_STALENESS", 60))
+    REPLICA_PATH = os.environ.get("REPLICA_PATH", "replica.sqlite3")
+    REPLICA_SYNC_INTERVAL = int(os.environ.get("REPLICA_SYNC_INTERVAL", 10))
     SECRET_KEY = os.environ.get("SECRET_KEY")
+    SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "True") == "True"
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SECURE = True
+    STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 31536000))
+    STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 65536))
+    TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR")
+    TEMPLATE_CACHE_TYPE = os.environ.get("TEMPLATE_CACHE_TYPE", "none")
+    TEMPLATE_WARM_UP = os.environ.get("TEMPLATE_WARM_UP", "False") == "True"
     THING_API_URL = os.environ.get("THING_API_URL")
     TIMEOUT = int(os.environ.get("TIMEOUT"))
+    UPSTREAM_COALESCE_TIMEOUT = float(os.environ.get("UPSTREAM_COALESCE_TIMEOUT", 5))
+    UPSTREAM_COALESCE_TYPE = os.environ.get("UPSTREAM_COALESCE_TYPE", "memory")
+    UPSTREAM_ETAG_CACHE_SIZE = int(os.environ.get("UPSTREAM_ETAG_CACHE_SIZE", 256))
+    UPSTREAM_POOL_BLOCK = os.environ.get("UPSTREAM_POOL_BLOCK", "False") == "True"
+    UPSTREAM_POOL_MAXSIZE = int(os.environ.get("UPSTREAM_POOL_MAXSIZE", 10))
+    UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 10))
+    UPSTREAM_RETRY_BACKOFF_FACTOR = float(os.environ.get("UPSTREAM_RETRY_BACKOFF_FACTOR", 0.2))
+    UPSTREAM_RETRY_TOTAL = int(os.environ.get("UPSTREAM_RETRY_TOTAL", 2))
+    WORKER_WARM_UP = os.environ.get("WORKER_WARM_UP", "True") == "True"
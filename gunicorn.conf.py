@@ -0,0 +1,48 @@
+import glob
+import os
+import time
+
+from prometheus_client import multiprocess
+
+# Load the app once in the master, so workers share its imports, compiled templates and built assets
+# copy-on-write rather than each loading them on their first request
+preload_app = os.environ.get("PRELOAD_APP", "True") == "True"
+
+
+def on_starting(server):
+    # Metrics left by a previous run would otherwise be added to this one's
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+            os.remove(path)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from app.startup import preload
+
+        preload(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    # Runs before the worker accepts requests, after it has loaded the app if it wasn't preloaded
+    from app.startup import warm_worker
+
+    warm_worker(worker.wsgi)
+    worker.log.info("Worker %s ready in %.0f ms", worker.pid, (time.perf_counter() - worker.forked_at) * 1000)
+
+
+def worker_exit(server, worker):
+    # Write out any logs still queued before the worker's listener thread is stopped with it
+    from app import logs
+
+    logs.stop()
+
+
+def child_exit(server, worker):
+    # Drop the live-only gauges of workers that have exited
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,65 @@
+import json
+from unittest import mock
+
+import pytest
+
+from app import create_app
+from config import Config
+
+THING = {
+    "id": "00000000-0000-0000-0000-000000000001",
+    "name": "Thing",
+    "colour": "red",
+    "created_at": "2022-05-31T12:00:00.000000+00:00",
+    "updated_at": None,
+}
+
+
+class TestConfig(Config):
+    RATELIMIT_ENABLED = False
+    WTF_CSRF_ENABLED = False
+
+
+@pytest.fixture
+def thing():
+    """A Thing as the Thing API returns it, for the test to change as it needs."""
+    return dict(THING)
+
+
+@pytest.fixture
+def make_app():
+    """Get a function creating the app without rate limits or CSRF, with any other settings passed as keywords."""
+
+    def make(**settings):
+        return create_app(type("TestConfig", (TestConfig,), settings))
+
+    return make
+
+
+@pytest.fixture
+def upstream_response():
+    """Get a function building a mock upstream response with a JSON body."""
+
+    def build(body=None, status_code=200, headers=None):
+        content = b"" if body is None else json.dumps(body).encode()
+        return mock.Mock(status_code=status_code, content=content, text=content.decode(), headers=headers or {})
+
+    return build
+
+
+@pytest.fixture
+def upstream(upstream_response):
+    """Get a function patching every upstream request to answer with a JSON body, for use as a context manager.
+
+    Pass a function of the method and URL instead of a body to answer each request with the response it returns.
+    The patch is the mock requests.Session.request, so the test can check the calls made.
+    """
+
+    def patch(body=None, status_code=200, headers=None):
+        if callable(body):
+            return mock.patch(
+                "requests.Session.request", side_effect=lambda method, url, *args, **kwargs: body(method, url)
+            )
+        return mock.patch("requests.Session.request", return_value=upstream_response(body, status_code, headers))
+
+    return patch
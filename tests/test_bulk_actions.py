@@ -0,0 +1,147 @@
+import asyncio
+import io
+import json
+import uuid
+from unittest import mock
+
+import httpx
+from werkzeug.exceptions import NotFound
+
+from app import pool
+from app.integrations.bulk import run_bounded
+
+THING_IDS = [str(uuid.UUID(int=number)) for number in range(1, 4)]
+
+
+def mock_async_client(handler):
+    return mock.patch.object(pool, "async_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def test_run_bounded_limits_concurrency_and_reports_each_item():
+    in_flight = []
+    most = []
+
+    async def action(item):
+        in_flight.append(item)
+        most.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(item)
+        if item == 3:
+            raise NotFound
+        return item * 10
+
+    results = asyncio.run(run_bounded(action, range(6), concurrency=2))
+
+    assert max(most) == 2
+    assert [result.record for result in results] == [0, 10, 20, None, 40, 50]
+    assert [result.error for result in results] == [None, None, None, "Not Found", None, None]
+
+
+def test_import_things_creates_valid_rows_and_reports_invalid_ones(make_app):
+    app = make_app(BULK_CONCURRENCY=2)
+    created = []
+
+    async def handler(request):
+        thing = json.loads(request.content)
+        created.append(thing)
+        if thing["name"] == "Unavailable":
+            return httpx.Response(500)
+        return httpx.Response(201, text=json.dumps(dict(thing, id=str(uuid.uuid4()))))
+
+    upload = b"name,colour\nFirst,Red\n,blue\nUnavailable,green\nLast,purple\n"
+    with mock_async_client(handler):
+        with app.test_client() as test_client:
+            response = test_client.post("/things/import", data={"file": (io.BytesIO(upload), "things.csv")})
+
+    assert response.status_code == 200
+    assert [thing["name"] for thing in created] == ["First", "Unavailable", "Last"]
+    assert created[0]["colour"] == "red"
+    assert b"2 succeeded, 2 failed." in response.data
+    assert b"Row 3" in response.data and b"Enter a name" in response.data
+    assert b"Internal Server Error" in response.data
+
+
+def test_import_points_reads_geojson(make_app):
+    app = make_app(BULK_CONCURRENCY=2)
+    created = []
+
+    async def handler(request):
+        point = json.loads(request.content)
+        created.append(point)
+        return httpx.Response(201, text=json.dumps(dict(point, id=str(uuid.uuid4()))))
+
+    features = [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-1.5, 53.8]}, "properties": {"name": "A"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [200, 0]}, "properties": {"name": "B"}},
+    ]
+    upload = json.dumps({"type": "FeatureCollection", "features": features}).encode()
+    with mock_async_client(handler):
+        with app.test_client() as test_client:
+            response = test_client.post("/points/import", data={"file": (io.BytesIO(upload), "points.geojson")})
+
+    assert response.status_code == 200
+    assert len(created) == 1
+    assert created[0]["geometry"] == {"type": "Point", "coordinates": [-1.5, 53.8]}
+    assert b"1 succeeded, 1 failed." in response.data
+
+
+def test_import_rejects_a_file_without_the_expected_columns(make_app):
+    app = make_app(BULK_CONCURRENCY=2)
+
+    with app.test_client() as test_client:
+        response = test_client.post("/things/import", data={"file": (io.BytesIO(b"title\nThing\n"), "things.csv")})
+
+    assert response.status_code == 200
+    assert b"must have name and colour columns" in response.data
+
+
+def test_import_rejects_a_file_that_cannot_be_read(make_app):
+    app = make_app(BULK_CONCURRENCY=2)
+    uploads = [
+        ("/things/import", b'name,colour\n"Thing\rOne"x\r,red\n', "things.csv", b"must be a valid CSV"),
+        (
+            "/points/import",
+            b"name,longitude,latitude\n" + b"x" * 200000 + b",0,0\n",
+            "points.csv",
+            b"must be a valid CSV",
+        ),
+        ("/things/import", b"name,colour\n\xff\x00,red\n", "things.csv", b"must be UTF-8 encoded"),
+    ]
+
+    with app.test_client() as test_client:
+        for url, upload, filename, error in uploads:
+            response = test_client.post(url, data={"file": (io.BytesIO(upload), filename)})
+            assert response.status_code == 200
+            assert error in response.data
+
+
+def test_bulk_delete_confirms_then_deletes_each_selected_thing(make_app):
+    app = make_app(BULK_CONCURRENCY=2)
+    deleted = []
+
+    async def handler(request):
+        thing_id = request.url.path.rsplit("/", 1)[-1]
+        deleted.append(thing_id)
+        return httpx.Response(404 if thing_id == THING_IDS[1] else 204)
+
+    with app.test_client() as test_client:
+        response = test_client.get("/things/delete", query_string={"ids": THING_IDS})
+        assert response.status_code == 200
+        assert b"Are you sure you want to delete 3 things?" in response.data
+
+        with mock_async_client(handler):
+            response = test_client.post("/things/delete", data={"ids": THING_IDS})
+
+    assert response.status_code == 200
+    assert sorted(deleted) == THING_IDS
+    assert b"2 succeeded, 1 failed." in response.data
+
+
+def test_bulk_delete_without_a_selection_returns_to_the_list(make_app):
+    app = make_app(BULK_CONCURRENCY=2)
+
+    with app.test_client() as test_client:
+        response = test_client.get("/things/delete")
+
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/things/")
@@ -0,0 +1,106 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+from werkzeug.exceptions import ServiceUnavailable
+
+from app import pool
+from app.integrations.breaker import CircuitBreaker, JitteredRetry
+
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker("upstream", failure_threshold=2, reset_timeout=30)
+
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(ServiceUnavailable) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 30
+    assert breaker.transitions[(CircuitBreaker.CLOSED, CircuitBreaker.OPEN)] == 1
+
+
+def test_breaker_half_opens_and_closes_after_successful_probe():
+    breaker = CircuitBreaker("upstream", failure_threshold=1, reset_timeout=30, half_open_max_calls=1)
+    breaker.before_call()
+    breaker.record_failure()
+
+    with mock.patch("app.integrations.breaker.time.monotonic", return_value=time.monotonic() + 31):
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(ServiceUnavailable):
+            breaker.before_call()
+        breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.transitions[(CircuitBreaker.HALF_OPEN, CircuitBreaker.CLOSED)] == 1
+
+
+def test_breaker_reopens_after_failed_probe():
+    breaker = CircuitBreaker("upstream", failure_threshold=1, reset_timeout=30)
+    breaker.before_call()
+    breaker.record_failure()
+
+    with mock.patch("app.integrations.breaker.time.monotonic", return_value=time.monotonic() + 31):
+        breaker.before_call()
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_jittered_backoff_is_bounded():
+    retry = JitteredRetry(total=3, backoff_factor=1).increment(method="GET").increment(method="GET")
+
+    assert all(0 <= retry.get_backoff_time() <= 2 for _ in range(100))
+
+
+class UnavailableHandler(BaseHTTPRequestHandler):
+    """Answer every request with a 503 asking the client to wait a minute before retrying."""
+
+    def do_GET(self):
+        self.send_response(503)
+        self.send_header("Retry-After", "60")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_retries_wait_for_the_backoff_not_retry_after(make_app):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UnavailableHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1"
+    app = make_app(THING_API_URL=url, UPSTREAM_RETRY_TOTAL=2, UPSTREAM_RETRY_BACKOFF_FACTOR=0.2)
+
+    try:
+        start = time.perf_counter()
+        response = pool.session(url).get(f"{url}/things", timeout=app.config["TIMEOUT"])
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 503
+    # Two retries, each waiting at most the backoff factor times 2 ** retries
+    assert elapsed < 0.2 * (1 + 2) + 1
+
+
+def test_open_circuit_returns_service_unavailable(make_app):
+    app = make_app()
+    session = pool.session(app.config["THING_API_URL"])
+
+    with mock.patch("requests.Session.request", return_value=mock.Mock(status_code=503)) as request:
+        with app.test_client() as test_client:
+            for _ in range(app.config["CIRCUIT_BREAKER_FAILURE_THRESHOLD"]):
+                assert test_client.get("/things/").status_code == 500
+            response = test_client.get("/things/")
+
+    assert session.breaker.state == CircuitBreaker.OPEN
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert request.call_count == app.config["CIRCUIT_BREAKER_FAILURE_THRESHOLD"]
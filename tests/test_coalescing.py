@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+import requests
+
+from app import create_app, pool
+from app.integrations.coalescing import CoalescedResponse, RedisSingleFlight, SingleFlight
+
+
+def upstream_response(content=b'{"name": "Thing"}'):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json"
+    response._content = content
+    return response
+
+
+def test_identical_requests_in_flight_share_one_call():
+    flights = SingleFlight(timeout=5)
+    release = threading.Event()
+    calls = []
+
+    def send():
+        calls.append(1)
+        release.wait(5)
+        return upstream_response()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(flights.do, "GET /things/1", send) for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+        responses = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(response.json() == {"name": "Thing"} for response in responses)
+    assert sum(isinstance(response, CoalescedResponse) for response in responses) == 3
+    # Once the call has finished, the next request makes a new one
+    flights.do("GET /things/1", send)
+    assert len(calls) == 2
+
+
+def test_followers_get_the_leaders_error():
+    flights = SingleFlight(timeout=5)
+    release = threading.Event()
+
+    def send():
+        release.wait(5)
+        raise requests.exceptions.Timeout
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(flights.do, "GET /things/1", send) for _ in range(2)]
+        time.sleep(0.1)
+        release.set()
+        for future in futures:
+            with pytest.raises(requests.exceptions.Timeout):
+                future.result()
+
+
+def test_followers_stop_waiting_for_a_stuck_leader():
+    flights = SingleFlight(timeout=0.1)
+    release = threading.Event()
+    calls = []
+
+    def send():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+        return upstream_response()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, "GET /things/1", send)
+        time.sleep(0.05)
+        follower = executor.submit(flights.do, "GET /things/1", send)
+        assert follower.result().status_code == 200
+        release.set()
+        leader.result()
+
+    assert len(calls) == 2
+
+
+def test_redis_errors_fall_back_to_calling_upstream():
+    flights = RedisSingleFlight("redis://localhost:1", timeout=1)
+
+    assert flights.do("GET /things/1", upstream_response).status_code == 200
+
+
+def test_session_coalesces_identical_gets():
+    app = create_app()
+    session = pool.session(app.config["THING_API_URL"])
+    url = f"{app.config['THING_API_URL']}/things"
+
+    def send(request, **kwargs):
+        time.sleep(0.1)
+        response = upstream_response(b"[]")
+        response.request = request
+        return response
+
+    with mock.patch("requests.adapters.HTTPAdapter.send", side_effect=send) as adapter_send:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(lambda _: session.get(url, headers={"Accept": "application/json"}), range(4)))
+
+    assert adapter_send.call_count == 1
+    assert all(response.json() == [] for response in responses)
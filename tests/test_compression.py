@@ -0,0 +1,72 @@
+import gzip
+import zlib
+from unittest import mock
+
+import brotli
+
+from app import compress, create_app, pool
+from app.compression import compress_stream
+
+
+def test_compress_stream_yields_a_decodable_chunk_per_input_chunk():
+    chunks = [b"id,name\n", b"1,One\n" * 100, b"2,Two\n" * 100]
+
+    gzip_chunks = list(compress_stream(iter(chunks), "gzip", 1))
+    br_chunks = list(compress_stream(iter(chunks), "br", 1))
+
+    assert len(gzip_chunks) == len(chunks) + 1
+    assert gzip.decompress(b"".join(gzip_chunks)) == b"".join(chunks)
+    assert brotli.decompress(b"".join(br_chunks)) == b"".join(chunks)
+
+
+def test_streamed_download_is_compressed_with_route_level():
+    app = create_app()
+    chunks = [b"id,name,colour\n"] + [b"00000000-0000-0000-0000-000000000001,Thing,red\n"] * 100
+    upstream = mock.Mock(status_code=200)
+    upstream.iter_content.return_value = iter(chunks)
+
+    with mock.patch.object(pool.session(app.config["THING_API_URL"]), "get", return_value=upstream):
+        with mock.patch("app.compression.zlib.compressobj", wraps=zlib.compressobj) as compressobj:
+            with app.test_client() as test_client:
+                response = test_client.get("/things/download", headers={"Accept-Encoding": "gzip"})
+                assert response.headers["Content-Encoding"] == "gzip"
+                assert "Content-Length" not in response.headers
+                assert gzip.decompress(response.get_data()) == b"".join(chunks)
+
+    assert compressobj.call_args.args[0] == app.config["COMPRESS_ROUTE_LEVELS"]["thing.download"]["gzip"]
+    upstream.close.assert_called_once()
+
+
+def test_identical_pages_are_compressed_once(thing, upstream):
+    app = create_app()
+
+    with upstream(thing):
+        with app.test_client() as test_client:
+            compress.compressed.clear()
+            hits = compress.compressed.hits
+            for _ in range(2):
+                response = test_client.get(f"/things/{thing['id']}", headers={"Accept-Encoding": "br"})
+                assert response.headers["Content-Encoding"] == "br"
+                assert b"Thing" in brotli.decompress(response.data)
+                assert response.headers["ETag"].startswith('W/"')
+
+    assert compress.compressed.hits == hits + 1
+    assert len(compress.compressed) == 1
+
+
+def test_large_bodies_and_pages_with_a_nonce_are_not_cached(thing, upstream):
+    app = create_app()
+    features = {"type": "FeatureCollection", "features": []}
+
+    with app.test_client() as test_client:
+        compress.compressed.clear()
+        # The points page has an inline script with the request's nonce
+        with upstream(features):
+            page = test_client.get("/points/", headers={"Accept-Encoding": "gzip"})
+        app.config["COMPRESS_CACHE_MAX_BYTES"] = 100
+        with upstream(thing):
+            large = test_client.get(f"/things/{thing['id']}", headers={"Accept-Encoding": "gzip"})
+
+    assert b"nonce=" in gzip.decompress(page.data)
+    assert large.headers["Content-Encoding"] == "gzip"
+    assert len(compress.compressed) == 0
@@ -0,0 +1,101 @@
+from unittest import mock
+
+import requests
+from requests.adapters import BaseAdapter
+
+from app.integrations.breaker import CircuitBreaker
+from app.integrations.conditional import ConditionalCache
+from app.integrations.pool import UpstreamSession
+
+
+class RevalidatingAdapter(BaseAdapter):
+    """Answer with a 200 and an ETag, then 304 whenever the request carries that ETag."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.headers["ETag"] = '"v1"'
+        if request.headers.get("If-None-Match") == '"v1"':
+            response.status_code = 304
+            response._content = b""
+        else:
+            response.status_code = 200
+            response.headers["Content-Type"] = "application/json"
+            response._content = b'[{"id": 1}]'
+        return response
+
+    def close(self):
+        pass
+
+
+def test_upstream_304_is_served_from_cached_response():
+    adapter = RevalidatingAdapter()
+    session = UpstreamSession(CircuitBreaker("upstream"), ConditionalCache())
+    session.mount("http://", adapter)
+
+    first = session.get("http://upstream/things")
+    second = session.get("http://upstream/things")
+
+    assert "If-None-Match" not in adapter.requests[0].headers
+    assert adapter.requests[1].headers["If-None-Match"] == '"v1"'
+    assert second.status_code == 200
+    assert second.json() == first.json() == [{"id": 1}]
+
+
+def test_view_returns_304_without_csp_when_page_is_current(make_app, thing, upstream):
+    app = make_app()
+    thing["updated_at"] = "2022-06-01T12:00:00.000000+00:00"
+
+    with upstream(thing):
+        with app.test_client() as test_client:
+            response = test_client.get(f"/things/{thing['id']}")
+            assert response.status_code == 200
+            assert "Content-Security-Policy" in response.headers
+            etag = response.headers["ETag"]
+            assert etag.startswith("W/")
+
+            response = test_client.get(f"/things/{thing['id']}", headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            assert response.data == b""
+            assert "Content-Security-Policy" not in response.headers
+
+            response = test_client.get(f"/things/{thing['id']}", headers={"If-None-Match": 'W/"stale"'})
+            assert response.status_code == 200
+
+
+def test_pages_are_private_and_json_leaves_flashed_messages(make_app, upstream):
+    app = make_app()
+    points = {"type": "FeatureCollection", "features": []}
+
+    with upstream(points, headers={"ETag": '"v1"'}):
+        with app.test_client() as test_client:
+            page = test_client.get("/points/")
+            with test_client.session_transaction() as session:
+                session["_flashes"] = [("success", "Point has been created.")]
+            data = test_client.get("/points/map-data")
+            with test_client.session_transaction() as session:
+                flashes = session["_flashes"]
+
+    assert page.headers["Cache-Control"] == "no-cache, private"
+    assert data.headers["Cache-Control"] == "no-cache"
+    assert "ETag" in data.headers
+    assert flashes == [("success", "Point has been created.")]
+
+
+def test_list_revalidation_does_not_render_the_table(make_app, thing, upstream):
+    app = make_app()
+
+    with upstream([thing], headers={"ETag": '"v1"'}):
+        with app.test_client() as test_client:
+            etag = test_client.get("/things/").headers["ETag"]
+            with mock.patch("app.thing.routes.render_template") as render_template:
+                response = test_client.get("/things/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    render_template.assert_not_called()
@@ -0,0 +1,109 @@
+import uuid
+
+import pytest
+
+from app import cache
+from app.integrations.thing_api import Thing
+
+THING_ID = "00000000-0000-0000-0000-000000000001"
+VERSION = '"2f5b0c9d"'
+
+
+@pytest.fixture
+def answer(thing, upstream_response):
+    """Get a function answering each upstream method with the status code passed for it, and the Thing as the body."""
+
+    def statuses(**status_codes):
+        def respond(method, url):
+            body = dict(thing, name="Changed") if method == "PUT" else thing
+            return upstream_response(body, status_code=status_codes[method], headers={"ETag": VERSION})
+
+        return respond
+
+    return statuses
+
+
+def test_version_is_the_upstream_etag_kept_with_the_cached_record(make_app, upstream, answer):
+    app = make_app()
+
+    with app.app_context():
+        cache.delete("thing", THING_ID)
+        with upstream(answer(GET=200)) as request:
+            fetched = Thing().get(uuid.UUID(THING_ID))
+            cached = Thing().get(uuid.UUID(THING_ID))
+
+    assert request.call_count == 1
+    assert fetched.version == cached.version == VERSION
+
+
+def test_edit_form_carries_the_version(make_app, upstream, answer):
+    app = make_app()
+
+    with app.app_context():
+        cache.delete("thing", THING_ID)
+    with upstream(answer(GET=200)):
+        with app.test_client() as test_client:
+            response = test_client.get(f"/things/{THING_ID}/edit")
+
+    assert b'name="version" type="hidden" value="&#34;2f5b0c9d&#34;"' in response.data
+
+
+def test_edit_sends_the_version_as_if_match_without_a_pre_fetch(make_app, upstream, answer):
+    app = make_app()
+
+    with upstream(answer(PUT=200)) as request:
+        with app.test_client() as test_client:
+            response = test_client.post(
+                f"/things/{THING_ID}/edit", data={"name": "Changed", "colour": "red", "version": VERSION}
+            )
+
+    assert response.status_code == 302
+    assert [call.args[0] for call in request.call_args_list] == ["PUT"]
+    assert request.call_args.kwargs["headers"]["If-Match"] == VERSION
+
+
+def test_edit_of_a_changed_thing_warns_instead_of_overwriting(make_app, upstream, answer):
+    app = make_app()
+
+    with app.app_context():
+        cache.delete("thing", THING_ID)
+    with upstream(answer(PUT=412, GET=200)) as request:
+        with app.test_client() as test_client:
+            response = test_client.post(
+                f"/things/{THING_ID}/edit", data={"name": "Mine", "colour": "blue", "version": '"stale"'}
+            )
+
+    assert response.status_code == 200
+    assert [call.args[0] for call in request.call_args_list] == ["PUT", "GET"]
+    assert b"has been changed since you opened it" in response.data
+    # The form keeps the user's changes, ready to save again over the current version
+    assert b'value="Mine"' in response.data
+    assert b"&#34;stale&#34;" not in response.data
+
+
+def test_delete_sends_the_version_as_if_match_without_a_pre_fetch(make_app, upstream, answer):
+    app = make_app()
+
+    with upstream(answer(DELETE=204)) as request:
+        with app.test_client() as test_client:
+            response = test_client.post(
+                f"/things/{THING_ID}/delete", data={"name": "<b>Thing</b>", "version": VERSION}, follow_redirects=False
+            )
+            with test_client.session_transaction() as session:
+                flashes = session["_flashes"]
+
+    assert response.status_code == 302
+    assert [call.args[0] for call in request.call_args_list] == ["DELETE"]
+    assert request.call_args.kwargs["headers"]["If-Match"] == VERSION
+    assert flashes == [("success", "&lt;b&gt;Thing&lt;/b&gt; has been deleted.")]
+
+
+def test_delete_of_a_changed_thing_warns_instead_of_deleting(make_app, upstream, answer):
+    app = make_app()
+
+    with upstream(answer(DELETE=412)):
+        with app.test_client() as test_client:
+            response = test_client.post(f"/things/{THING_ID}/delete", data={"name": "Thing", "version": '"stale"'})
+
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith(f"/things/{THING_ID}")
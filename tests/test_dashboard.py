@@ -0,0 +1,45 @@
+import asyncio
+import json
+from unittest import mock
+
+import httpx
+
+from app import create_app, pool
+
+
+def test_index_fetches_previews_concurrently():
+    app = create_app()
+    arrived = {"things": asyncio.Event(), "points": asyncio.Event()}
+
+    async def handler(request):
+        # Each upstream waits until the other has also been called, so sequential calls would time out
+        resource = request.url.path.rsplit("/", 1)[-1]
+        arrived[resource].set()
+        await asyncio.wait_for(arrived["points" if resource == "things" else "things"].wait(), timeout=1)
+        if resource == "things":
+            assert request.url.params["per_page"] == str(app.config["DASHBOARD_PREVIEW_SIZE"])
+            return httpx.Response(200, text=json.dumps([{"id": "1", "name": "Thing", "colour": "red"}]))
+        return httpx.Response(200, text=json.dumps({"type": "FeatureCollection", "features": []}))
+
+    def async_client():
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with mock.patch.object(pool, "async_client", async_client):
+        with app.test_client() as test_client:
+            response = test_client.get("/")
+            assert response.status_code == 200
+            assert b'<li><a href="/things/1">Thing</a></li>' in response.data
+            assert b"None yet" in response.data
+
+
+def test_index_renders_when_upstreams_unavailable():
+    app = create_app()
+
+    def async_client():
+        return httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+
+    with mock.patch.object(pool, "async_client", async_client):
+        with app.test_client() as test_client:
+            response = test_client.get("/")
+            assert response.status_code == 200
+            assert response.data.count(b"Unavailable") == 2
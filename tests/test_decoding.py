@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+
+from app.integrations.decoding import parse_timestamp
+
+
+def test_parse_timestamp_formats():
+    expected = datetime(2022, 5, 31, 12, 30, 0, 123456, tzinfo=timezone.utc)
+
+    assert parse_timestamp("2022-05-31T12:30:00.123456+00:00") == expected
+    assert parse_timestamp("2022-05-31T12:30:00.123456+0000") == expected
+    assert parse_timestamp(None) is None
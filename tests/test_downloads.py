@@ -0,0 +1,127 @@
+import io
+import json
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from app import create_app, pool
+from app.integrations.streaming import iter_json_array
+
+
+def test_download_streams_upstream_csv():
+    app = create_app()
+    chunks = [b"id,name,colour\n", b"1,Thing,red\n"]
+    upstream = mock.Mock(status_code=200)
+    upstream.iter_content.return_value = iter(chunks)
+
+    with mock.patch.object(pool.session(app.config["THING_API_URL"]), "get", return_value=upstream) as get:
+        with app.test_client() as test_client:
+            response = test_client.get("/things/download?colour=red")
+            assert response.status_code == 200
+            assert response.is_streamed
+            assert response.mimetype == "text/csv"
+            assert response.get_data() == b"".join(chunks)
+
+    assert get.call_args.kwargs["stream"] is True
+    upstream.close.assert_called_once()
+
+
+def test_download_maps_upstream_errors():
+    app = create_app()
+    upstream = mock.Mock(status_code=429)
+
+    with mock.patch.object(pool.session(app.config["POINT_API_URL"]), "get", return_value=upstream):
+        with app.test_client() as test_client:
+            response = test_client.get("/points/download")
+            assert response.status_code == 429
+
+    upstream.close.assert_called_once()
+
+
+THINGS = [
+    {"id": str(i), "name": f"Thing {i}", "colour": "red", "created_at": "2022-05-31T12:00:00+00:00", "updated_at": None}
+    for i in range(5)
+]
+POINTS = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "id": str(i),
+            "geometry": {"type": "Point", "coordinates": [-1.5 + i, 53.8]},
+            "properties": {"name": f"Point {i}", "created_at": "2022-05-31T12:00:00+00:00", "updated_at": None},
+        }
+        for i in range(3)
+    ],
+}
+
+
+def streamed(body, chunk_size=7):
+    """An upstream response whose JSON body arrives in small chunks, split mid-token."""
+    data = json.dumps(body).encode()
+    upstream = mock.Mock(status_code=200)
+    upstream.iter_content.return_value = iter([data[i : i + chunk_size] for i in range(0, len(data), chunk_size)])
+    return upstream
+
+
+def test_json_array_is_decoded_incrementally_across_chunks():
+    data = json.dumps({"type": "FeatureCollection", "bbox": [0, 1], "features": [{"n": 1.25}, {"s": "é"}]}).encode()
+    chunks = [data[i : i + 1] for i in range(len(data))]
+
+    assert list(iter_json_array(chunks, key="features")) == [{"n": 1.25}, {"s": "é"}]
+    assert list(iter_json_array([b"[12", b"34, ", b"5]"])) == [1234, 5]
+
+
+def test_download_things_as_ndjson(make_app):
+    app = make_app(EXPORT_BATCH_SIZE=2)
+
+    with mock.patch.object(pool.session(app.config["THING_API_URL"]), "get", return_value=streamed(THINGS)) as get:
+        with app.test_client() as test_client:
+            response = test_client.get("/things/download?format=ndjson")
+            assert response.is_streamed
+            data = response.get_data()
+
+    assert get.call_args.kwargs["stream"] is True
+    assert get.call_args.kwargs["headers"]["Accept"] == "application/json"
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["Content-Disposition"] == "attachment; filename=things.ndjson"
+    assert [json.loads(line) for line in data.decode().splitlines()] == THINGS
+
+
+def test_download_points_as_geojson_text_sequence(make_app):
+    app = make_app(EXPORT_BATCH_SIZE=2)
+
+    with mock.patch.object(pool.session(app.config["POINT_API_URL"]), "get", return_value=streamed(POINTS)):
+        with app.test_client() as test_client:
+            response = test_client.get("/points/download?format=geojsonseq")
+
+    assert response.mimetype == "application/geo+json-seq"
+    texts = response.get_data().decode().split("\x1e")
+    assert texts[0] == ""
+    assert [json.loads(text) for text in texts[1:]] == POINTS["features"]
+    assert all(text.endswith("\n") for text in texts[1:])
+
+
+def test_download_points_as_parquet(make_app):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    app = make_app(EXPORT_BATCH_SIZE=2)
+
+    with mock.patch.object(pool.session(app.config["POINT_API_URL"]), "get", return_value=streamed(POINTS)):
+        with app.test_client() as test_client:
+            response = test_client.get("/points/download?format=parquet")
+
+    table = parquet.read_table(io.BytesIO(response.get_data()))
+    assert response.mimetype == "application/vnd.apache.parquet"
+    assert parquet.ParquetFile(io.BytesIO(response.get_data())).num_row_groups == 2
+    assert table.column_names == ["id", "name", "longitude", "latitude", "created_at", "updated_at"]
+    assert table.column("longitude").to_pylist() == [-1.5, -0.5, 0.5]
+    assert table.column("created_at")[0].as_py() == datetime(2022, 5, 31, 12, tzinfo=timezone.utc)
+
+
+def test_download_rejects_unknown_formats():
+    app = create_app()
+
+    with app.test_client() as test_client:
+        assert test_client.get("/things/download?format=geojsonseq").status_code == 400
+        assert test_client.get("/points/download?format=xlsx").status_code == 400
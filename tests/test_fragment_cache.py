@@ -0,0 +1,67 @@
+from app import fragments
+from app.integrations.cache import FragmentCache, TTLCache
+
+
+def test_key_ignores_empty_parameters_and_order():
+    fragment_cache = FragmentCache()
+
+    assert fragment_cache.key("thing", name="a", colour="red", sort="") == fragment_cache.key(
+        "thing", colour="red", name="a"
+    )
+    assert fragment_cache.key("thing", page=1) != fragment_cache.key("point", page=1)
+
+
+def test_purge_moves_an_entity_to_a_new_generation():
+    fragment_cache = FragmentCache()
+    fragment_cache.backend = TTLCache(ttl=60)
+    fragment_cache.set(fragment_cache.key("thing", page=1), '"v1"', "<table>")
+    fragment_cache.set(fragment_cache.key("point", page=1), '"v1"', "<table>")
+
+    fragment_cache.purge("thing")
+
+    assert fragment_cache.get(fragment_cache.key("thing", page=1)) is None
+    assert fragment_cache.get(fragment_cache.key("point", page=1)) == ('"v1"', "<table>")
+
+
+def test_list_table_is_cached_until_a_thing_changes(make_app, thing, upstream, upstream_response):
+    app = make_app(FRAGMENT_CACHE_TYPE="memory")
+
+    def answer(method, url):
+        if method == "POST":
+            return upstream_response(thing, status_code=201)
+        return upstream_response([thing], headers={"ETag": '"v1"'})
+
+    with app.app_context():
+        fragments.purge("thing")
+    with upstream(answer) as request:
+        with app.test_client() as test_client:
+            first = test_client.get("/things/?colour=red&name=")
+            second = test_client.get("/things/?name=&colour=red")
+            assert request.call_count == 1
+            assert first.headers["ETag"] == second.headers["ETag"]
+            assert b"/things/00000000-0000-0000-0000-000000000001/edit" in second.data
+
+            response = test_client.post("/things/new", data={"name": "Thing", "colour": "red"})
+            assert response.status_code == 302
+
+            response = test_client.get("/things/?colour=red")
+            assert b"has been created" in response.data
+            assert [call.args[0] for call in request.call_args_list] == ["GET", "POST", "GET"]
+            assert "ETag" not in response.headers
+
+
+def test_cached_table_does_not_contain_nonce_or_other_query_parameters(make_app, upstream):
+    app = make_app(FRAGMENT_CACHE_TYPE="memory")
+
+    with app.app_context():
+        fragments.purge("point")
+    with upstream({"type": "FeatureCollection", "features": []}, headers={"ETag": '"v1"'}):
+        with app.test_client() as test_client:
+            test_client.get("/points/?name=a&per_page=10&utm_source=mail")
+            response = test_client.get("/points/?name=a&per_page=10")
+            assert b"utm_source" not in response.data
+
+    with app.app_context():
+        etag, table = fragments.get(fragments.key("point", name="a", page=1, per_page=10))
+    assert etag == '"v1"'
+    assert "nonce" not in table
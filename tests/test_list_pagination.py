@@ -0,0 +1,35 @@
+import json
+from unittest import mock
+
+from app import create_app, pool
+
+
+def things(count):
+    return [{"id": f"00000000-0000-0000-0000-{i:012d}", "name": f"Thing {i}", "colour": "red"} for i in range(count)]
+
+
+def test_list_requests_one_page_from_upstream():
+    app = create_app()
+    upstream = mock.Mock(status_code=200, content=json.dumps(things(10)).encode())
+
+    with mock.patch.object(pool.session(app.config["THING_API_URL"]), "get", return_value=upstream) as get:
+        with app.test_client() as test_client:
+            response = test_client.get("/things/?colour=red&page=2&per_page=10")
+            assert response.status_code == 200
+            assert b"page=3" in response.data
+            assert b"page=1" in response.data
+
+    assert get.call_args.kwargs["params"] == {"colour": "red", "page": 2, "per_page": 10}
+
+
+def test_list_caps_page_size():
+    app = create_app()
+    upstream = mock.Mock(status_code=200, content=json.dumps(things(3)).encode())
+
+    with mock.patch.object(pool.session(app.config["THING_API_URL"]), "get", return_value=upstream) as get:
+        with app.test_client() as test_client:
+            response = test_client.get("/things/?per_page=100000")
+            assert response.status_code == 200
+            assert b"page=2" not in response.data
+
+    assert get.call_args.kwargs["params"]["per_page"] == app.config["MAX_PAGE_SIZE"]
@@ -0,0 +1,111 @@
+import json
+import logging
+import queue
+from unittest import mock
+
+from flask import g
+
+from app import logs
+from app.logs import JSONFormatter, QueuedLogging, RepeatFilter
+
+
+def record(message="Upstream failed: %s", *args, level=logging.ERROR, **extra):
+    entry = logging.LogRecord("app.test", level, __file__, 1, message, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def lines(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_records_are_written_as_json_with_request_details(make_app, capsys):
+    app = make_app(LOG_REQUEST_SAMPLE_RATE=1.0)
+    logs.stop()
+    logs.filter.seen.clear()
+    capsys.readouterr()
+
+    with app.test_request_context("/things/?page=2"):
+        g.request_start = 0
+        g.upstream_timings = [("GET /things 200", 0.0123)]
+        app.logger.warning("Upstream slow: %s", "things", extra={"status": 200})
+    with app.test_client() as client:
+        client.get("/privacy")
+        client.get("/missing")
+    logs.stop()
+
+    warning, privacy, error, missing = lines(capsys.readouterr().err)
+    assert warning["level"] == "WARNING"
+    assert warning["message"] == "Upstream slow: things"
+    assert warning["path"] == "/things/"
+    assert warning["status"] == 200
+    assert warning["upstream"] == [{"call": "GET /things 200", "ms": 12.3}]
+    assert warning["latency_ms"] > 0
+    assert privacy["message"] == "GET /privacy 200"
+    assert privacy["route"] == "/privacy"
+    assert error["message"] == "404: Not Found - http://localhost/missing"
+    assert error["route"] == "<unmatched>"
+    assert missing["status"] == 404
+
+
+def test_sampled_out_requests_are_not_logged(make_app, capsys):
+    app = make_app(LOG_REQUEST_SAMPLE_RATE=1.0)
+    logs.stop()
+    capsys.readouterr()
+
+    with mock.patch.object(logs, "sample_rate", 0):
+        with app.test_client() as client:
+            client.get("/privacy")
+    logs.stop()
+
+    assert capsys.readouterr().err == ""
+
+
+def test_repeated_errors_are_rate_limited():
+    repeats = RepeatFilter(limit=2, window=60)
+
+    assert [repeats.filter(record(args=(i,))) for i in range(4)] == [True, True, False, False]
+    assert repeats.filter(record(level=logging.INFO))
+    assert repeats.filter(record(status=404))
+
+    with mock.patch("app.logs.time.monotonic", return_value=10**6):
+        later = record()
+        assert repeats.filter(later)
+    assert later.suppressed == 2
+
+
+def test_full_queue_drops_records_and_counts_them():
+    logging_queue = QueuedLogging()
+    full = queue.Queue(1)
+
+    with mock.patch.object(logging_queue, "current_queue", return_value=full):
+        logging_queue.handler.handle(record("first"))
+        logging_queue.handler.handle(record("second"))
+        logging_queue.handler.handle(record("third"))
+        full.get_nowait()
+        logging_queue.handler.handle(record("fourth"))
+
+    fourth = full.get_nowait()
+    assert fourth.message == "fourth"
+    assert fourth.dropped == 2
+
+
+def test_stop_writes_out_queued_records(capsys):
+    logging_queue = QueuedLogging()
+    for i in range(100):
+        logging_queue.handler.handle(record("Record %d", i, level=logging.INFO))
+
+    logging_queue.stop()
+
+    assert [entry["message"] for entry in lines(capsys.readouterr().err)] == [f"Record {i}" for i in range(100)]
+
+
+def test_exceptions_are_formatted():
+    try:
+        raise ValueError("bad")
+    except ValueError as error:
+        entry = record(exc_info=(type(error), error, error.__traceback__))
+
+    formatted = json.loads(JSONFormatter().format(entry))
+
+    assert formatted["exception"].endswith("ValueError: bad")
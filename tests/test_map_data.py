@@ -0,0 +1,87 @@
+import json
+from unittest import mock
+
+import pytest
+
+from app import create_app, pool
+from app.integrations.models import FeatureCollection, PointRecord, decode_points
+from app.point.map_data import map_layer, parse_bbox
+
+
+def collection(*coordinates):
+    return FeatureCollection.from_points(
+        PointRecord(f"id-{index}", f"Point {index}", longitude, latitude)
+        for index, (longitude, latitude) in enumerate(coordinates)
+    )
+
+
+def test_parse_bbox_rejects_inverted_or_partial_boxes():
+    assert parse_bbox("-1,50,1,52") == (-1, 50, 1, 52)
+    for value in ("1,50,-1,52", "-1,50,1", "-1,50,1,nan"):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+
+
+def test_map_layer_filters_by_bbox_and_rounds_coordinates():
+    points = collection((-0.1234567, 51.5012345), (2.35, 48.85))
+
+    layer = map_layer(points, bbox=(-1, 50, 1, 52), precision=3)
+
+    assert layer["ids"] == ["id-0"]
+    assert layer["names"] == ["Point 0"]
+    assert layer["coordinates"] == [-0.123, 51.501]
+    assert layer["bounds"] == [-0.123, 51.501, -0.123, 51.501]
+
+
+def test_map_layer_clusters_nearby_points_below_max_zoom():
+    points = collection((-0.12, 51.50), (-0.13, 51.51), (2.35, 48.85))
+
+    clustered = map_layer(points, zoom=5, max_cluster_zoom=15)
+    unclustered = map_layer(points, zoom=15, max_cluster_zoom=15)
+
+    assert clustered["ids"] == ["id-2"]
+    assert clustered["clusters"]["counts"] == [2]
+    assert clustered["clusters"]["coordinates"] == [-0.125, 51.505]
+    assert len(unclustered["ids"]) == 3
+    assert unclustered["clusters"]["counts"] == []
+
+
+def test_map_data_route_returns_compact_layer():
+    app = create_app()
+    features = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": "id-0",
+                "geometry": {"type": "Point", "coordinates": [-0.12, 51.5]},
+                "properties": {"name": "Point 0"},
+            }
+        ],
+    }
+    upstream = mock.Mock(status_code=200, content=json.dumps(features).encode(), headers={"ETag": '"v1"'})
+
+    with mock.patch.object(pool.session(app.config["POINT_API_URL"]), "get", return_value=upstream) as get:
+        with app.test_client() as test_client:
+            response = test_client.get("/points/map-data?name=Point&bbox=-1,50,1,52&zoom=16")
+            assert response.status_code == 200
+            assert response.json["ids"] == ["id-0"]
+            assert response.json["coordinates"] == [-0.12, 51.5]
+
+            response = test_client.get("/points/map-data?bbox=1,2,3")
+            assert response.status_code == 400
+
+    assert get.call_args.kwargs["params"] == {"name": "Point"}
+
+
+def test_panning_the_map_decodes_an_unchanged_list_once(make_app, upstream):
+    app = make_app()
+    features = {"type": "FeatureCollection", "features": []}
+
+    with upstream(features, headers={"ETag": '"pan"'}):
+        with mock.patch("app.integrations.point_api.decode_points", wraps=decode_points) as decode:
+            with app.test_client() as test_client:
+                for bbox in ("-1,50,1,52", "-2,50,0,52", "-3,50,-1,52"):
+                    assert test_client.get(f"/points/map-data?name=Pan&bbox={bbox}").status_code == 200
+
+    assert decode.call_count == 1
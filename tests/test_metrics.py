@@ -0,0 +1,40 @@
+from app import create_app
+from app.metrics import upstream_operation
+
+
+def test_upstream_operation_replaces_ids(thing):
+    assert upstream_operation("http://upstream/v1", f"http://upstream/v1/things/{thing['id']}") == "/things/{id}"
+    assert upstream_operation("http://upstream/v1", "http://upstream/v1/points") == "/points"
+
+
+def test_server_timing_includes_upstream_calls_rate_limit_and_rendering(make_app, thing, upstream):
+    app = make_app(RATELIMIT_ENABLED=True)
+
+    with upstream(thing):
+        with app.test_client() as test_client:
+            response = test_client.get(f"/things/{thing['id']}")
+
+    timings = response.headers["Server-Timing"].split(", ")
+    assert timings[0].startswith('upstream;desc="GET /things/{id} 200";dur=')
+    assert timings[1].startswith("ratelimit;dur=")
+    assert timings[2].startswith("render;dur=")
+    assert timings[3].startswith("total;dur=")
+
+
+def test_metrics_are_exported_without_rate_limit(thing, upstream):
+    app = create_app()
+
+    with upstream(thing):
+        with app.test_client() as test_client:
+            test_client.get(f"/things/{thing['id']}")
+            for _ in range(5):
+                response = test_client.get("/metrics")
+                assert response.status_code == 200
+
+    body = response.get_data(as_text=True)
+    assert response.mimetype == "text/plain"
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/things/<uuid:id>"' in body
+    assert 'operation="/things/{id}"' in body
+    assert 'template_render_duration_seconds_count{template="view_thing.html"}' in body
+    assert 'cache_requests_total{cache="record",result="miss"}' in body
+    assert 'rate_limit_check_duration_seconds_count{strategy="fixed-window"}' in body
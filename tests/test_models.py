@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from app.integrations.decoding import decode
+from app.integrations.models import FeatureCollection, PointRecord, ThingRecord
+
+CREATED_AT = "2022-05-31T12:30:00.123456+00:00"
+
+
+def feature(i):
+    return {
+        "type": "Feature",
+        "id": str(i),
+        "properties": {"name": f"Point {i}", "created_at": CREATED_AT, "updated_at": None},
+        "geometry": {"type": "Point", "coordinates": [i, -i]},
+    }
+
+
+def test_thing_parses_timestamps_on_access():
+    thing = ThingRecord.from_json(
+        decode(f'{{"id": "1", "name": "Thing", "colour": "red", "created_at": "{CREATED_AT}"}}')
+    )
+
+    assert thing._created_at == CREATED_AT
+    assert thing.created_at == datetime(2022, 5, 31, 12, 30, 0, 123456, tzinfo=timezone.utc)
+    assert isinstance(thing._created_at, datetime)
+    assert thing.updated_at is None
+    assert thing.to_json()["created_at"] == CREATED_AT
+
+
+def test_point_round_trips_geojson():
+    point = PointRecord.from_json(feature(1))
+
+    assert point.name == "Point 1"
+    assert point.geometry == {"type": "Point", "coordinates": [1, -1]}
+    assert point.to_json() == feature(1)
+
+
+def test_feature_collection_stores_flat_coordinates():
+    points = FeatureCollection.from_json({"type": "FeatureCollection", "features": [feature(1), feature(2)]})
+
+    assert len(points) == 2
+    assert list(points.coordinates) == [1.0, -1.0, 2.0, -2.0]
+    assert [point.name for point in points] == ["Point 1", "Point 2"]
+    assert points[-1].latitude == -2.0
+    assert points.to_json()["features"][0]["geometry"]["coordinates"] == [1.0, -1.0]
@@ -0,0 +1,65 @@
+from unittest import mock
+
+from limits import parse
+from limits.storage import MemoryStorage, RedisStorage
+
+from app import create_app
+from app.rate_limit import TokenBucketRateLimiter
+
+
+def test_token_bucket_limits_and_refills_locally():
+    strategy = TokenBucketRateLimiter(MemoryStorage())
+    limit = parse("2 per second")
+
+    assert strategy.hit(limit, "127.0.0.1", "thing.list")
+    assert strategy.hit(limit, "127.0.0.1", "thing.list")
+    assert not strategy.hit(limit, "127.0.0.1", "thing.list")
+    assert strategy.hit(limit, "127.0.0.2", "thing.list")
+    assert strategy.get_window_stats(limit, "127.0.0.1", "thing.list")[1] == 0
+
+    # Half a second later, one of the two tokens has been refilled
+    strategy.buckets[limit.key_for("127.0.0.1", "thing.list")].updated -= 0.5
+    assert strategy.test(limit, "127.0.0.1", "thing.list")
+    assert strategy.hit(limit, "127.0.0.1", "thing.list")
+    assert not strategy.hit(limit, "127.0.0.1", "thing.list")
+
+
+def test_token_bucket_syncs_pending_hits_in_one_pipeline():
+    app = create_app()
+    strategy = TokenBucketRateLimiter(RedisStorage("redis://localhost:6379"))
+    strategy.client = mock.Mock()
+    strategy.script = mock.Mock()
+    # Sync explicitly, rather than from a background thread
+    strategy.thread = mock.Mock()
+    pipeline = strategy.client.pipeline.return_value
+    limit = parse("60 per minute")
+    key = limit.key_for("127.0.0.1", "thing.list")
+
+    with app.test_request_context():
+        assert strategy.hit(limit, "127.0.0.1", "thing.list")
+        assert strategy.hit(limit, "127.0.0.1", "thing.list")
+        strategy.hit(parse("2 per second"), "127.0.0.1", "point.list")
+
+        # Other workers have taken all but half a token from the shared bucket
+        pipeline.execute.return_value = ["0.5", "1.0"]
+        strategy.sync()
+
+        strategy.script.assert_any_call(keys=[f"token-bucket/{key}"], args=[60, 1.0, 2], client=pipeline)
+        assert strategy.script.call_count == 2
+        pipeline.execute.assert_called_once_with()
+        assert strategy.buckets[key].pending == 0
+        assert not strategy.hit(limit, "127.0.0.1", "thing.list")
+
+
+def test_blueprint_limits_replace_defaults_and_exempt_blueprints(make_app):
+    app = make_app(RATELIMIT_BLUEPRINT_LIMITS={"main": None, "thing": "1 per minute"}, RATELIMIT_ENABLED=True)
+
+    with app.test_client() as test_client:
+        for _ in range(5):
+            assert test_client.get("/privacy").status_code == 200
+            assert test_client.get("/static/src/css/custom.css").status_code == 200
+
+        assert test_client.get("/things/new").status_code == 200
+        response = test_client.get("/things/new")
+
+    assert response.status_code == 429
@@ -0,0 +1,50 @@
+import time
+import uuid
+from unittest import mock
+
+from app import cache, create_app
+from app.integrations.cache import TTLCache
+from app.integrations.thing_api import Thing
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    ttl_cache = TTLCache(maxsize=2, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("c") == 3
+    assert ttl_cache.hits == 3
+    assert ttl_cache.misses == 1
+
+
+def test_ttl_cache_expires_entries():
+    ttl_cache = TTLCache(maxsize=2, ttl=60)
+    ttl_cache.set("a", 1)
+
+    with mock.patch("app.integrations.cache.time.monotonic", return_value=time.monotonic() + 61):
+        assert ttl_cache.get("a") is None
+    assert len(ttl_cache) == 0
+
+
+def test_get_is_served_from_cache_until_deleted(thing, upstream, upstream_response):
+    app = create_app()
+    thing_id = uuid.UUID(thing["id"])
+
+    def answer(method, url):
+        return upstream_response(status_code=204) if method == "DELETE" else upstream_response(thing)
+
+    with app.app_context():
+        cache.clear()
+        client = Thing()
+        with upstream(answer) as request:
+            assert client.get(thing_id).name == "Thing"
+            assert client.get(thing_id).name == "Thing"
+            assert request.call_count == 1
+
+            client.delete(thing_id)
+            client.get(thing_id)
+            assert [call.args[0] for call in request.call_args_list] == ["GET", "DELETE", "GET"]
@@ -0,0 +1,132 @@
+from unittest import mock
+
+import pytest
+
+from app import replica
+from app.integrations.point_api import Point
+from app.integrations.thing_api import Thing
+
+THINGS = [
+    {"id": "1", "name": "Banana", "colour": "yellow", "created_at": "2022-05-31T12:00:00+00:00", "updated_at": None},
+    {"id": "2", "name": "apple", "colour": "red", "created_at": "2022-05-31T12:00:00+00:00", "updated_at": None},
+    {"id": "3", "name": "Cherry", "colour": "red", "created_at": "2022-05-31T12:00:00+00:00", "updated_at": None},
+]
+CHANGED = dict(THINGS[0], name="Blueberry", colour="blue", updated_at="2022-06-01T09:00:00+00:00")
+
+
+def feature(id, name, longitude, latitude):
+    return {
+        "type": "Feature",
+        "id": id,
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": {"name": name, "created_at": "2022-05-31T12:00:00+00:00", "updated_at": None},
+    }
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    app = make_app(REPLICA_ENABLED=True, REPLICA_PATH=str(tmp_path / "replica.sqlite3"), REPLICA_SYNC_INTERVAL=0)
+    # The tests sync the replica themselves rather than in the background
+    with mock.patch.object(replica, "start_sync"):
+        with app.test_request_context():
+            yield app
+
+
+def test_cold_replica_falls_back_to_upstream(app, upstream):
+    with upstream(THINGS) as request:
+        things = Thing().list(filters={})
+
+    assert request.call_count == 1
+    assert len(things) == 3
+
+
+def test_synced_replica_answers_filters_sorts_and_pages_locally(app, upstream):
+    with upstream(THINGS) as request:
+        assert replica.sync("thing")
+    assert request.call_args.kwargs["params"] == {}
+
+    with mock.patch("requests.Session.request") as request:
+        client = Thing()
+        things = client.list(filters={"sort": "name", "colour": "red"}, page=1, per_page=1)
+        everything = Thing().list(filters={"sort": "name", "name": "an"})
+
+    request.assert_not_called()
+    assert [thing.name for thing in things] == ["apple"]
+    assert client.etag is not None
+    assert [thing.name for thing in everything] == ["Banana"]
+    assert Thing().list(filters={"name": "Durian"}) is None
+
+
+def test_sync_fetches_changes_since_the_cursor(app, upstream):
+    with upstream(THINGS):
+        replica.sync("thing")
+    with upstream([CHANGED]) as request:
+        replica.sync("thing")
+
+    assert request.call_args.kwargs["params"] == {"updated_since": "2022-05-31T12:00:00+00:00"}
+    assert [thing.name for thing in Thing().list(filters={"colour": "blue"})] == ["Blueberry"]
+
+
+def test_deletions_are_synced_within_the_staleness_bound(app, upstream):
+    with upstream(THINGS):
+        replica.sync("thing")
+    # The hourly full sync is brought forward, so one is due before the replica is stale
+    assert replica.full_sync_interval == app.config["REPLICA_MAX_STALENESS"] - app.config["REPLICA_SYNC_INTERVAL"]
+    with replica.connection() as connection:
+        connection.execute("UPDATE sync_state SET full_synced_at = full_synced_at - ?", (replica.full_sync_interval,))
+
+    with upstream(THINGS[1:]) as request:
+        replica.sync("thing")
+
+    assert request.call_args.kwargs["params"] == {}
+    assert [thing.id for thing in Thing().list(filters={})] == ["2", "3"]
+
+
+def test_stale_replica_or_unsupported_filter_falls_back_to_upstream(app, upstream):
+    with upstream(THINGS):
+        replica.sync("thing")
+
+    with upstream(THINGS) as request:
+        Thing().list(filters={"owner": "someone"})
+        replica.connection().execute("UPDATE sync_state SET full_synced_at = 0")
+        Thing().list(filters={})
+
+    assert request.call_count == 2
+
+
+def test_download_is_streamed_from_the_replica(app, upstream):
+    with upstream(THINGS):
+        replica.sync("thing")
+
+    with mock.patch("requests.Session.request") as request:
+        with app.test_client() as test_client:
+            response = test_client.get("/things/download?colour=red")
+
+    request.assert_not_called()
+    assert response.status_code == 200
+    assert response.data.decode().splitlines() == [
+        "id,name,colour,created_at,updated_at",
+        "2,apple,red,2022-05-31T12:00:00+00:00,",
+        "3,Cherry,red,2022-05-31T12:00:00+00:00,",
+    ]
+
+
+def test_points_are_found_by_bounding_box(app, upstream):
+    features = [feature("1", "Leeds", -1.55, 53.8), feature("2", "London", -0.13, 51.5)]
+    with upstream({"type": "FeatureCollection", "features": features}):
+        replica.sync("point")
+
+    points = Point().list(filters={}, bbox=(-2, 53, -1, 54))
+
+    assert [point.name for point in points] == ["Leeds"]
+
+
+def test_app_writes_update_the_replica(app, upstream):
+    with upstream(THINGS):
+        replica.sync("thing")
+
+    deleted = mock.Mock(status_code=204)
+    with mock.patch("requests.Session.request", return_value=deleted):
+        Thing().delete("2")
+
+    assert [thing.name for thing in Thing().list(filters={})] == ["Banana", "Cherry"]
@@ -0,0 +1,114 @@
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from flask import jsonify, render_template_string, request
+
+from app.integrations import serialization
+from app.integrations.models import FeatureCollection, PointRecord, ThingRecord, decode_points, decode_things
+from app.integrations.serialization import dumps, loads
+
+FEATURE = {
+    "type": "Feature",
+    "id": "1",
+    "properties": {"name": "Pointé", "created_at": "2022-05-31T12:00:00+00:00", "updated_at": None},
+    "geometry": {"type": "Point", "coordinates": [-1.55, 53.8]},
+}
+
+
+@dataclass
+class Size:
+    width: int
+    height: int
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request):
+    """Run a test with orjson, if it is installed, and with the standard library fallback."""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        yield request.param
+    else:
+        with mock.patch.object(serialization, "orjson", None):
+            yield request.param
+
+
+def test_backend_is_reported(backend):
+    assert serialization.backend() == backend
+
+
+def test_loads_takes_bytes_or_str(backend):
+    body = json.dumps({"outer": [{"inner": {"a": 1}}], "b": "é"})
+
+    assert loads(body.encode()) == loads(body) == json.loads(body)
+
+
+def test_dumps_is_compact_utf8(backend):
+    assert dumps({"name": "Pointé", "coordinates": [1.5, 2]}) == '{"name":"Pointé","coordinates":[1.5,2]}'.encode()
+
+
+def test_invalid_json_raises_value_error(backend):
+    with pytest.raises(ValueError):
+        loads(b"{")
+
+
+def test_records_are_decoded_from_response_bodies(backend):
+    things = decode_things(b'[{"id": "1", "name": "Thing", "colour": "red"}]')
+    points = decode_points(json.dumps({"type": "FeatureCollection", "features": [FEATURE]}).encode())
+
+    assert isinstance(things[0], ThingRecord) and things[0].colour == "red"
+    assert isinstance(points, FeatureCollection)
+    assert points.to_json()["features"] == [FEATURE]
+    assert decode_points(json.dumps(FEATURE).encode()).to_json() == PointRecord.from_json(FEATURE).to_json()
+
+
+def test_flask_json_keeps_its_conversions(make_app, backend):
+    app = make_app()
+    value = {
+        "when": datetime(2022, 5, 31, 12, tzinfo=timezone.utc),
+        "id": uuid.UUID(int=1),
+        "amount": Decimal("1.50"),
+        "size": Size(2, 3),
+        "b": 1,
+        "a": "<Pointé>",
+    }
+
+    with app.test_request_context():
+        body = jsonify(value).get_data()
+        script = render_template_string("{{ value | tojson }}", value=value)
+
+    assert json.loads(body) == {
+        "when": "Tue, 31 May 2022 12:00:00 GMT",
+        "id": "00000000-0000-0000-0000-000000000001",
+        "amount": "1.50",
+        "size": {"width": 2, "height": 3},
+        "b": 1,
+        "a": "<Pointé>",
+    }
+    assert list(json.loads(body)) == sorted(value)
+    assert "<" not in script and json.loads(script) == json.loads(body)
+
+
+def test_flask_request_json_is_decoded(make_app, backend):
+    app = make_app()
+
+    with app.test_request_context(data=json.dumps({"name": "Thing"}), content_type="application/json"):
+        assert request.get_json() == {"name": "Thing"}
+
+
+def test_point_form_sends_the_geometry_it_decoded(make_app, upstream):
+    app = make_app()
+
+    with upstream(FEATURE, status_code=201) as request:
+        with app.test_client() as client:
+            invalid = client.post("/points/new", data={"name": "Point", "location": "{"})
+            client.post("/points/new", data={"name": "Point", "location": json.dumps(FEATURE["geometry"])})
+
+    assert invalid.status_code == 200
+    assert "Select a location" in invalid.get_data(as_text=True)
+    assert request.call_count == 1
+    assert json.loads(request.call_args.kwargs["data"])["geometry"] == FEATURE["geometry"]
@@ -0,0 +1,88 @@
+import gc
+import subprocess  # nosec B404 - runs the interpreter to time a clean import
+import sys
+from unittest import mock
+
+from app import create_app, fragments
+from app.startup import preload, warm_worker
+
+# Seconds a fresh interpreter may take to import the app package; raise deliberately if a new dependency needs it
+IMPORT_BUDGET = 2.0
+
+
+def test_importing_app_is_within_budget():
+    code = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+    # The fastest of a few runs, so a busy machine doesn't fail the test
+    seconds = min(
+        float(subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout)
+        for _ in range(3)
+    )
+
+    assert seconds < IMPORT_BUDGET, f"Importing app took {seconds:.2f}s, over the {IMPORT_BUDGET}s budget"
+
+
+def test_preload_compiles_templates_and_freezes_objects():
+    app = create_app()
+
+    try:
+        preload(app)
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+    assert len(app.jinja_env.cache) == len(app.jinja_env.list_templates(extensions=["html"]))
+
+
+def test_warm_worker_fills_caches_for_each_list(make_app, thing, upstream, upstream_response):
+    app = make_app(FRAGMENT_CACHE_TYPE="memory")
+
+    def answer(method, url):
+        if "/things" in url:
+            return upstream_response([thing], headers={"ETag": '"things"'})
+        return upstream_response({"type": "FeatureCollection", "features": []}, headers={"ETag": '"p"'})
+
+    with app.app_context():
+        fragments.purge("thing")
+        fragments.purge("point")
+    with upstream(answer) as request:
+        warm_worker(app)
+
+    assert request.call_count == 2
+    with app.app_context():
+        assert fragments.get(fragments.key("thing", page=1, per_page=app.config["PAGE_SIZE"]))[0] == '"things"'
+        assert fragments.get(fragments.key("point", page=1, per_page=app.config["PAGE_SIZE"])) is not None
+
+
+def test_warmed_tables_link_to_their_own_list_pages(make_app, thing, upstream, upstream_response):
+    app = make_app(FRAGMENT_CACHE_TYPE="memory", PAGE_SIZE=2)
+    feature = {
+        "type": "Feature",
+        "id": thing["id"],
+        "geometry": {"type": "Point", "coordinates": [-1.5, 53.8]},
+        "properties": {"name": "Point"},
+    }
+
+    def answer(method, url):
+        if "/things" in url:
+            return upstream_response([thing, thing], headers={"ETag": '"things"'})
+        return upstream_response({"type": "FeatureCollection", "features": [feature, feature]}, headers={"ETag": '"p"'})
+
+    with app.app_context():
+        fragments.purge("thing")
+        fragments.purge("point")
+    with upstream(answer) as request:
+        warm_worker(app)
+        with app.test_client() as test_client:
+            things = test_client.get("/things/")
+            points = test_client.get("/points/")
+
+    assert request.call_count == 2
+    assert b'href="/things/?per_page=2&amp;page=2"' in things.data
+    assert b'href="/points/?per_page=2&amp;page=2"' in points.data
+    assert b'href="/?' not in things.data + points.data
+
+
+def test_warm_worker_survives_unavailable_upstreams():
+    app = create_app()
+
+    with mock.patch("requests.Session.request", side_effect=ConnectionError):
+        warm_worker(app)
@@ -0,0 +1,63 @@
+import gzip
+
+import brotli
+
+from app import create_app
+from app.static_files import compress_file
+
+CSS = b".card { margin: 0; }\n" * 100
+
+
+def create_static_app(tmp_path):
+    app = create_app()
+    app.static_folder = str(tmp_path)
+    (tmp_path / "dist").mkdir()
+    path = tmp_path / "dist" / "custom-0123abcd.min.css"
+    path.write_bytes(CSS)
+    compress_file(str(path))
+    return app
+
+
+def test_compress_file_writes_smaller_variants(tmp_path):
+    path = tmp_path / "custom.css"
+    path.write_bytes(CSS)
+    empty = tmp_path / "empty.js"
+    empty.write_bytes(b"")
+
+    assert compress_file(str(path)) == [str(path) + ".gz", str(path) + ".br"]
+    assert gzip.decompress((tmp_path / "custom.css.gz").read_bytes()) == CSS
+    assert brotli.decompress((tmp_path / "custom.css.br").read_bytes()) == CSS
+    assert compress_file(str(empty)) == []
+
+
+def test_static_serves_preferred_precompressed_variant(tmp_path):
+    app = create_static_app(tmp_path)
+
+    with app.test_client() as test_client:
+        response = test_client.get("/static/dist/custom-0123abcd.min.css", headers={"Accept-Encoding": "gzip, br"})
+        assert response.headers["Content-Encoding"] == "br"
+        assert response.mimetype == "text/css"
+        assert "Content-Disposition" not in response.headers
+        assert brotli.decompress(response.data) == CSS
+
+        response = test_client.get("/static/dist/custom-0123abcd.min.css", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.data) == CSS
+
+        response = test_client.get("/static/dist/custom-0123abcd.min.css", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+        assert "Content-Disposition" not in response.headers
+        assert response.data == CSS
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_hashed_static_files_are_immutable(tmp_path):
+    app = create_static_app(tmp_path)
+
+    with app.test_client() as test_client:
+        response = test_client.get("/static/dist/custom-0123abcd.min.css")
+
+    assert response.cache_control.immutable
+    assert response.cache_control.public
+    assert response.cache_control.max_age == app.config["STATIC_MAX_AGE"]
+    assert not response.cache_control.no_cache
@@ -0,0 +1,32 @@
+from app import create_app
+from config import Config
+
+
+def test_compile_templates_command_fills_bytecode_cache(tmp_path):
+    class TestConfig(Config):
+        TEMPLATE_CACHE_DIR = str(tmp_path)
+        TEMPLATE_CACHE_TYPE = "filesystem"
+
+    app = create_app(TestConfig)
+    result = app.test_cli_runner().invoke(args=["compile-templates"])
+
+    assert result.exit_code == 0
+    count = int(result.output.split()[1])
+    assert count == len(app.jinja_env.list_templates(extensions=["html"]))
+    assert len(list(tmp_path.iterdir())) == count
+
+
+def test_compile_templates_command_requires_a_bytecode_cache():
+    result = create_app().test_cli_runner().invoke(args=["compile-templates"])
+
+    assert result.exit_code != 0
+    assert "TEMPLATE_CACHE_TYPE" in result.output
+
+
+def test_warm_up_compiles_templates_in_create_app():
+    class TestConfig(Config):
+        TEMPLATE_WARM_UP = True
+
+    app = create_app(TestConfig)
+
+    assert len(app.jinja_env.cache) == len(app.jinja_env.list_templates(extensions=["html"]))
@@ -0,0 +1,26 @@
+from app import create_app, pool
+
+
+def test_session_shared_per_upstream():
+    app = create_app()
+
+    with app.app_context():
+        assert pool.session(app.config["THING_API_URL"]) is pool.session(app.config["THING_API_URL"])
+        assert pool.session(app.config["THING_API_URL"]) is not pool.session(app.config["POINT_API_URL"])
+
+
+def test_session_adapter_uses_pool_config():
+    app = create_app()
+    adapter = pool.session(app.config["THING_API_URL"]).get_adapter("http://")
+
+    assert adapter._pool_connections == app.config["UPSTREAM_POOL_SIZE"]
+    assert adapter._pool_maxsize == app.config["UPSTREAM_POOL_MAXSIZE"]
+    assert adapter._pool_block == app.config["UPSTREAM_POOL_BLOCK"]
+
+
+def test_close_releases_sessions():
+    app = create_app()
+    session = pool.session(app.config["THING_API_URL"])
+    pool.close()
+
+    assert pool.session(app.config["THING_API_URL"]) is not session